@@ -0,0 +1,133 @@
+import gzip
+import hashlib
+import json
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from urllib.parse import parse_qs
+
+
+# Ответы меньше этого размера не сжимаются: заголовки gzip съедят выигрыш
+GZIP_MIN_SIZE = 1024
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, scope: Dict[str, Any], params: Dict[str, str]):
+        self.method: str = scope["method"]
+        self.path: str = scope["path"]
+        self.params = params
+        self.query = {key: values[-1] for key, values in parse_qs(scope["query_string"].decode()).items()}
+        self.headers = {key.decode().lower(): value.decode() for key, value in scope["headers"]}
+
+    def int_param(self, name: str) -> int:
+        return int(self.params[name])
+
+    def query_int(self, name: str, default: int, maximum: int | None = None) -> int:
+        try:
+            value = int(self.query.get(name, default))
+        except ValueError:
+            raise HttpError(400, f"Query parameter {name} must be an integer")
+        if value < 0 or (maximum is not None and value > maximum):
+            raise HttpError(400, f"Query parameter {name} is out of range")
+        return value
+
+
+Handler = Callable[[Request], Awaitable[Any]]
+
+
+class Router:
+    """Маршруты вида /dishes/{id:int} → обработчик, возвращающий JSON-сериализуемые данные"""
+
+    def __init__(self):
+        self.routes: List[Tuple[str, re.Pattern, Handler]] = []
+
+    def get(self, pattern: str) -> Callable[[Handler], Handler]:
+        regex = re.sub(r"\{(\w+):int\}", r"(?P<\1>\\d+)", pattern)
+        regex = re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", regex)
+
+        def register(handler: Handler) -> Handler:
+            self.routes.append(("GET", re.compile(f"^{regex}$"), handler))
+            return handler
+
+        return register
+
+    def match(self, method: str, path: str) -> Tuple[Handler, Dict[str, str]]:
+        allowed = False
+        for route_method, regex, handler in self.routes:
+            found = regex.match(path)
+            if found:
+                if route_method == method:
+                    return handler, found.groupdict()
+                allowed = True
+        if allowed:
+            raise HttpError(405, "Method not allowed")
+        raise HttpError(404, "Not found")
+
+
+class JsonApp:
+    """Минимальное ASGI-приложение: JSON-ответы с ETag/If-None-Match и gzip"""
+
+    def __init__(self, router: Router, on_shutdown: Callable[[], Awaitable[None]] | None = None):
+        self.router = router
+        self.on_shutdown = on_shutdown
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        try:
+            handler, params = self.router.match(scope["method"], scope["path"])
+            request = Request(scope, params)
+            status, payload = 200, await handler(request)
+        except HttpError as exc:
+            request = Request(scope, {})
+            status, payload = exc.status, {"error": exc.message}
+
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        headers = [
+            (b"content-type", b"application/json; charset=utf-8"),
+            (b"etag", etag.encode()),
+            (b"vary", b"Accept-Encoding"),
+        ]
+
+        if status == 200 and _etag_matches(etag, request.headers.get("if-none-match", "")):
+            await _respond(send, 304, headers, b"")
+            return
+
+        if len(body) >= GZIP_MIN_SIZE and "gzip" in request.headers.get("accept-encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            headers.append((b"content-encoding", b"gzip"))
+
+        headers.append((b"content-length", str(len(body)).encode()))
+        await _respond(send, status, headers, body)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.on_shutdown:
+                    await self.on_shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",") if tag.strip()}
+    return etag in tags or "*" in tags
+
+
+async def _respond(send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
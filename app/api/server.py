@@ -0,0 +1,212 @@
+"""HTTP/JSON API поверх view-моделей для POS-терминалов и сайта.
+
+Запуск из каталога app: python -m api.server --port 8000
+"""
+import argparse
+import asyncio
+import inspect
+from functools import partial
+from typing import Any, Callable, Dict
+
+from api.http import HttpError, JsonApp, Request, Router
+from models.database import (
+    dispose_async_engines,
+    get_async_read_session,
+    get_async_session,
+    get_read_session,
+    get_session,
+    init_db,
+)
+from repositories.cached_repository import AsyncCachedRepository, CachedRepository, EntityCache
+from repositories.change_feed import CHANGE_FEED_ENABLED, ChangeFeed, ChangeInvalidator
+from repositories.cook_repository import AsyncCookRepository, CookRepository
+from repositories.dish_repository import AsyncDishRepository, DishRepository
+from repositories.ingredient_index import INDEX_ENABLED, IngredientIndex, with_ingredient_index
+from repositories.ingredient_repository import AsyncIngredientRepository, IngredientRepository
+from repositories.instrumentation import METRICS, install_query_events, with_instrumentation
+from repositories.nutrition import ROLLUP_ENABLED, NutritionRollup, with_nutrition_rollup
+from viewmodels.cook_viewmodel import CookListViewModel, CookViewModel
+from viewmodels.dish_viewmodel import DishListViewModel, DishViewModel
+from viewmodels.ingredient_viewmodel import IngredientViewModel
+from viewmodels.paginator import DEFAULT_PAGE_SIZE
+from viewmodels.query_pipeline import QUERY_EXECUTOR
+
+
+MAX_PAGE_SIZE = 200
+
+cache = EntityCache()
+install_query_events()
+ingredient_index = IngredientIndex(get_read_session) if INDEX_ENABLED else None
+nutrition_rollup = NutritionRollup(get_read_session) if ROLLUP_ENABLED else None
+# Записи приложения в других процессах сбрасывают кэш API через общую ленту изменений
+change_feed = ChangeFeed(get_session) if CHANGE_FEED_ENABLED else None
+if change_feed is not None:
+    change_feed.subscribe(ChangeInvalidator(cache, ingredient_index, nutrition_rollup))
+
+
+def with_derived_data(repository):
+    """Индекс ингредиентов и итоги пищевой ценности поверх репозитория блюд или ингредиентов"""
+    return with_nutrition_rollup(with_ingredient_index(repository, ingredient_index), nutrition_rollup)
+
+
+cook_repo = CachedRepository(with_instrumentation(CookRepository(get_session, get_read_session)), cache)
+dish_repo = CachedRepository(
+    with_derived_data(with_instrumentation(DishRepository(get_session, get_read_session))),
+    cache,
+)
+ingredient_repo = CachedRepository(
+    with_derived_data(with_instrumentation(IngredientRepository(get_session, get_read_session))),
+    cache,
+)
+
+# Списочные запросы ожидаются прямо в event loop через AsyncSession
+async_cook_repo = AsyncCachedRepository(
+    with_instrumentation(AsyncCookRepository(get_async_session, get_async_read_session)),
+    cache,
+)
+async_dish_repo = AsyncCachedRepository(
+    with_derived_data(with_instrumentation(AsyncDishRepository(get_async_session, get_async_read_session))),
+    cache,
+)
+async_ingredient_repo = AsyncCachedRepository(
+    with_derived_data(with_instrumentation(AsyncIngredientRepository(get_async_session, get_async_read_session))),
+    cache,
+)
+
+router = Router()
+
+
+async def run_query(query: Callable[[], Any]) -> Any:
+    """Корутины ожидаются в event loop, синхронные view-модели выполняются в пуле.
+    На каждый запрос создаётся своя view-модель: они хранят состояние."""
+    try:
+        if inspect.iscoroutinefunction(query):
+            return await query()
+        return await asyncio.get_running_loop().run_in_executor(QUERY_EXECUTOR, query)
+    except ValueError as exc:
+        raise HttpError(400, str(exc))
+
+
+def _page_size(request: Request) -> int:
+    return request.query_int("limit", DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE) or DEFAULT_PAGE_SIZE
+
+
+def _found(data: Dict[str, Any], entity: str) -> Dict[str, Any]:
+    if not data:
+        raise HttpError(404, f"{entity} not found")
+    return data
+
+
+@router.get("/dishes")
+async def list_dishes(request: Request):
+    async def query():
+        view_model = DishListViewModel(async_dish_repo)
+        next_cursor = await view_model.load_page(request.query.get("cursor"), _page_size(request))
+        return {"items": view_model.to_dict(), "next_cursor": next_cursor}
+
+    return await run_query(query)
+
+
+@router.get("/dishes/search")
+async def search_dishes(request: Request):
+    text = request.query.get("q", "")
+    if not text.strip():
+        raise HttpError(400, "Query parameter q is required")
+
+    async def query():
+        view_model = DishListViewModel(async_dish_repo)
+        next_cursor = await view_model.search_page(text, request.query.get("cursor"), _page_size(request))
+        return {"items": view_model.to_dict(), "next_cursor": next_cursor}
+
+    return await run_query(query)
+
+
+@router.get("/dishes/{dish_id:int}")
+async def dish_detail(request: Request):
+    def query():
+        view_model = DishViewModel(dish_repo)
+        view_model.load(request.int_param("dish_id"))
+        data = _found(view_model.to_dict(), "Dish")
+        data["cook_id"] = view_model.model.cook_id
+        data["ingredients"] = view_model.get_ingredients()
+        return data
+
+    return await run_query(query)
+
+
+@router.get("/cooks")
+async def list_cooks(request: Request):
+    async def query():
+        page = await async_cook_repo.find_page(_page_size(request), request.query.get("cursor"), order_by="name")
+        return {
+            "items": [{"id": cook.id, "name": cook.name, "bio": cook.bio} for cook in page.items],
+            "next_cursor": page.next_cursor,
+        }
+
+    return await run_query(query)
+
+
+@router.get("/cooks/top")
+async def top_cooks(request: Request):
+    limit = request.query_int("limit", 5, MAX_PAGE_SIZE)
+    return await run_query(partial(CookListViewModel(async_cook_repo).get_top_cooks, limit))
+
+
+@router.get("/cooks/{cook_id:int}")
+async def cook_detail(request: Request):
+    def query():
+        view_model = CookViewModel(cook_repo)
+        view_model.load(request.int_param("cook_id"))
+        return _found(view_model.to_dict(), "Cook")
+
+    return await run_query(query)
+
+
+@router.get("/ingredients")
+async def list_ingredients(request: Request):
+    async def query():
+        page = await async_ingredient_repo.find_page(
+            _page_size(request), request.query.get("cursor"), order_by="name"
+        )
+        return {
+            "items": [{"id": ingredient.id, "name": ingredient.name} for ingredient in page.items],
+            "next_cursor": page.next_cursor,
+        }
+
+    return await run_query(query)
+
+
+@router.get("/ingredients/{ingredient_id:int}")
+async def ingredient_detail(request: Request):
+    def query():
+        view_model = IngredientViewModel(ingredient_repo)
+        view_model.load(request.int_param("ingredient_id"))
+        return _found(view_model.to_dict(), "Ingredient")
+
+    return await run_query(query)
+
+
+@router.get("/metrics")
+async def metrics(request: Request):
+    return METRICS.snapshot()
+
+
+app = JsonApp(router, on_shutdown=dispose_async_engines)
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    init_db()
+    if change_feed is not None:
+        change_feed.start()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Прогон набора репозиторных операций на SQLite и на локально запущенном PostgreSQL.
+
+Проверяет, что операции дают одинаковые результаты на обоих бэкендах, и
+сравнивает задержку. PostgreSQL поднимается во временном каталоге через
+initdb/pg_ctl (нужны бинарники PostgreSQL и psycopg2); если их нет,
+прогоняется только SQLite. Вместо запуска своего сервера можно указать
+готовую пустую БД через DISH_MENU_PG_URL.
+
+Запуск из каталога app: python -m benchmarks.backend_matrix --repeat 200
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base, create_db_engine
+from models.dishes import Cook, Dish
+import models.search  # noqa: F401  (FTS5-таблица для SQLite)
+from repositories.cook_repository import CookRepository
+from repositories.dish_repository import DishRepository
+from repositories.ingredient_repository import IngredientRepository
+
+
+def _session_factory(engine):
+    factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    @contextmanager
+    def get_session():
+        session = factory()
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    return get_session
+
+
+def _find_pg_binary(name: str) -> str | None:
+    found = shutil.which(name)
+    if found:
+        return found
+    candidates = sorted(glob.glob(f"/usr/lib/postgresql/*/bin/{name}"))
+    return candidates[-1] if candidates else None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_postgres() -> Iterator[str | None]:
+    """Временный кластер PostgreSQL на unix-сокете; отдаёт URL или None, если запустить нельзя"""
+    if os.environ.get("DISH_MENU_PG_URL"):
+        yield os.environ["DISH_MENU_PG_URL"]
+        return
+
+    initdb, pg_ctl = _find_pg_binary("initdb"), _find_pg_binary("pg_ctl")
+    if not initdb or not pg_ctl:
+        yield None
+        return
+
+    tmp = Path(tempfile.mkdtemp(prefix="dish_menu_pg_"))
+    data_dir = tmp / "data"
+    port = _free_port()
+    try:
+        subprocess.run(
+            [initdb, "-D", str(data_dir), "-A", "trust", "-U", "postgres", "--no-sync"],
+            check=True,
+            capture_output=True,
+        )
+        subprocess.run(
+            [
+                pg_ctl, "-D", str(data_dir), "-l", str(tmp / "server.log"), "-w",
+                "-o", f"-p {port} -k {tmp} -c listen_addresses='' -c fsync=off",
+                "start",
+            ],
+            check=True,
+            capture_output=True,
+        )
+        yield f"postgresql+psycopg2://postgres@/postgres?host={tmp}&port={port}"
+    finally:
+        if (data_dir / "postmaster.pid").exists():
+            subprocess.run([pg_ctl, "-D", str(data_dir), "-m", "fast", "stop"], capture_output=True)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _seed(cooks: CookRepository, dishes: DishRepository, ingredients: IngredientRepository, size: int) -> None:
+    cook_ids = [cooks.add(Cook(name=f"Cook {i:04d}", bio="bio")).id for i in range(max(size // 20, 1))]
+    ingredient_ids = [ing.id for ing in ingredients.bulk_add_ingredients([f"ingredient_{i:03d}" for i in range(50)])]
+    for i in range(size):
+        dish = dishes.add(
+            Dish(
+                name=f"Dish {i:05d}",
+                description=f"tasty dish number {i}",
+                recipe="mix_and_bake 100%",
+                cook_id=cook_ids[i % len(cook_ids)],
+            )
+        )
+        for offset in range(3):
+            dishes.add_or_update_ingredient(dish.id, ingredient_ids[(i + offset * 7) % 50], 10.0 * (offset + 1))
+
+
+def _operations(
+    cooks: CookRepository, dishes: DishRepository, ingredients: IngredientRepository
+) -> List[Tuple[str, Callable[[], object], bool]]:
+    """(имя, операция, сравнивать ли результат между бэкендами)"""
+    return [
+        ("find_page_by_name", lambda: [d.id for d in dishes.find_page(20, order_by="name").items], True),
+        ("find_one_or_none", lambda: dishes.find_one_or_none(7).name, True),
+        ("find_by_name", lambda: sorted(d.id for d in dishes.find_by_name("Dish 001")), True),
+        ("find_by_name_escaped", lambda: sorted(d.id for d in dishes.find_by_name("100%")), True),
+        ("search", lambda: len(dishes.search("tasty", limit=20)), False),
+        ("find_by_ingredient", lambda: sorted(d.id for d in dishes.find_by_ingredient(1)), True),
+        ("get_ingredients", lambda: sorted((i.id, w) for i, w in dishes.get_ingredients(3)), True),
+        ("get_top_cooks", lambda: sorted(count for _, count in cooks.get_top_cooks(5)), True),
+        ("get_dishes_by_cook_id", lambda: sorted(d.id for d in cooks.get_dishes_by_cook_id(1)), True),
+        ("ingredient_get_dishes", lambda: sorted(d.id for d in ingredients.get_dishes(2)), True),
+        ("add_or_update_ingredient", lambda: dishes.add_or_update_ingredient(5, 1, 42.0), True),
+        ("set_ingredients", lambda: dishes.set_ingredients(6, [(1, 5.0), (2, 7.5), (3, 1.0)]), True),
+        ("bulk_add_ingredients", lambda: len(ingredients.bulk_add_ingredients(["ingredient_001", "salt"])), True),
+    ]
+
+
+def run_backend(url: str, size: int, repeat: int) -> Tuple[Dict[str, dict], Dict[str, object]]:
+    engine = create_db_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = _session_factory(engine)
+    cooks = CookRepository(session_factory)
+    dishes = DishRepository(session_factory)
+    ingredients = IngredientRepository(session_factory)
+    _seed(cooks, dishes, ingredients, size)
+
+    timings: Dict[str, dict] = {}
+    results: Dict[str, object] = {}
+    for name, operation, compare in _operations(cooks, dishes, ingredients):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = operation()
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        timings[name] = {
+            "mean_ms": round(statistics.fmean(samples), 3),
+            "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        }
+        if compare:
+            results[name] = result
+
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+    return timings, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=500, help="Number of dishes to seed")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    report: Dict[str, dict] = {}
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        report["sqlite"], results["sqlite"] = run_backend(f"sqlite:///{Path(tmp) / 'matrix.db'}", args.size, args.repeat)
+
+    with local_postgres() as pg_url:
+        if pg_url:
+            report["postgresql"], results["postgresql"] = run_backend(pg_url, args.size, args.repeat)
+        else:
+            report["postgresql"] = "skipped: initdb/pg_ctl not found and DISH_MENU_PG_URL not set"
+
+    mismatches = []
+    if "postgresql" in results:
+        mismatches = [
+            name for name, value in results["sqlite"].items() if results["postgresql"].get(name) != value
+        ]
+    report["mismatches"] = mismatches
+    print(json.dumps(report, indent=2))
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Сравнение пропускной способности записи и чтения SQLite до и после тюнинга движка.
+
+Запуск из каталога app: python -m benchmarks.engine_profile --writes 2000 --reads 5000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base, BASELINE_PROFILE, DEFAULT_PROFILE, EngineProfile, create_db_engine
+from models.dishes import Dish
+from repositories.dish_repository import DishRepository
+
+
+def _session_factory(engine):
+    factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    @contextmanager
+    def get_session():
+        session = factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    return get_session
+
+
+def run_profile(profile: EngineProfile, writes: int, reads: int, threads: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = create_db_engine(url, profile)
+        Base.metadata.create_all(engine)
+        repo = DishRepository(_session_factory(engine))
+
+        # Запись: одна транзакция на блюдо, как при добавлении из UI
+        started = time.perf_counter()
+        for i in range(writes):
+            repo.add(Dish(name=f"Dish {i}", description="bench", recipe="bench"))
+        write_elapsed = time.perf_counter() - started
+
+        rng = random.Random(42)
+        ids = [rng.randint(1, writes) for _ in range(reads)]
+
+        def read(dish_id: int) -> None:
+            repo.find_one_or_none(dish_id)
+            repo.find_page(20, order_by="id")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(read, ids))
+        read_elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    return {
+        "writes_per_sec": round(writes / write_elapsed, 1),
+        "reads_per_sec": round(reads / read_elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    results = {
+        "baseline": run_profile(BASELINE_PROFILE, args.writes, args.reads, args.threads),
+        "tuned": run_profile(DEFAULT_PROFILE, args.writes, args.reads, args.threads),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
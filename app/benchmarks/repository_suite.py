@@ -0,0 +1,398 @@
+"""Бенчмарки всех публичных методов репозиториев и to_dict() view-моделей на 1k/100k/1M блюд.
+
+База каждого размера сидируется детерминированно (transfer.synthetic) один раз и
+хранится в --data-dir: сидирование 1M блюд идёт десятки минут, прогоны — на копии,
+поэтому записи не меняют кэш. Набор падает, если у BaseRepository, DishRepository,
+CookRepository или IngredientRepository появился публичный метод без замера.
+Результат — JSON; с --compare печатается отношение медиан к прошлому прогону.
+
+Запуск из каталога app:
+python -m benchmarks.repository_suite --scales 1000,100000 --output bench.json --compare old.json
+"""
+import argparse
+import inspect
+import json
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from models.database import BASE_DIR, create_db_engine
+from models.dishes import Cook, Dish, Ingredient, dish_ingredient
+from models.migrations import init_schema
+from repositories.cook_repository import CookRepository
+from repositories.dish_filter import DishFilter, IngredientCondition
+from repositories.dish_repository import DishRepository
+from repositories.ingredient_repository import IngredientRepository
+from repositories.repository import BaseRepository
+from transfer.importer import MenuImporter
+from transfer.synthetic import DEFAULT_SEED, SyntheticMenu
+from viewmodels.cook_viewmodel import CookViewModel
+from viewmodels.dish_viewmodel import DishListViewModel, DishViewModel
+from viewmodels.ingredient_viewmodel import IngredientViewModel
+
+
+REPOSITORY_CLASSES = (BaseRepository, DishRepository, CookRepository, IngredientRepository)
+DEFAULT_SCALES = "1000,100000,1000000"
+DEFAULT_DATA_DIR = BASE_DIR / "benchmarks" / "data"
+# Замеры с отклонением медианы больше порога отмечаются при сравнении
+REGRESSION_RATIO = 1.2
+
+
+class Case(NamedTuple):
+    """prepare(i) готовит i-й прогон вне замера и возвращает замеряемый вызов"""
+
+    name: str
+    target: str
+    prepare: Callable[[int], Callable[[], Any]]
+
+
+def _session_factory(engine):
+    factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    @contextmanager
+    def get_session():
+        session = factory()
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    return get_session
+
+
+def menu_for(dishes: int, seed: int) -> SyntheticMenu:
+    return SyntheticMenu(
+        cooks=max(10, dishes // 100),
+        ingredients=min(max(50, dishes // 20), 5000),
+        dishes=dishes,
+        seed=seed,
+    )
+
+
+def seeded_database(data_dir: Path, dishes: int, seed: int) -> Path:
+    """Файл БД размера dishes; строится во временный файл, чтобы прерванное сидирование не попало в кэш"""
+    path = data_dir / f"menu_{dishes}_{seed}.db"
+    if path.exists():
+        return path
+    data_dir.mkdir(parents=True, exist_ok=True)
+    partial_path = path.with_suffix(".partial")
+    partial_path.unlink(missing_ok=True)
+    engine = create_db_engine(f"sqlite:///{partial_path}")
+    init_schema(engine)
+    menu = menu_for(dishes, seed)
+    started = time.perf_counter()
+    importer = MenuImporter(_session_factory(engine))
+    importer.import_cooks(menu.cook_records())
+    importer.import_ingredients(menu.ingredient_records())
+    importer.import_dishes(menu.dish_records())
+    engine.dispose()
+    partial_path.rename(path)
+    print(f"seeded {dishes} dishes in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return path
+
+
+def required_targets() -> List[str]:
+    return sorted(
+        function.__qualname__
+        for cls in REPOSITORY_CLASSES
+        for name, function in vars(cls).items()
+        if inspect.isfunction(function) and not name.startswith("_")
+    )
+
+
+class Fixture:
+    """Репозитории над рабочей копией и детерминированно выбранные id"""
+
+    def __init__(self, engine, menu: SyntheticMenu, seed: int):
+        session_factory = _session_factory(engine)
+        self.session_factory = session_factory
+        self.dishes = DishRepository(session_factory)
+        self.cooks = CookRepository(session_factory)
+        self.ingredients = IngredientRepository(session_factory)
+        rng = random.Random(seed)
+        with session_factory() as session:
+            max_dish_id = session.scalar(select(func.max(Dish.id)))
+            ingredient_ids = dict(session.execute(select(Ingredient.name, Ingredient.id)).all())
+            cook_ids = dict(session.execute(select(Cook.name, Cook.id)).all())
+            self.dish_ids = [rng.randint(1, max_dish_id) for _ in range(64)]
+            # Самый частый ингредиент и ингредиент из середины распределения
+            self.popular_ingredient = ingredient_ids[menu.ingredient_name(0)]
+            self.common_ingredient = ingredient_ids[menu.ingredient_name(menu.ingredients // 10)]
+            self.top_cook = cook_ids[menu.cook_name(0)]
+            self.cook_ids = [cook_ids[menu.cook_name(rng.randrange(menu.cooks))] for _ in range(64)]
+            links = dish_ingredient.c
+            self.common_dish_ids = frozenset(
+                session.scalars(select(links.dish_id).where(links.ingredient_id == self.common_ingredient))
+            )
+            self.links = session.execute(
+                select(links.dish_id, links.ingredient_id, links.weight).where(links.dish_id.in_(self.dish_ids))
+            ).all()
+        self.serial = 0
+
+    def dish(self, i: int) -> int:
+        return self.dish_ids[i % len(self.dish_ids)]
+
+    def unique(self, prefix: str) -> str:
+        self.serial += 1
+        return f"bench {prefix} {self.serial}"
+
+    def new_dish(self) -> Dish:
+        return self.dishes.add(Dish(name=self.unique("dish"), description="bench", recipe="bench"))
+
+
+def repository_cases(f: Fixture) -> List[Case]:
+    dishes, cooks, ingredients = f.dishes, f.cooks, f.ingredients
+    list_options = DishRepository.LIST_OPTIONS
+    common_filter = DishFilter(
+        include=(IngredientCondition(f.common_ingredient),), exclude=frozenset({f.popular_ingredient})
+    )
+    first_page = dishes.find_page(50, order_by="name", options=list_options)
+
+    def case(repository, method: str, prepare, label: str = "") -> Case:
+        target = getattr(type(repository), method).__qualname__
+        return Case(f"{repository.model.__tablename__}.{method}{label}", target, prepare)
+
+    def link(i: int):
+        return f.links[i % len(f.links)]
+
+    def removable_link(i: int):
+        dish_id, ingredient_id, weight = link(i)
+        dishes.add_or_update_ingredient(dish_id, ingredient_id, weight)
+        return partial(dishes.remove_ingredient, dish_id, ingredient_id)
+
+    def versioned_update(i: int):
+        dish_id = f.dish(i)
+        version = dishes.find_one_or_none(dish_id).version
+        return partial(dishes.update_versioned, dish_id, version, description=f.unique("description"))
+
+    def dish_edits(i: int):
+        """Сохранение карточки: поле, новый вес одного ингредиента и удаление другого"""
+        dish_id = f.dish(i)
+        dish_links = [(ingredient_id, weight) for d, ingredient_id, weight in f.links if d == dish_id]
+        (changed, weight), (removed, removed_weight) = dish_links[0], dish_links[-1]
+        dishes.add_or_update_ingredient(dish_id, removed, removed_weight)
+        version = dishes.find_one_or_none(dish_id).version
+        return partial(
+            dishes.apply_edits, dish_id, version, {"recipe": f.unique("recipe")}, {changed: weight + 5}, [removed]
+        )
+
+    def dish_ingredients(i: int):
+        dish_id = f.dish(i)
+        weights = [(ingredient_id, weight + 5) for d, ingredient_id, weight in f.links if d == dish_id]
+        return partial(dishes.set_ingredients, dish_id, weights)
+
+    return [
+        # BaseRepository: справочники — на поварах, тяжёлые выборки — на блюдах
+        case(cooks, "find_all", lambda i: cooks.find_all),
+        case(dishes, "find_columns", lambda i: partial(dishes.find_columns, Dish.id, Dish.name, order_by=Dish.name)),
+        case(dishes, "find_page", lambda i: partial(dishes.find_page, 50, order_by="name", options=list_options)),
+        case(
+            dishes,
+            "find_page",
+            lambda i: partial(dishes.find_page, 50, first_page.next_cursor, order_by="name", options=list_options),
+            "(cursor)",
+        ),
+        case(dishes, "find_one_or_none", lambda i: partial(dishes.find_one_or_none, f.dish(i))),
+        case(dishes, "find_by_ids", lambda i: partial(dishes.find_by_ids, f.dish_ids[:20], list_options)),
+        case(dishes, "find_by_name", lambda i: partial(dishes.find_by_name, "golden tomato")),
+        case(cooks, "add", lambda i: partial(cooks.add, Cook(name=f.unique("cook"), bio="bench"))),
+        case(dishes, "update", lambda i: partial(dishes.update, f.dish(i), description=f.unique("description"))),
+        case(
+            dishes,
+            "update_fields",
+            lambda i: partial(dishes.update_fields, f.dish(i), {"description": f.unique("description")}),
+        ),
+        case(dishes, "update_versioned", versioned_update),
+        case(dishes, "delete", lambda i: partial(dishes.delete, f.new_dish())),
+        case(dishes, "delete_by_id", lambda i: partial(dishes.delete_by_id, f.new_dish().id)),
+        # DishRepository
+        case(
+            dishes,
+            "find_by_ingredient",
+            lambda i: partial(dishes.find_by_ingredient, f.common_ingredient, list_options),
+        ),
+        case(
+            dishes,
+            "find_by_ingredient",
+            lambda i: partial(dishes.find_by_ingredient, f.popular_ingredient, list_options),
+            "(popular)",
+        ),
+        case(dishes, "filter_page", lambda i: partial(dishes.filter_page, common_filter, 50, None, list_options)),
+        case(
+            dishes,
+            "filter_page_within",
+            lambda i: partial(dishes.filter_page_within, f.common_dish_ids, frozenset(), 50, None, list_options),
+        ),
+        case(dishes, "search", lambda i: partial(dishes.search, "tomato soup", 50, 0, list_options)),
+        case(
+            dishes,
+            "add_or_update_ingredient",
+            lambda i: partial(dishes.add_or_update_ingredient, *link(i)[:2], 10.0 + i % 7),
+        ),
+        case(dishes, "set_ingredients", dish_ingredients),
+        case(dishes, "apply_edits", dish_edits),
+        case(dishes, "get_ingredients", lambda i: partial(dishes.get_ingredients, f.dish(i))),
+        case(dishes, "get_nutrition", lambda i: partial(dishes.get_nutrition, f.dish(i))),
+        case(dishes, "remove_ingredient", removable_link),
+        case(dishes, "get_available_cooks", lambda i: dishes.get_available_cooks),
+        case(dishes, "get_available_ingredients", lambda i: dishes.get_available_ingredients),
+        case(dishes, "set_dish_cook", lambda i: partial(dishes.set_dish_cook, f.dish(i), f.cook_ids[i % 64])),
+        # CookRepository
+        case(cooks, "get_top_cooks", lambda i: partial(cooks.get_top_cooks, 5)),
+        case(cooks, "get_dishes_by_cook_id", lambda i: partial(cooks.get_dishes_by_cook_id, f.cook_ids[i % 64])),
+        case(
+            cooks,
+            "get_dishes_by_cook_id",
+            lambda i: partial(cooks.get_dishes_by_cook_id, f.top_cook),
+            "(top)",
+        ),
+        # IngredientRepository
+        case(ingredients, "get_dishes", lambda i: partial(ingredients.get_dishes, f.common_ingredient)),
+        case(ingredients, "find_dishes_by_ids", lambda i: partial(ingredients.find_dishes_by_ids, f.dish_ids[:20])),
+        case(
+            ingredients,
+            "bulk_add_ingredients",
+            lambda i: partial(ingredients.bulk_add_ingredients, [f.unique("ingredient"), "Salt"]),
+        ),
+    ]
+
+
+def view_model_cases(f: Fixture) -> List[Case]:
+    """to_dict() в том виде, как его вызывают API и экраны; загрузка модели — вне замера"""
+
+    def loaded(view_model, model_id: int):
+        view_model.load(model_id)
+        return view_model.to_dict
+
+    def dish_list(i: int):
+        view_model = DishListViewModel(None)
+        view_model.dishes = f.dishes.find_page(50, order_by="name", options=DishRepository.LIST_OPTIONS).items
+        return view_model.to_dict
+
+    return [
+        Case("DishViewModel.to_dict", "DishViewModel.to_dict", lambda i: loaded(DishViewModel(f.dishes), f.dish(i))),
+        Case("DishListViewModel.to_dict", "DishListViewModel.to_dict", dish_list),
+        Case(
+            "CookViewModel.to_dict",
+            "CookViewModel.to_dict",
+            lambda i: loaded(CookViewModel(f.cooks), f.cook_ids[i % 64]),
+        ),
+        Case(
+            "IngredientViewModel.to_dict",
+            "IngredientViewModel.to_dict",
+            lambda i: loaded(IngredientViewModel(f.ingredients), f.common_ingredient),
+        ),
+    ]
+
+
+def measure(case: Case, repeat: int, budget: float) -> Dict[str, Any]:
+    """Первый прогон — прогрев; дальше repeat прогонов, но не дольше budget секунд"""
+    case.prepare(0)()
+    samples: List[float] = []
+    deadline = time.perf_counter() + budget
+    for i in range(1, repeat + 1):
+        call = case.prepare(i)
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+        if time.perf_counter() > deadline:
+            break
+    samples.sort()
+    return {
+        "target": case.target,
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min_ms": round(samples[0], 4),
+    }
+
+
+def run_scale(data_dir: Path, dishes: int, seed: int, repeat: int, budget: float) -> Dict[str, Any]:
+    source = seeded_database(data_dir, dishes, seed)
+    work = data_dir / "work.db"
+    shutil.copyfile(source, work)
+    engine = create_db_engine(f"sqlite:///{work}")
+    # Кэшированная БД могла быть построена до новых миграций
+    init_schema(engine)
+    try:
+        fixture = Fixture(engine, menu_for(dishes, seed), seed)
+        cases = repository_cases(fixture)
+        missing = sorted(set(required_targets()) - {case.target for case in cases})
+        if missing:
+            sys.exit(f"Public repository methods without a benchmark: {', '.join(missing)}")
+        results = {}
+        for case in cases + view_model_cases(fixture):
+            results[case.name] = measure(case, repeat, budget)
+            print(f"{dishes:>8} {case.name:45} {results[case.name]['median_ms']:>10.3f} ms", file=sys.stderr)
+        return results
+    finally:
+        engine.dispose()
+        for path in data_dir.glob("work.db*"):
+            path.unlink()
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=BASE_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Отношение медиан текущего прогона к прошлому по каждому размеру и замеру"""
+    print(f"compared with {baseline.get('commit')}", file=sys.stderr)
+    for scale, results in current["scales"].items():
+        previous = baseline.get("scales", {}).get(scale, {})
+        for name, result in results.items():
+            if name not in previous:
+                continue
+            ratio = result["median_ms"] / max(previous[name]["median_ms"], 1e-6)
+            mark = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+            print(f"{scale:>8} {name:45} x{ratio:6.2f}{mark}", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="Comma-separated dish counts")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per benchmark")
+    parser.add_argument("--budget", type=float, default=3.0, help="Seconds per benchmark before stopping early")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR, help="Cache of seeded databases")
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file")
+    parser.add_argument("--compare", type=Path, help="Previous JSON results to compare with")
+    args = parser.parse_args()
+
+    report = {
+        "commit": _git_commit(),
+        "seed": args.seed,
+        "scales": {
+            scale: run_scale(args.data_dir, int(scale), args.seed, args.repeat, args.budget)
+            for scale in args.scales.split(",")
+        },
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
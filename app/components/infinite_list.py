@@ -0,0 +1,46 @@
+from typing import Awaitable, Callable, Tuple
+
+import flet as ft
+
+from styles import MARGIN
+
+
+LOAD_MORE_THRESHOLD = 200
+
+
+def create_infinite_list(
+    on_load_more: Callable[[], Awaitable[None]], spacing: int = MARGIN, **kwargs
+) -> Tuple[ft.ListView, ft.Control]:
+    """ListView, который запрашивает следующую страницу при прокрутке к концу, и кнопка
+    "Load more" для его конца: если первая страница не заполняет окно, прокрутки не будет.
+    Кнопку показывает KeyedList (footer), пока есть следующие страницы."""
+    loading = False
+
+    async def load_more():
+        nonlocal loading
+        # Пока страница грузится, прокрутка и кнопка её не запрашивают повторно
+        if loading:
+            return
+        loading = True
+        try:
+            await on_load_more()
+        finally:
+            loading = False
+
+    async def handle_scroll(e: ft.OnScrollEvent):
+        if e.max_scroll_extent is None or e.pixels is None:
+            return
+        if e.pixels >= e.max_scroll_extent - LOAD_MORE_THRESHOLD:
+            await load_more()
+
+    async def handle_click(e):
+        await load_more()
+
+    list_view = ft.ListView(
+        expand=True,
+        spacing=spacing,
+        on_scroll=handle_scroll,
+        on_scroll_interval=100,
+        **kwargs,
+    )
+    return list_view, ft.TextButton("Load more", on_click=handle_click, visible=False)
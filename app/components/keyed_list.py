@@ -0,0 +1,90 @@
+from typing import Any, Callable, Generic, Hashable, Iterable, TypeVar
+
+import flet as ft
+
+
+T = TypeVar("T")
+
+
+class KeyedList(Generic[T]):
+    """Согласование элементов списка по ключу вместо clear() и полного пересоздания.
+
+    Контрол строки переиспользуется, если её ключ и сигнатура не изменились, поэтому
+    Flet отправляет клиенту только вставленные, удалённые и изменённые элементы.
+    footer всегда стоит последним и виден, пока footer_visible() истинно.
+    """
+
+    def __init__(
+        self,
+        container: ft.ListView | ft.Column,
+        key: Callable[[T], Hashable],
+        build: Callable[[T], ft.Control],
+        signature: Callable[[T], Any],
+        footer: ft.Control | None = None,
+        footer_visible: Callable[[], bool] = lambda: True,
+    ):
+        self.container = container
+        self.key = key
+        self.build = build
+        self.signature = signature
+        self.footer = footer
+        self.footer_visible = footer_visible
+
+    def reconcile(self, rows: Iterable[T]) -> bool:
+        """Приведение контролов к rows; возвращает True, если что-то изменилось"""
+        old_controls = [control for control in self.container.controls if control is not self.footer]
+        existing = {
+            control.data[0]: control
+            for control in old_controls
+            if isinstance(control.data, tuple)
+        }
+
+        new_controls = []
+        for row in rows:
+            key = self.key(row)
+            signature = self.signature(row)
+            control = existing.get(key)
+            if control is None or control.data[1] != signature:
+                control = self._build(row, key, signature)
+            new_controls.append(control)
+
+        changed = len(new_controls) != len(old_controls) or any(
+            new is not old for new, old in zip(new_controls, old_controls)
+        )
+        if changed:
+            self.container.controls = new_controls + ([self.footer] if self.footer else [])
+        if self._update_footer() or changed:
+            self._push()
+        return changed
+
+    def append(self, rows: Iterable[T]) -> None:
+        """Добавление строк в конец списка (подгрузка следующей страницы)"""
+        added = [self._build(row, self.key(row), self.signature(row)) for row in rows]
+        if added:
+            controls = self.container.controls
+            position = len(controls) - 1 if self.footer and controls and controls[-1] is self.footer else len(controls)
+            controls[position:position] = added
+        if self._update_footer() or added:
+            self._push()
+
+    def _update_footer(self) -> bool:
+        """Видимость footer по footer_visible(); True, если она изменилась"""
+        if self.footer is None:
+            return False
+        if self.footer not in self.container.controls:
+            self.container.controls.append(self.footer)
+        visible = bool(self.footer_visible())
+        if self.footer.visible == visible:
+            return False
+        self.footer.visible = visible
+        return True
+
+    def _build(self, row: T, key: Hashable, signature: Any) -> ft.Control:
+        control = self.build(row)
+        control.data = (key, signature)
+        return control
+
+    def _push(self) -> None:
+        # До монтирования на страницу изменения уйдут с ближайшим page.update()
+        if self.container.page:
+            self.container.update()
@@ -0,0 +1,224 @@
+"""Нагрузочный тест веб-версии: сотни одновременных сессий браузера.
+
+Каждая сессия подключается к websocket Flet (/ws) как браузер, ждёт первой
+отрисовки списка поваров и переходит по разделам меню. Затем тест меняет имя
+самого популярного повара прямо в БД и замеряет, через сколько оно появляется
+во всех открытых списках — то есть во всех воркерах, через ленту изменений.
+Имя повара в конце восстанавливается. Нужен пакет websockets (входит в flet[web]).
+
+Запуск из каталога app (на ту же БД, что и python -m deploy.web):
+python -m deploy.load_test --url ws://127.0.0.1:8550/ws --sessions 300
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from typing import Dict, List
+
+from models.database import get_read_session, get_session
+from repositories.cook_repository import CookRepository
+
+
+# Раздел меню -> текст, по которому видно, что экран отрисован
+SECTIONS = {0: "Add New Cook", 1: "Add New Dish", 2: "Bulk Add"}
+
+PAGE_MEDIA = json.dumps(
+    {
+        name: {"left": 0, "top": 0, "right": 0, "bottom": 0}
+        for name in ("padding", "view_padding", "view_insets")
+    }
+)
+
+
+class BrowserSession:
+    """Одна вкладка браузера: протокол веб-клиента Flet поверх websocket"""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout
+        self.navigation_id: str | None = None
+        self._socket = None
+        self._reader: asyncio.Task | None = None
+        # (время получения, текст сообщения)
+        self._messages: List[tuple] = []
+        self._received = asyncio.Condition()
+
+    async def open(self) -> float:
+        """Подключение и регистрация; возвращает время до отрисовки первого экрана, мс"""
+        import websockets
+
+        started = time.perf_counter()
+        self._socket = await websockets.connect(self.url, max_size=None, open_timeout=self.timeout)
+        self._reader = asyncio.create_task(self._read())
+        await self._send(
+            "registerWebClient",
+            {
+                "pageName": "",
+                "pageRoute": "/",
+                "pageWidth": "1280",
+                "pageHeight": "800",
+                "windowWidth": "1280",
+                "windowHeight": "800",
+                "windowTop": "0",
+                "windowLeft": "0",
+                "isPWA": "false",
+                "isWeb": "true",
+                "isDebug": "false",
+                "platform": "linux",
+                "platformBrightness": "light",
+                "media": PAGE_MEDIA,
+                "sessionId": None,
+            },
+        )
+        await self.wait_for(SECTIONS[0], since=started)
+        return (time.perf_counter() - started) * 1000
+
+    async def navigate(self, index: int) -> float:
+        """Переход по NavigationRail; время до отрисовки раздела, мс"""
+        started = time.perf_counter()
+        await self._send("updateControlProps", {"props": [{"i": self.navigation_id, "selectedindex": str(index)}]})
+        await self._send(
+            "pageEventFromWeb",
+            {"eventTarget": self.navigation_id, "eventName": "change", "eventData": str(index)},
+        )
+        await self.wait_for(SECTIONS[index], since=started)
+        return (time.perf_counter() - started) * 1000
+
+    async def wait_for(self, text: str, since: float) -> float:
+        """Ожидание сообщения с text, полученного после since; возвращает время его получения"""
+
+        def received_at():
+            for at, message in reversed(self._messages):
+                if at < since:
+                    return None
+                if text in message:
+                    return at
+            return None
+
+        async with self._received:
+            await asyncio.wait_for(self._received.wait_for(received_at), self.timeout)
+            return received_at()
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._socket is not None:
+            await self._socket.close()
+
+    async def _send(self, action: str, payload: Dict) -> None:
+        await self._socket.send(json.dumps({"action": action, "payload": payload}))
+
+    async def _read(self) -> None:
+        async for message in self._socket:
+            at = time.perf_counter()
+            if self.navigation_id is None and "navigationrail" in message:
+                self.navigation_id = _find_control(json.loads(message), "navigationrail")
+            async with self._received:
+                self._messages.append((at, message))
+                self._received.notify_all()
+
+
+def _find_control(message, control_type: str) -> str | None:
+    """id первого элемента управления типа control_type в сообщении (или пакете сообщений)"""
+    if isinstance(message, list):
+        items = message
+    elif isinstance(message, dict):
+        if message.get("t") == control_type:
+            return message.get("i")
+        items = list(message.values())
+    else:
+        return None
+    for item in items:
+        found = _find_control(item, control_type)
+        if found:
+            return found
+    return None
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "median_ms": round(statistics.median(samples), 1),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+        "max_ms": round(samples[-1], 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict]:
+    sessions = [BrowserSession(args.url, args.timeout) for _ in range(args.sessions)]
+    first_render: List[float] = []
+    navigation: List[float] = []
+    errors: Dict[str, int] = {}
+
+    def failed(exc: BaseException) -> None:
+        name = type(exc).__name__
+        errors[name] = errors.get(name, 0) + 1
+
+    async def browse(i: int, session: BrowserSession) -> bool:
+        # Подключения равномерно распределены по --ramp секундам
+        await asyncio.sleep(args.ramp * i / max(len(sessions), 1))
+        try:
+            first_render.append(await session.open())
+            for _ in range(args.rounds):
+                for index in (1, 2, 0):
+                    navigation.append(await session.navigate(index))
+            return True
+        except Exception as exc:
+            failed(exc)
+            return False
+
+    results = await asyncio.gather(*(browse(i, session) for i, session in enumerate(sessions)))
+    on_cook_list = [session for session, ok in zip(sessions, results) if ok]
+
+    # Все живые сессии стоят на списке поваров; имя лучшего повара видно в каждой
+    repository = CookRepository(get_session, get_read_session)
+    top = repository.get_top_cooks(1)
+    propagation: List[float] = []
+    if top and on_cook_list:
+        cook = top[0][0]
+        try:
+            for _ in range(args.writes):
+                # Метка только из ASCII: сервер может экранировать остальные символы имени в JSON
+                marker = uuid.uuid4().hex[:12]
+                written = time.perf_counter()
+                await asyncio.to_thread(repository.update_fields, cook.id, {"name": f"{cook.name} [{marker}]"})
+                waits = await asyncio.gather(
+                    *(session.wait_for(marker, since=written) for session in on_cook_list),
+                    return_exceptions=True,
+                )
+                for received in waits:
+                    if isinstance(received, BaseException):
+                        failed(received)
+                    else:
+                        propagation.append((received - written) * 1000)
+        finally:
+            repository.update_fields(cook.id, {"name": cook.name})
+
+    await asyncio.gather(*(session.close() for session in sessions), return_exceptions=True)
+    return {
+        "sessions": {"requested": len(sessions), "completed": len(on_cook_list), "errors": errors},
+        "first_render": _summary(first_render),
+        "navigation": _summary(navigation),
+        "propagation": _summary(propagation),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://127.0.0.1:8550/ws", help="Flet websocket endpoint")
+    parser.add_argument("--sessions", type=int, default=300, help="Concurrent browser sessions")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Seconds over which sessions connect")
+    parser.add_argument("--rounds", type=int, default=2, help="Navigation rounds per session")
+    parser.add_argument("--writes", type=int, default=5, help="Writes whose propagation is measured")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for any screen update")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
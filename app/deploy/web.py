@@ -0,0 +1,52 @@
+"""Веб-версия приложения в нескольких процессах-воркерах.
+
+Воркеры uvicorn слушают один сокет, и ядро распределяет между ними
+подключения браузеров; сессия страницы живёт в том воркере, куда пришло её
+websocket-подключение. Кэши, индекс ингредиентов и открытые списки воркеров
+согласуются через ленту изменений в общей БД (repositories.change_feed).
+Нужен пакет flet[web]: pip install "flet[web]==0.28.3".
+
+Запуск из каталога app: python -m deploy.web --workers 4 --port 8550
+"""
+import argparse
+import os
+
+# Воркеры импортируют этот модуль заново: лента нужна каждому из них
+os.environ.setdefault("DISH_MENU_CHANGE_FEED", "1")
+
+import flet as ft  # noqa: E402
+from sqlalchemy import make_url  # noqa: E402
+
+import main  # noqa: E402
+from models.database import BASE_DIR, DATABASE_URL, init_db  # noqa: E402
+
+
+app = ft.app(target=main.main, assets_dir=str(BASE_DIR / "assets"), export_asgi_app=True)
+
+
+def run() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8550)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    url = make_url(DATABASE_URL)
+    if args.workers > 1 and url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        parser.error("In-memory SQLite cannot be shared between workers")
+    # Миграции один раз до запуска воркеров, а не наперегонки из первых сессий каждого
+    init_db()
+    uvicorn.run(
+        "deploy.web:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="warning",
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -1,22 +1,62 @@
 import flet as ft
 
-from models.database import init_db, get_session
-from repositories.cook_repository import CookRepository
-from repositories.dish_repository import DishRepository
-from repositories.ingredient_repository import IngredientRepository
+from media.images import ImageStore
+from models.database import (
+    init_db,
+    get_async_read_session,
+    get_async_session,
+    get_read_session,
+    get_session,
+)
+from repositories.cached_repository import AsyncCachedRepository, CachedRepository, EntityCache
+from repositories.change_capture import install_change_capture
+from repositories.change_feed import CHANGE_FEED_ENABLED, ChangeBroadcast, ChangeFeed, ChangeInvalidator, logger
+from repositories.cook_repository import AsyncCookRepository, CookRepository
+from repositories.dish_repository import AsyncDishRepository, DishRepository
+from repositories.ingredient_index import INDEX_ENABLED, IngredientIndex, with_ingredient_index
+from repositories.ingredient_repository import AsyncIngredientRepository, IngredientRepository
+from repositories.instrumentation import METRICS, install_query_events, with_instrumentation
+from repositories.nutrition import ROLLUP_ENABLED, NutritionRollup, with_nutrition_rollup
 from styles import PRIMARY_COLOR, ACCENT_COLOR
-from viewmodels.cook_viewmodel import CookViewModel
+from viewmodels.cook_viewmodel import CookListViewModel, CookViewModel
 from viewmodels.dish_viewmodel import DishListViewModel, DishViewModel
-from viewmodels.ingredient_viewmodel import IngredientViewModel
+from viewmodels.ingredient_viewmodel import IngredientListViewModel, IngredientViewModel
 from views.cook_detail_view import CookDetailView
 from views.cook_list_view import CookListView
 from views.dish_detail_view import DishDetailView
 from views.dish_list_view import DishListView
 from views.ingredient_detail_view import IngredientDetailView
 from views.ingredient_list_view import IngredientListView
+from views.metrics_view import MetricsView
 
 
-def main(page: ft.Page) -> None:
+# Один кэш на процесс: запись из любой сессии страницы инвалидирует его для всех
+cache = EntityCache()
+# Индекс ингредиентов тоже общий: его обновляют записи синхронных и асинхронных репозиториев
+ingredient_index = IngredientIndex(get_read_session) if INDEX_ENABLED else None
+# Итоги калорий и стоимости блюд, общие для всех репозиториев процесса
+nutrition_rollup = NutritionRollup(get_read_session) if ROLLUP_ENABLED else None
+# Оригиналы и миниатюры изображений блюд в assets/media
+image_store = ImageStore()
+# Изменения строк для открытых экранов всех страниц процесса
+change_broadcast = ChangeBroadcast()
+# Несколько процессов над одной БД (python -m deploy.web): их записи приходят через ленту изменений,
+# она же приносит и свои. Иначе изменения ловятся событиями SQLAlchemy (install_change_capture)
+change_feed = ChangeFeed(get_session) if CHANGE_FEED_ENABLED else None
+if change_feed is not None:
+    change_broadcast.subscribe(ChangeInvalidator(cache, ingredient_index, nutrition_rollup))
+    change_feed.subscribe(change_broadcast.publish)
+else:
+    # Индекс и итоги свои записи уже учли через прокси репозиториев
+    change_broadcast.subscribe(ChangeInvalidator(cache))
+
+
+def with_derived_data(repository):
+    """Индекс ингредиентов и итоги пищевой ценности поверх репозитория блюд или ингредиентов"""
+    return with_nutrition_rollup(with_ingredient_index(repository, ingredient_index), nutrition_rollup)
+
+
+async def main(page: ft.Page) -> None:
     page.title = "Popular dishes"
     page.bgcolor = PRIMARY_COLOR
     page.scroll = ft.ScrollMode.AUTO
@@ -24,16 +64,49 @@ def main(page: ft.Page) -> None:
     page.padding = 0
 
     init_db()
+    install_query_events()
+    if change_feed is not None:
+        change_feed.start()
+    else:
+        install_change_capture(change_broadcast.publish)
     session_factory = get_session
+    read_session_factory = get_read_session
 
-    cook_repo = CookRepository(session_factory)
-    dish_repo = DishRepository(session_factory)
-    ingredient_repo = IngredientRepository(session_factory)
+    cook_repo = CachedRepository(
+        with_instrumentation(CookRepository(session_factory, read_session_factory)),
+        cache,
+    )
+    dish_repo = CachedRepository(
+        with_derived_data(with_instrumentation(DishRepository(session_factory, read_session_factory))),
+        cache,
+    )
+    ingredient_repo = CachedRepository(
+        with_derived_data(with_instrumentation(IngredientRepository(session_factory, read_session_factory))),
+        cache,
+    )
+
+    # Списки и поиск идут через AsyncSession и не занимают потоки на время запроса;
+    # экраны редактирования пока работают с синхронными репозиториями
+    async_cook_repo = AsyncCachedRepository(
+        with_instrumentation(AsyncCookRepository(get_async_session, get_async_read_session)), cache
+    )
+    async_dish_repo = AsyncCachedRepository(
+        with_derived_data(with_instrumentation(AsyncDishRepository(get_async_session, get_async_read_session))),
+        cache,
+    )
+    async_ingredient_repo = AsyncCachedRepository(
+        with_derived_data(
+            with_instrumentation(AsyncIngredientRepository(get_async_session, get_async_read_session))
+        ),
+        cache,
+    )
 
     cook_vm = CookViewModel(cook_repo)
-    dish_list_vm = DishListViewModel(dish_repo)
-    dish_vm = DishViewModel(dish_repo)
+    cook_list_vm = CookListViewModel(async_cook_repo)
+    dish_list_vm = DishListViewModel(async_dish_repo, image_store)
+    dish_vm = DishViewModel(dish_repo, image_store)
     ingredient_vm = IngredientViewModel(ingredient_repo)
+    ingredient_list_vm = IngredientListViewModel(async_ingredient_repo)
 
     resize_animation = ft.Animation(duration=400, curve=ft.AnimationCurve.EASE_OUT)
 
@@ -44,13 +117,13 @@ def main(page: ft.Page) -> None:
         padding=10,
     )
 
-    def show_cook_list():
+    async def show_cook_list():
         view = CookListView(
             page,
-            cook_vm,
+            cook_list_vm,
             on_select_cook=show_cook_detail,
         )
-        view.load_data()
+        await view.load_data()
         content_area.content = view
         page.update()
 
@@ -59,15 +132,15 @@ def main(page: ft.Page) -> None:
             page,
             cook_vm,
             cook_id,
-            on_back=show_cook_list,
+            on_back=lambda: page.run_task(show_cook_list),
         )
         view.load_data()
         content_area.content = view
         page.update()
 
-    def show_dish_list():
+    async def show_dish_list():
         view = DishListView(page, dish_list_vm, on_select_dish=show_dish_detail)
-        view.load_data()
+        await view.load_data()
         content_area.content = view
         page.update()
 
@@ -76,17 +149,17 @@ def main(page: ft.Page) -> None:
             page,
             dish_vm,
             dish_id,
-            on_back=show_dish_list,
+            on_back=lambda: page.run_task(show_dish_list),
         )
         view.load_data()
         content_area.content = view
         page.update()
 
-    def show_ingredient_list():
+    async def show_ingredient_list():
         view = IngredientListView(
-            page, ingredient_vm, on_select_ingredient=show_ingredient_detail
+            page, ingredient_list_vm, on_select_ingredient=show_ingredient_detail
         )
-        view.load_data()
+        await view.load_data()
         content_area.content = view
         page.update()
 
@@ -95,12 +168,26 @@ def main(page: ft.Page) -> None:
             page,
             ingredient_vm,
             ingredient_id,
-            on_back=show_ingredient_list,
+            on_back=lambda: page.run_task(show_ingredient_list),
         )
         view.load_data()
         content_area.content = view
         page.update()
 
+    async def show_metrics():
+        view = MetricsView(page, METRICS)
+        view.load_data()
+        content_area.content = view
+        page.update()
+
+    async def handle_navigation(e):
+        await {
+            0: show_cook_list,
+            1: show_dish_list,
+            2: show_ingredient_list,
+            3: show_metrics,
+        }[e.control.selected_index]()
+
     navigation = ft.NavigationRail(
         selected_index=0,
         label_type=ft.NavigationRailLabelType.ALL,
@@ -112,12 +199,9 @@ def main(page: ft.Page) -> None:
             ft.NavigationRailDestination(
                 icon=ft.Icons.LOCAL_GROCERY_STORE, label="Ingredients"
             ),
+            ft.NavigationRailDestination(icon=ft.Icons.INSIGHTS, label="Metrics"),
         ],
-        on_change=lambda e: {
-            0: show_cook_list,
-            1: show_dish_list,
-            2: show_ingredient_list,
-        }[e.control.selected_index](),
+        on_change=handle_navigation,
     )
 
     nav_container = ft.Container(
@@ -150,10 +234,28 @@ def main(page: ft.Page) -> None:
 
     page.on_resized = update_size_page
 
+    # Открытый экран применяет изменения строк из других сессий; пакеты,
+    # пришедшие во время применения, объединяются в один
+    changes_subscription = change_broadcast.listen()
+
+    async def apply_changes():
+        async for changes in changes_subscription:
+            view = content_area.content
+            if not hasattr(view, "apply_changes"):
+                continue
+            try:
+                await view.apply_changes(changes)
+                page.update()
+            except Exception:
+                logger.exception("Applying changes to %s failed", type(view).__name__)
+
+    page.on_close = lambda e: changes_subscription.close()
+    page.run_task(apply_changes)
+
     page.add(main_layout)
 
     update_size_page()
-    show_cook_list()
+    await show_cook_list()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+import argparse
+import sys
+
+from sqlalchemy import select, update
+
+from media.images import THUMBNAIL_SIZES, ImageStore
+from models.database import engine, get_read_session, get_session, init_db
+from models.dishes import NUTRIENTS, Dish
+from models.leaderboard import recount_cook_dishes
+from models.migrations import DEFAULT_BATCH_SIZE, init_schema, migration_status
+from models.search import rebuild_search_index
+from repositories.ingredient_index import IngredientIndex
+from repositories.nutrition import NutritionRollup
+from repositories.query_plans import check_query_plans
+from transfer.exporter import MenuExporter
+from transfer.formats import RecordWriter, read_records
+from transfer.importer import DEFAULT_CHUNK_SIZE, MenuImporter
+from transfer.synthetic import DEFAULT_SEED, SyntheticMenu
+
+ENTITIES = ("cooks", "ingredients", "dishes")
+
+
+def run_migrations(args: argparse.Namespace) -> None:
+    if not args.status:
+        applied = init_schema(engine, batch_size=args.batch_size, pause=args.pause, progress=print_progress)
+        print(f"Applied {len(applied)} migrations")
+    for status in migration_status(engine):
+        print(f"{status.version:4} {status.name:28} {status.state}")
+
+
+def rebuild_search(args: argparse.Namespace) -> None:
+    init_db()
+    with engine.begin() as connection:
+        count = rebuild_search_index(connection)
+    print(f"Search index rebuilt: {count} dishes")
+
+
+def recount_cooks(args: argparse.Namespace) -> None:
+    init_db()
+    with engine.begin() as connection:
+        count = recount_cook_dishes(connection)
+    print(f"Cook dish counts repaired: {count} cooks")
+
+
+def check_plans(args: argparse.Namespace) -> None:
+    """EXPLAIN QUERY PLAN для всех запросов репозиториев; код выхода 1 при полном просмотре таблицы"""
+    init_db()
+    with engine.connect() as connection:
+        plans = check_query_plans(connection)
+    failed = [plan for plan in plans if plan.full_scans]
+    for plan in plans:
+        status = "FULL SCAN" if plan.full_scans else "ok"
+        print(f"{status:9} {plan.name}")
+        if args.verbose or plan.full_scans:
+            for step in plan.plan:
+                print(f"          {step}")
+    print(f"{len(plans) - len(failed)}/{len(plans)} queries use indexes")
+    if failed:
+        sys.exit(1)
+
+
+def index_stats(args: argparse.Namespace) -> None:
+    """Загрузка индекса ингредиентов: время, число связей и память, в том числе по ингредиентам"""
+    init_db()
+    index = IngredientIndex(get_read_session)
+    index.load()
+    for key, value in index.stats().items():
+        print(f"{key:13} {value}")
+    for ingredient_id, dishes, size in index.bitmap_stats()[: args.top]:
+        print(f"ingredient {ingredient_id:<8} {dishes:>9} dishes {size:>10} bytes")
+
+
+def nutrition(args: argparse.Namespace) -> None:
+    """Полный пересчёт итогов меню и блюда с наибольшим значением показателя"""
+    init_db()
+    rollup = NutritionRollup(get_read_session)
+    rollup.load()
+    for key, value in rollup.stats().items():
+        print(f"{key:17} {value}")
+    for dish_id, totals in rollup.top(args.by, args.top):
+        print(f"dish {dish_id:<8} " + " ".join(f"{name} {value:.2f}" for name, value in totals.to_dict().items()))
+
+
+def build_images(args: argparse.Namespace) -> None:
+    """Перенос локальных файлов блюд в хранилище изображений и построение недостающих миниатюр"""
+    init_db()
+    store = ImageStore()
+    with engine.connect() as connection:
+        images = connection.execute(select(Dish.id, Dish.image_url).where(Dish.image_url.is_not(None))).all()
+    moved = 0
+    for dish_id, image_url in images:
+        stored_url = store.import_image(image_url)
+        if stored_url != image_url:
+            with engine.begin() as connection:
+                connection.execute(update(Dish).where(Dish.id == dish_id).values(image_url=stored_url))
+            moved += 1
+        for size in THUMBNAIL_SIZES:
+            store.thumbnail_url(stored_url, size)
+    store.wait()
+    print(f"Moved {moved} local images into the store")
+    for key, value in store.stats().items():
+        print(f"{key:10} {value}")
+
+
+def print_progress(entity: str, processed: int) -> None:
+    print(f"{entity}: {processed}", file=sys.stderr)
+
+
+def import_data(args: argparse.Namespace) -> None:
+    init_db()
+    importer = MenuImporter(get_session, args.chunk_size, print_progress)
+    handler = {
+        "cooks": importer.import_cooks,
+        "ingredients": importer.import_ingredients,
+        "dishes": importer.import_dishes,
+    }[args.entity]
+    count = handler(read_records(args.path, args.entity))
+    print(f"Imported {count} {args.entity}")
+
+
+def seed_data(args: argparse.Namespace) -> None:
+    """Детерминированные синтетические повара, ингредиенты и блюда; повторный запуск обновляет те же записи"""
+    init_db()
+    menu = SyntheticMenu(args.cooks, args.ingredients, args.dishes, args.seed)
+    importer = MenuImporter(get_session, args.chunk_size, print_progress)
+    importer.import_cooks(menu.cook_records())
+    importer.import_ingredients(menu.ingredient_records())
+    importer.import_dishes(menu.dish_records())
+    print(f"Seeded {args.cooks} cooks, {args.ingredients} ingredients, {args.dishes} dishes (seed {args.seed})")
+
+
+def export_data(args: argparse.Namespace) -> None:
+    init_db()
+    exporter = MenuExporter(get_session, args.chunk_size, print_progress)
+    records = {
+        "cooks": exporter.export_cooks,
+        "ingredients": exporter.export_ingredients,
+        "dishes": exporter.export_dishes,
+    }[args.entity]()
+    count = 0
+    with RecordWriter(args.path, args.entity) as writer:
+        for record in records:
+            writer.write(record)
+            count += 1
+    print(f"Exported {count} {args.entity}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Dish menu maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_command = commands.add_parser(
+        "migrate", help="Apply pending schema migrations with batched, resumable backfills"
+    )
+    migrate_command.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per transaction")
+    migrate_command.add_argument(
+        "--pause", type=float, default=0.0, help="Seconds to sleep between batches to leave room for live writes"
+    )
+    migrate_command.add_argument("--status", action="store_true", help="Only show applied and pending migrations")
+    migrate_command.set_defaults(handler=run_migrations)
+
+    rebuild = commands.add_parser("rebuild-search", help="Rebuild the full-text dish search index")
+    rebuild.set_defaults(handler=rebuild_search)
+
+    recount = commands.add_parser("recount-cooks", help="Recompute the cook leaderboard dish counts")
+    recount.set_defaults(handler=recount_cooks)
+
+    plans = commands.add_parser("check-plans", help="Fail if any repository query does a full table scan")
+    plans.add_argument("--verbose", action="store_true", help="Print every query plan")
+    plans.set_defaults(handler=check_plans)
+
+    index = commands.add_parser("index-stats", help="Load the ingredient index and report its size")
+    index.add_argument("--top", type=int, default=10, help="Largest ingredient bitmaps to list")
+    index.set_defaults(handler=index_stats)
+
+    rollup = commands.add_parser("nutrition", help="Recompute dish nutrition totals and list the top dishes")
+    rollup.add_argument("--by", choices=NUTRIENTS, default="calories", help="Nutrient to rank dishes by")
+    rollup.add_argument("--top", type=int, default=10, help="Dishes to list")
+    rollup.set_defaults(handler=nutrition)
+
+    images = commands.add_parser("images", help="Move local dish images into the store and build thumbnails")
+    images.set_defaults(handler=build_images)
+
+    seed = commands.add_parser("seed", help="Fill the database with deterministic synthetic data")
+    seed.add_argument("--cooks", type=int, default=100)
+    seed.add_argument("--ingredients", type=int, default=500)
+    seed.add_argument("--dishes", type=int, default=10_000)
+    seed.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Same seed and sizes give the same data")
+    seed.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    seed.set_defaults(handler=seed_data)
+
+    for name, handler, help_text in (
+        ("import", import_data, "Import records from a CSV or JSONL file"),
+        ("export", export_data, "Export records to a CSV or JSONL file"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("entity", choices=ENTITIES)
+        command.add_argument("path", help="File path; the format is taken from the .csv/.jsonl suffix")
+        command.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        command.set_defaults(handler=handler)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
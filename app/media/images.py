@@ -0,0 +1,261 @@
+"""Хранилище изображений блюд.
+
+Выбранный файл копируется в каталог с адресацией по содержимому
+(originals/<ab>/<sha256><ext>), по нему в фоновом пуле строятся миниатюры WebP
+под места показа. Миниатюры — LRU-кэш на диске с ограничением общего размера:
+вытесненная строится заново при следующем обращении. Каталог лежит в assets,
+поэтому Flet отдаёт файлы по URL /media/... и в десктопном, и в веб-режиме.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Set, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from models.database import BASE_DIR
+
+
+ASSETS_DIR = BASE_DIR / "assets"
+MEDIA_DIR = ASSETS_DIR / "media"
+MEDIA_URL = "/media"
+
+# Размер области на экране × 2 — для HiDPI
+THUMBNAIL_SIZES: Dict[str, Tuple[int, int]] = {
+    "list": (120, 120),
+    "card": (400, 300),
+}
+WEBP_QUALITY = 80
+
+# Ограничение кэша миниатюр: DISH_MENU_THUMBNAIL_CACHE_MB (оригиналы не вытесняются)
+THUMBNAIL_CACHE_BYTES = int(os.environ.get("DISH_MENU_THUMBNAIL_CACHE_MB", "256")) * 1024 * 1024
+
+HASH_CHUNK = 1024 * 1024
+
+# Декодирование и сжатие идут в своём пуле, не занимая потоки запросов к БД
+IMAGE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="images")
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _atomic_write(target: Path, write: Callable[[Any], None]) -> None:
+    """Запись во временный файл рядом с target и переименование: читатели не видят недописанный файл"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            write(file)
+        os.replace(temporary, target)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def render_thumbnail(source: Path, size: Tuple[int, int], file) -> None:
+    """Обрезка по центру до пропорций size (как ImageFit.COVER) и сжатие в WebP"""
+    with Image.open(source) as image:
+        # JPEG декодируется сразу в уменьшенном масштабе, не меньше двойного размера миниатюры
+        image.draft("RGB", (size[0] * 2, size[1] * 2))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+        ImageOps.fit(image, size, Image.Resampling.LANCZOS).save(file, "WEBP", quality=WEBP_QUALITY)
+
+
+class ImageStore:
+    """Оригиналы по хешу содержимого и миниатюры к ним.
+
+    URL оригинала хранится в Dish.image_url; внешние URL и пути вне хранилища
+    остаются как есть и показываются без миниатюр.
+    """
+
+    def __init__(
+        self,
+        root: Path = MEDIA_DIR,
+        url_prefix: str = MEDIA_URL,
+        max_thumbnail_bytes: int = THUMBNAIL_CACHE_BYTES,
+        executor: ThreadPoolExecutor = IMAGE_EXECUTOR,
+    ):
+        self.root = Path(root)
+        self.url_prefix = url_prefix
+        self.max_thumbnail_bytes = max_thumbnail_bytes
+        self.executor = executor
+        # Миниатюра -> размер файла, от давно использованных к недавним; читается с диска при первом обращении
+        self._thumbnails: "OrderedDict[str, int] | None" = None
+        self._thumbnail_bytes = 0
+        self._pending: Dict[str, Future] = {}
+        self._failed: Set[str] = set()
+        # Повторно входимая: колбэк уже готового future выполняется сразу в add_done_callback
+        self._lock = threading.RLock()
+        self.generated = 0
+        self.evicted = 0
+
+    # --- Оригиналы ---
+
+    def import_image(self, source: str | None) -> str | None:
+        """Копирование локального файла в хранилище и постановка миниатюр в очередь; возвращает URL"""
+        if not source or "://" in source or self._original(source) is not None:
+            return source
+        path = self._local_file(source)
+        if path is None:
+            return source
+        digest = file_digest(path)
+        relative = f"originals/{digest[:2]}/{digest}{path.suffix.lower()}"
+        target = self.root / relative
+        if not target.exists():
+            with open(path, "rb") as original:
+                _atomic_write(target, lambda file: shutil.copyfileobj(original, file))
+        for size in THUMBNAIL_SIZES:
+            self._schedule(target, digest, size)
+        return f"{self.url_prefix}/{relative}"
+
+    @staticmethod
+    def _local_file(source: str) -> Path | None:
+        """Путь файла по пути в ФС или URL ассета Flet (/images/...)"""
+        for path in (Path(source), ASSETS_DIR / source.lstrip("/")):
+            if path.is_file():
+                return path
+        return None
+
+    def _original(self, image_url: str | None) -> Tuple[Path, str] | None:
+        """(путь оригинала, хеш) для URL из хранилища"""
+        prefix = f"{self.url_prefix}/originals/"
+        if not image_url or not image_url.startswith(prefix):
+            return None
+        relative = image_url[len(self.url_prefix) + 1 :]
+        return self.root / relative, Path(relative).stem
+
+    # --- Миниатюры ---
+
+    def thumbnail_url(
+        self, image_url: str | None, size: str, on_ready: Callable[[str], None] | None = None
+    ) -> str | None:
+        """URL миниатюры для показа. Если её ещё нет, возвращает None и ставит построение
+        в очередь; on_ready вызывается из фонового потока с готовым URL."""
+        original = self._original(image_url)
+        if original is None:
+            return image_url
+        path, digest = original
+        relative = self._thumbnail_path(digest, size)
+        if self._touch(relative):
+            return self._url(relative)
+        if relative in self._failed:
+            # Формат, который Pillow не читает (svg): показывается оригинал
+            return image_url
+        future = self._schedule(path, digest, size)
+        if on_ready is not None:
+            future.add_done_callback(lambda done: done.exception() is None and on_ready(done.result()))
+        return None
+
+    def wait(self) -> None:
+        """Ожидание всех поставленных в очередь миниатюр"""
+        while True:
+            with self._lock:
+                pending = list(self._pending.values())
+            if not pending:
+                return
+            for future in pending:
+                future.exception()
+
+    def _thumbnail_path(self, digest: str, size: str) -> str:
+        return f"thumbnails/{size}/{digest[:2]}/{digest}.webp"
+
+    def _url(self, relative: str) -> str:
+        return f"{self.url_prefix}/{relative}"
+
+    def _schedule(self, original: Path, digest: str, size: str) -> Future:
+        relative = self._thumbnail_path(digest, size)
+        with self._lock:
+            future = self._pending.get(relative)
+            if future is None:
+                future = self.executor.submit(self._generate, original, relative, THUMBNAIL_SIZES[size])
+                self._pending[relative] = future
+                future.add_done_callback(lambda _: self._done(relative))
+            return future
+
+    def _done(self, relative: str) -> None:
+        with self._lock:
+            self._pending.pop(relative, None)
+
+    def _generate(self, original: Path, relative: str, size: Tuple[int, int]) -> str:
+        target = self.root / relative
+        if not target.exists():
+            try:
+                _atomic_write(target, lambda file: render_thumbnail(original, size, file))
+            except (UnidentifiedImageError, OSError):
+                with self._lock:
+                    self._failed.add(relative)
+                raise
+            self.generated += 1
+        self._add(relative, target.stat().st_size)
+        return self._url(relative)
+
+    # --- LRU-кэш миниатюр ---
+
+    def _entries(self) -> "OrderedDict[str, int]":
+        """Вызывается под self._lock; после перезапуска порядок берётся по времени изменения файлов"""
+        if self._thumbnails is None:
+            files = sorted(self._scan(), key=lambda item: item[2])
+            self._thumbnails = OrderedDict((relative, size) for relative, size, _ in files)
+            self._thumbnail_bytes = sum(self._thumbnails.values())
+            # Ограничение могло уменьшиться с прошлого запуска
+            self._evict()
+        return self._thumbnails
+
+    def _scan(self) -> Iterator[Tuple[str, int, float]]:
+        directory = self.root / "thumbnails"
+        if not directory.is_dir():
+            return
+        for path in directory.rglob("*.webp"):
+            stat = path.stat()
+            yield path.relative_to(self.root).as_posix(), stat.st_size, stat.st_mtime
+
+    def _touch(self, relative: str) -> bool:
+        with self._lock:
+            entries = self._entries()
+            if relative not in entries:
+                return False
+            entries.move_to_end(relative)
+            return True
+
+    def _add(self, relative: str, size: int) -> None:
+        with self._lock:
+            entries = self._entries()
+            self._thumbnail_bytes += size - entries.pop(relative, 0)
+            entries[relative] = size
+            self._evict()
+
+    def _evict(self) -> None:
+        """Удаление давно использованных миниатюр сверх ограничения; последняя добавленная остаётся"""
+        entries = self._thumbnails
+        while self._thumbnail_bytes > self.max_thumbnail_bytes and len(entries) > 1:
+            oldest, oldest_size = entries.popitem(last=False)
+            self._thumbnail_bytes -= oldest_size
+            self.evicted += 1
+            try:
+                (self.root / oldest).unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._entries()
+            return {
+                "thumbnails": len(entries),
+                "bytes": self._thumbnail_bytes,
+                "max_bytes": self.max_thumbnail_bytes,
+                "pending": len(self._pending),
+                "generated": self.generated,
+                "evicted": self.evicted,
+            }
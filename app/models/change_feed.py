@@ -0,0 +1,111 @@
+from typing import List
+
+from sqlalchemy import DDL, Column, Connection, Float, Integer, String, Table, event, text
+
+from models.database import Base
+
+
+# Таблицы, изменения строк которых попадают в ленту. Для dish_ingredients
+# row_id — блюдо, other_id — ингредиент; для остальных other_id пуст
+FEED_TABLES = ("cooks", "dishes", "ingredients", "dish_ingredients")
+
+# Строки изменений для процессов, которые делят одну БД (python -m deploy.web).
+# AUTOINCREMENT: id не переиспользуются после очистки, курсоры подписчиков не пропустят запись
+change_feed = Table(
+    "change_feed",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("table_name", String, nullable=False),
+    # I, U или D
+    Column("op", String(1), nullable=False),
+    Column("row_id", Integer, nullable=False),
+    Column("other_id", Integer, nullable=True),
+    sqlite_autoincrement=True,
+)
+
+# Читатели ленты: пока нет ни одного, триггеры ничего не пишут
+change_feed_subscribers = Table(
+    "change_feed_subscribers",
+    Base.metadata,
+    Column("id", String, primary_key=True),
+    Column("pid", Integer, nullable=False),
+    # Последняя прочитанная строка ленты; всё до минимума по подписчикам можно удалять
+    Column("last_id", Integer, nullable=False),
+    # Время последнего опроса (unix time)
+    Column("seen_at", Float, nullable=False),
+)
+
+_OPS = {"INSERT": ("I", "new"), "UPDATE": ("U", "new"), "DELETE": ("D", "old")}
+
+
+def _sqlite_trigger(table: str, operation: str) -> str:
+    op, row = _OPS[operation]
+    if table == "dish_ingredients":
+        row_id, other_id = f"{row}.dish_id", f"{row}.ingredient_id"
+    else:
+        row_id, other_id = f"{row}.id", "NULL"
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS {table}_change_feed_{op.lower()}
+    AFTER {operation} ON {table}
+    WHEN EXISTS (SELECT 1 FROM change_feed_subscribers) BEGIN
+        INSERT INTO change_feed (table_name, op, row_id, other_id)
+        VALUES ('{table}', '{op}', {row_id}, {other_id});
+    END
+    """
+
+
+SQLITE_CHANGE_FEED_DDL: List[str] = [
+    _sqlite_trigger(table, operation) for table in FEED_TABLES for operation in _OPS
+]
+
+POSTGRESQL_CHANGE_FEED_DDL: List[str] = [
+    """
+    CREATE OR REPLACE FUNCTION change_feed_record() RETURNS trigger AS $$
+    DECLARE
+        row_data record;
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM change_feed_subscribers) THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'DELETE' THEN
+            row_data := OLD;
+        ELSE
+            row_data := NEW;
+        END IF;
+        IF TG_TABLE_NAME = 'dish_ingredients' THEN
+            INSERT INTO change_feed (table_name, op, row_id, other_id)
+            VALUES (TG_TABLE_NAME, left(TG_OP, 1), row_data.dish_id, row_data.ingredient_id);
+        ELSE
+            INSERT INTO change_feed (table_name, op, row_id)
+            VALUES (TG_TABLE_NAME, left(TG_OP, 1), row_data.id);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+] + [
+    statement
+    for table in FEED_TABLES
+    for statement in (
+        f"DROP TRIGGER IF EXISTS {table}_change_feed ON {table}",
+        f"""
+        CREATE TRIGGER {table}_change_feed AFTER INSERT OR UPDATE OR DELETE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION change_feed_record()
+        """,
+    )
+]
+
+
+for statement in SQLITE_CHANGE_FEED_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRESQL_CHANGE_FEED_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+
+def create_change_feed(connection: Connection) -> None:
+    """Таблицы и триггеры ленты в существующей БД (create_all ставит триггеры только вместе с таблицами)"""
+    change_feed.create(connection, checkfirst=True)
+    change_feed_subscribers.create(connection, checkfirst=True)
+    ddl = {"sqlite": SQLITE_CHANGE_FEED_DDL, "postgresql": POSTGRESQL_CHANGE_FEED_DDL}
+    for statement in ddl.get(connection.dialect.name, []):
+        connection.execute(text(statement))
@@ -1,15 +1,21 @@
-from sqlalchemy import Table, Column, Integer, ForeignKey, Float, String
+from sqlalchemy import Table, Column, Index, Integer, ForeignKey, Float, String
 from sqlalchemy.orm import relationship
 
 from models.database import Base
 
 
+# Пищевая ценность и стоимость ингредиента на 100 г; итоги блюд — repositories/nutrition.py
+NUTRIENTS = ("calories", "protein", "fat", "carbs", "cost")
+
+
 dish_ingredient = Table(
     "dish_ingredients",
     Base.metadata,
     Column("dish_id", Integer, ForeignKey("dishes.id", ondelete="RESTRICT"), primary_key=True),
     Column("ingredient_id", Integer, ForeignKey("ingredients.id", ondelete="RESTRICT"), primary_key=True),
-    Column("weight", Float, default=0.0)
+    Column("weight", Float, default=0.0),
+    # Обратный путь «блюда по ингредиенту»; прямой покрывает первичный ключ (dish_id, ingredient_id)
+    Index("ix_dish_ingredients_ingredient_id", "ingredient_id", "dish_id"),
 )
 
 
@@ -19,9 +25,18 @@ class Cook(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String, index=True, nullable=False)
     bio = Column(String, nullable=False, default="")
+    # Поддерживается триггерами на dishes (models/leaderboard.py)
+    dishes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Версия строки для оптимистической блокировки правок (BaseRepository.update_versioned)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     dishes = relationship("Dish", back_populates="cook")
 
+    __table_args__ = (
+        # Топ поваров читается по индексу, без агрегации по dishes
+        Index("ix_cooks_dishes_count", dishes_count.desc(), id),
+    )
+
 
 class Dish(Base):
     __tablename__ = "dishes"
@@ -31,7 +46,9 @@ class Dish(Base):
     description = Column(String, nullable=False, default="")
     recipe = Column(String, nullable=False, default="")
     image_url = Column(String, nullable=True)
-    cook_id = Column(Integer, ForeignKey("cooks.id", ondelete="CASCADE"))
+    cook_id = Column(Integer, ForeignKey("cooks.id", ondelete="CASCADE"), index=True)
+    # Растёт и при сохранении состава блюда через DishRepository.apply_edits
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     cook = relationship("Cook", back_populates="dishes")
     ingredients = relationship(
@@ -45,9 +62,19 @@ class Ingredient(Base):
     __tablename__ = "ingredients"
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
+    calories = Column(Float, nullable=False, default=0.0, server_default="0")
+    protein = Column(Float, nullable=False, default=0.0, server_default="0")
+    fat = Column(Float, nullable=False, default=0.0, server_default="0")
+    carbs = Column(Float, nullable=False, default=0.0, server_default="0")
+    cost = Column(Float, nullable=False, default=0.0, server_default="0")
 
     dishes = relationship(
         "Dish",
         secondary=dish_ingredient,
         back_populates="ingredients"
+    )
+
+    __table_args__ = (
+        # Уникальный индекс, а не ограничение таблицы: его можно добавить и в существующую БД
+        Index("ux_ingredients_name", name, unique=True),
     )
\ No newline at end of file
@@ -0,0 +1,86 @@
+from typing import List
+
+from sqlalchemy import DDL, Connection, event, func, select, text, update
+
+from models.database import Base
+from models.dishes import Cook, Dish
+
+
+# Счётчик cooks.dishes_count меняется триггерами при вставке и удалении блюда
+# и при смене повара, поэтому его видят и ORM, и пакетный импорт через Core
+SQLITE_LEADERBOARD_DDL: List[str] = [
+    """
+    CREATE TRIGGER IF NOT EXISTS dishes_cook_count_ai
+    AFTER INSERT ON dishes WHEN new.cook_id IS NOT NULL BEGIN
+        UPDATE cooks SET dishes_count = dishes_count + 1 WHERE id = new.cook_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS dishes_cook_count_ad
+    AFTER DELETE ON dishes WHEN old.cook_id IS NOT NULL BEGIN
+        UPDATE cooks SET dishes_count = dishes_count - 1 WHERE id = old.cook_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS dishes_cook_count_au
+    AFTER UPDATE OF cook_id ON dishes WHEN old.cook_id IS NOT new.cook_id BEGIN
+        UPDATE cooks SET dishes_count = dishes_count - 1 WHERE id = old.cook_id;
+        UPDATE cooks SET dishes_count = dishes_count + 1 WHERE id = new.cook_id;
+    END
+    """,
+]
+
+POSTGRESQL_LEADERBOARD_DDL: List[str] = [
+    """
+    CREATE OR REPLACE FUNCTION dishes_cook_count() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.cook_id IS NOT NULL THEN
+            UPDATE cooks SET dishes_count = dishes_count - 1 WHERE id = OLD.cook_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.cook_id IS NOT NULL THEN
+            UPDATE cooks SET dishes_count = dishes_count + 1 WHERE id = NEW.cook_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS dishes_cook_count_aid ON dishes",
+    """
+    CREATE TRIGGER dishes_cook_count_aid AFTER INSERT OR DELETE ON dishes
+    FOR EACH ROW EXECUTE FUNCTION dishes_cook_count()
+    """,
+    "DROP TRIGGER IF EXISTS dishes_cook_count_au ON dishes",
+    """
+    CREATE TRIGGER dishes_cook_count_au AFTER UPDATE OF cook_id ON dishes
+    FOR EACH ROW WHEN (OLD.cook_id IS DISTINCT FROM NEW.cook_id)
+    EXECUTE FUNCTION dishes_cook_count()
+    """,
+]
+
+
+for statement in SQLITE_LEADERBOARD_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRESQL_LEADERBOARD_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+
+def create_leaderboard_triggers(connection: Connection) -> None:
+    """Установка триггеров счётчика в существующую БД (create_all ставит их только вместе с таблицами)"""
+    ddl = {"sqlite": SQLITE_LEADERBOARD_DDL, "postgresql": POSTGRESQL_LEADERBOARD_DDL}
+    for statement in ddl.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+
+def recount_cook_dishes(connection: Connection, first_id: int | None = None, last_id: int | None = None) -> int:
+    """Пересчёт dishes_count по таблице dishes (при заданных границах — для поваров с id
+    в [first_id, last_id]); возвращает число исправленных поваров"""
+    cooks = Cook.__table__
+    actual = (
+        select(func.count(Dish.id))
+        .where(Dish.cook_id == cooks.c.id)
+        .scalar_subquery()
+    )
+    stmt = update(cooks).where(cooks.c.dishes_count != actual).values(dishes_count=actual)
+    if first_id is not None:
+        stmt = stmt.where(cooks.c.id.between(first_id, last_id))
+    return connection.execute(stmt).rowcount
@@ -0,0 +1,342 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, List, NamedTuple, Set
+
+from sqlalchemy import (
+    Column,
+    Connection,
+    DateTime,
+    Engine,
+    Integer,
+    String,
+    Table,
+    bindparam,
+    delete,
+    func,
+    inspect,
+    insert,
+    select,
+    text,
+    update,
+)
+
+from models.change_feed import create_change_feed
+from models.database import Base
+from models.dishes import NUTRIENTS, Cook, Dish, Ingredient, dish_ingredient
+from models.leaderboard import create_leaderboard_triggers, recount_cook_dishes
+from models.search import create_search_index, fill_search_index, optimize_search_index
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+ProgressCallback = Callable[[str, int], None]
+
+# Применённые миграции; backfill_position — последний обработанный id незавершённого заполнения
+schema_migrations = Table(
+    "schema_migrations",
+    Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("backfill_position", Integer, nullable=True),
+    Column("completed_at", DateTime, nullable=True),
+)
+
+
+def _noop(connection: Connection) -> None:
+    pass
+
+
+@dataclass(frozen=True)
+class Backfill:
+    """Пакетное заполнение данных: за одну транзакцию обрабатываются batch_size строк table
+    с id больше сохранённой позиции; apply получает границы пакета по id (включительно)"""
+
+    table: Table
+    apply: Callable[[Connection, int, int], None]
+
+
+@dataclass(frozen=True)
+class Migration:
+    """Изменение схемы: upgrade (короткая транзакция) → backfill по пакетам → finalize"""
+
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None] = _noop
+    backfill: Backfill | None = None
+    finalize: Callable[[Connection], None] = _noop
+
+
+class MigrationStatus(NamedTuple):
+    version: int
+    name: str
+    state: str
+
+
+# --- Миграции ---------------------------------------------------------------
+# Шаги идемпотентны: БД, доведённые до схемы прежней функцией upgrade_schema,
+# проходят их без изменений
+
+
+def _add_cook_dishes_count(connection: Connection) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns(Cook.__tablename__)}
+    if "dishes_count" not in columns:
+        # В SQLite и PostgreSQL добавление колонки с константой по умолчанию не переписывает таблицу
+        connection.execute(text("ALTER TABLE cooks ADD COLUMN dishes_count INTEGER NOT NULL DEFAULT 0"))
+    # Триггеры ставятся до заполнения, чтобы новые блюда учитывались во время него
+    create_leaderboard_triggers(connection)
+    _create_indexes(connection, Cook.__table__, "ix_cooks_dishes_count")
+
+
+def _recount_cooks_batch(connection: Connection, first_id: int, last_id: int) -> None:
+    recount_cook_dishes(connection, first_id, last_id)
+
+
+def _merge_duplicate_ingredients_batch(connection: Connection, first_id: int, last_id: int) -> None:
+    merge_duplicate_ingredients(connection, first_id, last_id)
+
+
+def _unique_ingredient_names(connection: Connection) -> None:
+    # Дубли, появившиеся во время пакетного слияния, сливаются в одной транзакции с индексом
+    merge_duplicate_ingredients(connection)
+    _create_indexes(connection, Ingredient.__table__, "ux_ingredients_name")
+
+
+def _lookup_indexes(connection: Connection) -> None:
+    _create_indexes(connection, Dish.__table__, "ix_dishes_cook_id")
+    _create_indexes(connection, dish_ingredient, "ix_dish_ingredients_ingredient_id")
+
+
+def _add_ingredient_nutrition(connection: Connection) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns(Ingredient.__tablename__)}
+    for name in NUTRIENTS:
+        if name not in columns:
+            connection.execute(text(f"ALTER TABLE ingredients ADD COLUMN {name} REAL NOT NULL DEFAULT 0"))
+
+
+def _fill_search_batch(connection: Connection, first_id: int, last_id: int) -> None:
+    fill_search_index(connection, first_id, last_id)
+
+
+def _add_row_versions(connection: Connection) -> None:
+    for table in (Cook.__tablename__, Dish.__tablename__):
+        columns = {column["name"] for column in inspect(connection).get_columns(table)}
+        if "version" not in columns:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "cook_dishes_count",
+        upgrade=_add_cook_dishes_count,
+        backfill=Backfill(Cook.__table__, _recount_cooks_batch),
+    ),
+    Migration(
+        2,
+        "unique_ingredient_names",
+        backfill=Backfill(Ingredient.__table__, _merge_duplicate_ingredients_batch),
+        finalize=_unique_ingredient_names,
+    ),
+    Migration(3, "lookup_indexes", upgrade=_lookup_indexes),
+    Migration(4, "ingredient_nutrition", upgrade=_add_ingredient_nutrition),
+    Migration(5, "row_versions", upgrade=_add_row_versions),
+    Migration(6, "change_feed", upgrade=create_change_feed),
+    # Триггеры ставятся до заполнения: блюда, изменённые во время него, индексируются ими
+    Migration(
+        7,
+        "dish_search",
+        upgrade=create_search_index,
+        backfill=Backfill(Dish.__table__, _fill_search_batch),
+        finalize=optimize_search_index,
+    ),
+]
+
+
+# --- Выполнение -------------------------------------------------------------
+
+
+def init_schema(engine: Engine, **migrate_options) -> List[Migration]:
+    """Создание новой БД по моделям или миграция существующей до текущей схемы"""
+    applied = []
+    existing = inspect(engine).has_table(Cook.__tablename__)
+    if existing:
+        # Миграции идут до create_all: триггеры из after_create ссылаются на новые колонки
+        applied = migrate(engine, **migrate_options)
+    Base.metadata.create_all(engine)
+    if not existing:
+        stamp(engine)
+    return applied
+
+
+def migrate(
+    engine: Engine,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    pause: float = 0.0,
+    progress: ProgressCallback | None = None,
+) -> List[Migration]:
+    """Применение незавершённых миграций; прерванное заполнение продолжается с сохранённой позиции.
+
+    Каждый пакет — отдельная короткая транзакция, а pause между пакетами
+    оставляет окно для записей работающего приложения.
+    """
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        done = _completed_versions(connection)
+
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version in done:
+            continue
+        with engine.begin() as connection:
+            started = connection.execute(
+                select(schema_migrations.c.version).where(schema_migrations.c.version == migration.version)
+            ).first()
+            if started is None:
+                migration.upgrade(connection)
+                connection.execute(
+                    insert(schema_migrations).values(
+                        version=migration.version,
+                        name=migration.name,
+                        backfill_position=0 if migration.backfill else None,
+                    )
+                )
+        if migration.backfill:
+            _run_backfill(engine, migration, batch_size, pause, progress)
+        with engine.begin() as connection:
+            migration.finalize(connection)
+            connection.execute(
+                update(schema_migrations)
+                .where(schema_migrations.c.version == migration.version)
+                .values(completed_at=datetime.now(timezone.utc), backfill_position=None)
+            )
+        applied.append(migration)
+    return applied
+
+
+def stamp(engine: Engine) -> None:
+    """Отметка всех миграций применёнными (для БД, только что созданной по моделям)"""
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        done = _completed_versions(connection)
+        now = datetime.now(timezone.utc)
+        rows = [
+            {"version": m.version, "name": m.name, "backfill_position": None, "completed_at": now}
+            for m in MIGRATIONS
+            if m.version not in done
+        ]
+        if rows:
+            versions = [row["version"] for row in rows]
+            connection.execute(delete(schema_migrations).where(schema_migrations.c.version.in_(versions)))
+            connection.execute(insert(schema_migrations), rows)
+
+
+def migration_status(engine: Engine) -> List[MigrationStatus]:
+    with engine.connect() as connection:
+        if not inspect(connection).has_table(schema_migrations.name):
+            rows = {}
+        else:
+            rows = {row.version: row for row in connection.execute(select(schema_migrations))}
+    statuses = []
+    for migration in MIGRATIONS:
+        row = rows.get(migration.version)
+        if row is None:
+            state = "pending"
+        elif row.completed_at is None:
+            state = f"backfilling (after id {row.backfill_position})"
+        else:
+            state = f"applied {row.completed_at:%Y-%m-%d %H:%M:%S}"
+        statuses.append(MigrationStatus(migration.version, migration.name, state))
+    return statuses
+
+
+def _completed_versions(connection: Connection) -> Set[int]:
+    return set(
+        connection.execute(
+            select(schema_migrations.c.version).where(schema_migrations.c.completed_at.is_not(None))
+        ).scalars()
+    )
+
+
+def _run_backfill(
+    engine: Engine, migration: Migration, batch_size: int, pause: float, progress: ProgressCallback | None
+) -> None:
+    table = migration.backfill.table
+    id_column = table.c.id
+    position_column = schema_migrations.c.backfill_position
+    this_migration = schema_migrations.c.version == migration.version
+    processed = 0
+    while True:
+        with engine.begin() as connection:
+            position = connection.execute(select(position_column).where(this_migration)).scalar_one()
+            ids = connection.execute(
+                select(id_column).where(id_column > position).order_by(id_column).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return
+            migration.backfill.apply(connection, ids[0], ids[-1])
+            # Позиция сохраняется в той же транзакции, что и пакет: после сбоя пакет повторится целиком
+            connection.execute(update(schema_migrations).where(this_migration).values(backfill_position=ids[-1]))
+        processed += len(ids)
+        if progress:
+            progress(migration.name, processed)
+        if pause:
+            time.sleep(pause)
+
+
+def _create_indexes(connection: Connection, table: Table, *names: str) -> None:
+    for index in table.indexes:
+        if index.name in names:
+            index.create(connection, checkfirst=True)
+
+
+def merge_duplicate_ingredients(
+    connection: Connection, first_id: int | None = None, last_id: int | None = None
+) -> int:
+    """Слияние ингредиентов с одинаковым именем в ингредиент с наименьшим id.
+
+    Связи с блюдами переносятся; если блюдо уже связано с оставшимся
+    ингредиентом, сохраняется его вес. При заданных границах сливаются только
+    дубли с id в [first_id, last_id]. Возвращает число удалённых дублей.
+    """
+    canonical = (
+        select(Ingredient.name, func.min(Ingredient.id).label("id"))
+        .group_by(Ingredient.name)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    query = (
+        select(Ingredient.id, canonical.c.id)
+        .join(canonical, canonical.c.name == Ingredient.name)
+        .where(Ingredient.id != canonical.c.id)
+    )
+    if first_id is not None:
+        query = query.where(Ingredient.id.between(first_id, last_id))
+    duplicates = [
+        {"duplicate_id": duplicate_id, "canonical_id": canonical_id}
+        for duplicate_id, canonical_id in connection.execute(query)
+    ]
+    if not duplicates:
+        return 0
+
+    kept = dish_ingredient.alias("kept")
+    drop_conflicts = delete(dish_ingredient).where(
+        dish_ingredient.c.ingredient_id == bindparam("duplicate_id"),
+        dish_ingredient.c.dish_id.in_(
+            select(kept.c.dish_id).where(kept.c.ingredient_id == bindparam("canonical_id"))
+        ),
+    )
+    move_links = (
+        update(dish_ingredient)
+        .where(dish_ingredient.c.ingredient_id == bindparam("duplicate_id"))
+        .values(ingredient_id=bindparam("canonical_id"))
+    )
+    # По одному дублю: несколько дублей одного блюда сходятся в одну связь
+    for params in duplicates:
+        connection.execute(drop_conflicts, params)
+        connection.execute(move_links, params)
+    connection.execute(
+        delete(Ingredient.__table__).where(Ingredient.__table__.c.id == bindparam("duplicate_id")),
+        duplicates,
+    )
+    return len(duplicates)
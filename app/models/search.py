@@ -0,0 +1,135 @@
+import re
+from typing import List
+
+from sqlalchemy import DDL, Connection, column, event, table, text
+
+from models.database import Base
+
+
+SEARCH_TABLE = "dish_search"
+
+dish_search = table(
+    SEARCH_TABLE,
+    column("rowid"),
+    column("name"),
+    column("description"),
+    column("recipe"),
+    column("ingredients"),
+)
+
+# Веса колонок для bm25: name, description, recipe, ingredients
+BM25_WEIGHTS = (10.0, 2.0, 1.0, 5.0)
+
+_INGREDIENT_NAMES = """
+    coalesce((
+        SELECT group_concat(i.name, ' ')
+        FROM dish_ingredients di JOIN ingredients i ON i.id = di.ingredient_id
+        WHERE di.dish_id = {dish_id}
+    ), '')
+"""
+
+SEARCH_DDL: List[str] = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, description, recipe, ingredients,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS dishes_search_ai AFTER INSERT ON dishes BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, name, description, recipe, ingredients)
+        VALUES (new.id, new.name, new.description, new.recipe,
+                {_INGREDIENT_NAMES.format(dish_id="new.id")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS dishes_search_au
+    AFTER UPDATE OF name, description, recipe ON dishes BEGIN
+        UPDATE {SEARCH_TABLE}
+        SET name = new.name, description = new.description, recipe = new.recipe
+        WHERE rowid = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS dishes_search_ad AFTER DELETE ON dishes BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS dish_ingredients_search_ai
+    AFTER INSERT ON dish_ingredients BEGIN
+        UPDATE {SEARCH_TABLE}
+        SET ingredients = {_INGREDIENT_NAMES.format(dish_id="new.dish_id")}
+        WHERE rowid = new.dish_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS dish_ingredients_search_ad
+    AFTER DELETE ON dish_ingredients BEGIN
+        UPDATE {SEARCH_TABLE}
+        SET ingredients = {_INGREDIENT_NAMES.format(dish_id="old.dish_id")}
+        WHERE rowid = old.dish_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS ingredients_search_au
+    AFTER UPDATE OF name ON ingredients BEGIN
+        UPDATE {SEARCH_TABLE}
+        SET ingredients = {_INGREDIENT_NAMES.format(dish_id=f"{SEARCH_TABLE}.rowid")}
+        WHERE rowid IN (SELECT dish_id FROM dish_ingredients WHERE ingredient_id = new.id);
+    END
+    """,
+]
+
+for statement in SEARCH_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def build_match_query(query: str) -> str:
+    """Преобразование пользовательского ввода в MATCH-запрос FTS5
+
+    Префиксным делается только последнее (набираемое) слово, остальные ищутся точно.
+    """
+    tokens = [f'"{token}"' for token in re.findall(r"\w+", query)]
+    if tokens:
+        tokens[-1] += "*"
+    return " ".join(tokens)
+
+
+_FILL_SEARCH = f"""
+    INSERT INTO {SEARCH_TABLE}(rowid, name, description, recipe, ingredients)
+    SELECT d.id, d.name, d.description, d.recipe, {_INGREDIENT_NAMES.format(dish_id="d.id")}
+    FROM dishes d
+"""
+
+
+def create_search_index(connection: Connection) -> None:
+    """Таблица FTS и триггеры в существующей БД (create_all ставит их только вместе с таблицами)"""
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in SEARCH_DDL:
+        connection.execute(text(statement))
+
+
+def fill_search_index(connection: Connection, first_id: int, last_id: int) -> int:
+    """Строки индекса для блюд с id в [first_id, last_id]; уже проиндексированные заменяются"""
+    if connection.dialect.name != "sqlite":
+        return 0
+    bounds = {"first_id": first_id, "last_id": last_id}
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid BETWEEN :first_id AND :last_id"), bounds)
+    return connection.execute(text(_FILL_SEARCH + " WHERE d.id BETWEEN :first_id AND :last_id"), bounds).rowcount
+
+
+def optimize_search_index(connection: Connection) -> None:
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+
+
+def rebuild_search_index(connection: Connection) -> int:
+    """Полная пересборка поискового индекса по существующим данным"""
+    create_search_index(connection)
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    result = connection.execute(text(_FILL_SEARCH))
+    optimize_search_index(connection)
+    return result.rowcount
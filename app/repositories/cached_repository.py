@@ -0,0 +1,286 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Set, Tuple
+
+
+DEFAULT_MAX_SIZE = 10_000
+DEFAULT_TTL = 30.0
+
+
+def _weight(value: Any) -> int:
+    """Сколько объектов занимает значение в кэше: списки считаются по числу строк"""
+    if isinstance(value, (list, tuple)):
+        return max(len(value), 1)
+    return 1
+
+
+class EntityCache:
+    """LRU/TTL-кэш результатов репозиториев с инвалидацией по тегам.
+
+    Тег — имя таблицы ("dishes") для списочных запросов или пара (таблица, id)
+    для запросов по одной сущности. Размер ограничен суммарным числом
+    закэшированных объектов (max_size).
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Set[Hashable], int, Any]]" = OrderedDict()
+        self._keys_by_tag: Dict[Hashable, Set[Hashable]] = {}
+        self._size = 0
+        self._version = 0
+        self._lock = threading.RLock()
+
+    def get_or_load(self, key: Hashable, tags: Iterable[Hashable], loader: Callable[[], Any]) -> Any:
+        hit, value, version = self._lookup(key)
+        if hit:
+            return value
+        value = loader()
+        self._store_if_current(version, key, tags, value)
+        return value
+
+    async def get_or_load_async(
+        self, key: Hashable, tags: Iterable[Hashable], loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        hit, value, version = self._lookup(key)
+        if hit:
+            return value
+        value = await loader()
+        self._store_if_current(version, key, tags, value)
+        return value
+
+    def invalidate(self, *tags: Hashable) -> None:
+        with self._lock:
+            self._version += 1
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size": self._size,
+                "max_size": self.max_size,
+            }
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any, int]:
+        """(найдено, значение, версия кэша на момент промаха)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, _, _, value = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value, self._version
+                self._remove(key)
+            self.misses += 1
+            return False, None, self._version
+
+    def _store_if_current(self, version: int, key: Hashable, tags: Iterable[Hashable], value: Any) -> None:
+        with self._lock:
+            # Пока шла загрузка, данные могли измениться — такой результат не кэшируем
+            if version == self._version:
+                self._store(key, set(tags), value)
+
+    def _store(self, key: Hashable, tags: Set[Hashable], value: Any) -> None:
+        if key in self._entries:
+            self._remove(key)
+        weight = _weight(value)
+        if weight > self.max_size:
+            return
+        self._entries[key] = (self.clock() + self.ttl, tags, weight, value)
+        self._size += weight
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while self._size > self.max_size:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        _, tags, weight, _ = self._entries.pop(key)
+        self._size -= weight
+        for tag in tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+def _entity_tag(table: str, id) -> Tuple[str, Any]:
+    return table, id
+
+
+# Чтения: метод -> теги результата по аргументам вызова
+CACHED_READS: Dict[str, Callable[..., Iterable[Hashable]]] = {
+    "find_all": lambda table, *a, **kw: {table},
+    "find_page": lambda table, *a, **kw: {table},
+    "find_by_name": lambda table, *a, **kw: {table},
+    "find_one_or_none": lambda table, id, *a, **kw: {_entity_tag(table, id)},
+    "find_columns": lambda table, *columns, **kw: {column.table.name for column in columns},
+    # ids — кортеж: аргументы входят в ключ кэша
+    "find_by_ids": lambda table, *a, **kw: {table},
+    # DishRepository
+    "find_by_ingredient": lambda table, ingredient_id, *a, **kw: {
+        "dishes",
+        "ingredient_dishes",
+        _entity_tag("ingredient_dishes", ingredient_id),
+    },
+    "search": lambda table, *a, **kw: {"dishes", "dish_ingredients", "ingredients"},
+    "filter_page": lambda table, *a, **kw: {"dishes", "dish_ingredients"},
+    "get_ingredients": lambda table, dish_id, *a, **kw: {
+        _entity_tag("dish_ingredients", dish_id),
+        "ingredients",
+    },
+    "get_nutrition": lambda table, dish_id, *a, **kw: {
+        _entity_tag("dishes", dish_id),
+        _entity_tag("dish_ingredients", dish_id),
+        "ingredients",
+    },
+    "get_available_cooks": lambda table, *a, **kw: {"cooks"},
+    "get_available_ingredients": lambda table, *a, **kw: {"ingredients"},
+    # CookRepository
+    "get_top_cooks": lambda table, *a, **kw: {"cooks", "dishes"},
+    "get_dishes_by_cook_id": lambda table, *a, **kw: {"dishes"},
+    # IngredientRepository
+    "get_dishes": lambda table, ingredient_id, *a, **kw: {
+        "dishes",
+        "ingredient_dishes",
+        _entity_tag("ingredient_dishes", ingredient_id),
+    },
+    "find_dishes_by_ids": lambda table, *a, **kw: {"dishes"},
+}
+
+
+def _link_tags(dish_id, ingredient_id) -> Set[Hashable]:
+    return {
+        "dish_ingredients",
+        _entity_tag("dish_ingredients", dish_id),
+        _entity_tag("ingredient_dishes", ingredient_id),
+    }
+
+
+def _delete_tags(table: str, id) -> Set[Hashable]:
+    # Удаление блюда или ингредиента удаляет и его строки dish_ingredients;
+    # все зависящие от них чтения помечены тегом таблицы
+    return {table, _entity_tag(table, id), "dish_ingredients"}
+
+
+# Записи: метод -> теги, которые нужно сбросить
+INVALIDATING_WRITES: Dict[str, Callable[..., Iterable[Hashable]]] = {
+    "add": lambda table, obj, *a, **kw: {table},
+    "update": lambda table, id, *a, **kw: {table, _entity_tag(table, id)},
+    "update_fields": lambda table, id, *a, **kw: {table, _entity_tag(table, id)},
+    "update_versioned": lambda table, id, *a, **kw: {table, _entity_tag(table, id)},
+    "delete": lambda table, obj, *a, **kw: _delete_tags(table, obj.id),
+    "delete_by_id": lambda table, id, *a, **kw: _delete_tags(table, id),
+    # DishRepository
+    "add_or_update_ingredient": lambda table, dish_id, ingredient_id, *a, **kw: _link_tags(dish_id, ingredient_id),
+    "remove_ingredient": lambda table, dish_id, ingredient_id, *a, **kw: _link_tags(dish_id, ingredient_id),
+    # Прежний состав блюда неизвестен, поэтому сбрасываются все выборки «блюда по ингредиенту»
+    "set_ingredients": lambda table, dish_id, *a, **kw: {
+        "dish_ingredients",
+        "ingredient_dishes",
+        _entity_tag("dish_ingredients", dish_id),
+    },
+    "set_dish_cook": lambda table, dish_id, *a, **kw: {"dishes", _entity_tag("dishes", dish_id)},
+    "apply_edits": lambda table, dish_id, version, changes, weights, removed=(), **kw: {
+        "dishes",
+        _entity_tag("dishes", dish_id),
+        *set().union(*(_link_tags(dish_id, id) for id in [*weights, *removed])),
+    },
+    # IngredientRepository
+    "bulk_add_ingredients": lambda table, *a, **kw: {"ingredients"},
+}
+
+
+class CachedRepository:
+    """Прокси над репозиторием: чтения идут через EntityCache, записи точечно его инвалидируют.
+
+    Незарегистрированные методы выполняются напрямую и на всякий случай
+    сбрасывают кэш таблицы репозитория.
+    """
+
+    def __init__(self, repository, cache: EntityCache):
+        self.repository = repository
+        self.cache = cache
+        self.table = repository.model.__tablename__
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.repository, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        if name in CACHED_READS:
+            return self._cached_read(name, attr)
+        return self._invalidating_write(name, attr)
+
+    def _cached_read(self, name: str, method: Callable) -> Callable:
+        tags_for = CACHED_READS[name]
+
+        def read(*args, **kwargs):
+            key = (self.table, name, args, tuple(sorted(kwargs.items())))
+            tags = tags_for(self.table, *args, **kwargs)
+            return self.cache.get_or_load(key, tags, lambda: method(*args, **kwargs))
+
+        return read
+
+    def _invalidating_write(self, name: str, method: Callable) -> Callable:
+        tags_for = INVALIDATING_WRITES.get(name)
+
+        def write(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                if tags_for is not None:
+                    self.cache.invalidate(*tags_for(self.table, *args, **kwargs))
+                else:
+                    self.cache.invalidate(self.table, "dish_ingredients")
+
+        return write
+
+
+class AsyncCachedRepository(CachedRepository):
+    """Тот же прокси для асинхронных репозиториев; ключи и теги общие с синхронным,
+    поэтому обе версии могут делить один EntityCache"""
+
+    def _cached_read(self, name: str, method: Callable) -> Callable:
+        tags_for = CACHED_READS[name]
+
+        async def read(*args, **kwargs):
+            key = (self.table, name, args, tuple(sorted(kwargs.items())))
+            tags = tags_for(self.table, *args, **kwargs)
+            return await self.cache.get_or_load_async(key, tags, lambda: method(*args, **kwargs))
+
+        return read
+
+    def _invalidating_write(self, name: str, method: Callable) -> Callable:
+        tags_for = INVALIDATING_WRITES.get(name)
+
+        async def write(*args, **kwargs):
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                if tags_for is not None:
+                    self.cache.invalidate(*tags_for(self.table, *args, **kwargs))
+                else:
+                    self.cache.invalidate(self.table, "dish_ingredients")
+
+        return write
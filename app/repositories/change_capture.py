@@ -0,0 +1,131 @@
+"""Изменения строк меню, сделанные этим процессом, по событиям SQLAlchemy.
+
+after_insert/after_update/after_delete моделей ловят записи через unit of work
+(add, update, delete), do_orm_execute — UPDATE/DELETE/INSERT-запросы
+(update_fields, update_versioned, связи dish_ingredients). Изменения копятся
+в session.info и публикуются после фиксации транзакции; откат их отбрасывает.
+Записи в обход Session (импорт, миграции) сюда не попадают.
+"""
+import threading
+from functools import partial
+from typing import Any, Dict, Iterable, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session, object_session
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+
+from models.dishes import Cook, Dish, Ingredient, dish_ingredient
+from repositories.change_feed import Change, ChangeCallback
+
+
+CAPTURED_MODELS = (Cook, Dish, Ingredient)
+
+_OPS = {"after_insert": "I", "after_update": "U", "after_delete": "D"}
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install_change_capture(publish: ChangeCallback) -> None:
+    """Подписка на записи всех сессий процесса; повторный вызов ничего не делает"""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+
+    for model in CAPTURED_MODELS:
+        for name, op in _OPS.items():
+            event.listen(model, name, partial(_capture_row, op))
+
+    @event.listens_for(Session, "do_orm_execute")
+    def capture_statement(state: ORMExecuteState) -> None:
+        if state.is_insert or state.is_update or state.is_delete:
+            _pending(state.session).extend(_statement_changes(state))
+
+    @event.listens_for(Session, "after_commit")
+    def after_commit(session: Session) -> None:
+        changes = session.info.pop("captured_changes", None)
+        if changes:
+            publish(changes)
+
+    @event.listens_for(Session, "after_rollback")
+    def after_rollback(session: Session) -> None:
+        session.info.pop("captured_changes", None)
+
+
+def _pending(session: Session) -> List[Change]:
+    return session.info.setdefault("captured_changes", [])
+
+
+def _capture_row(op: str, mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    table = mapper.local_table.name
+    changes = _pending(session)
+    changes.append(Change(0, table, op, target.id, None))
+    if op == "I":
+        # Связи, переданные через relationship вместе с новой сущностью
+        related = target.__dict__.get("ingredients" if table == "dishes" else "dishes") or ()
+        for other in related:
+            dish_id, ingredient_id = (target.id, other.id) if table == "dishes" else (other.id, target.id)
+            changes.append(Change(0, dish_ingredient.name, "I", dish_id, ingredient_id))
+
+
+def _statement_changes(state: ORMExecuteState) -> List[Change]:
+    statement = state.statement
+    table = statement.table
+    if table.name not in {model.__tablename__ for model in CAPTURED_MODELS} | {dish_ingredient.name}:
+        return []
+    op = "D" if state.is_delete else "I" if state.is_insert else "U"
+    is_link = table.name == dish_ingredient.name
+    key = "dish_id" if is_link else "id"
+
+    if state.is_insert:
+        rows = _insert_rows(state)
+        if is_link:
+            return [Change(0, table.name, op, row.get("dish_id"), row.get("ingredient_id")) for row in rows]
+        return [Change(0, table.name, op, row.get(key), None) for row in rows]
+
+    row_ids = _where_values(statement.whereclause, key)
+    if not row_ids:
+        return [Change(0, table.name, op, None, None)]
+    other_ids = _where_values(statement.whereclause, "ingredient_id") if is_link else set()
+    return [
+        Change(0, table.name, op, row_id, other_id)
+        for row_id in sorted(row_ids)
+        for other_id in (sorted(other_ids) or [None])
+    ]
+
+
+def _insert_rows(state: ORMExecuteState) -> List[Dict[str, Any]]:
+    parameters = state.parameters
+    if isinstance(parameters, dict):
+        parameters = [parameters]
+    if parameters:
+        return list(parameters)
+    # insert().values(...): значения уже в запросе
+    return [state.statement.compile().params]
+
+
+def _where_values(clause, key: str) -> Set[Any]:
+    """Значения key из условий key = :value и key IN (...); NOT IN и прочее не учитываются"""
+    if clause is None:
+        return set()
+    values: Set[Any] = set()
+    for element in visitors.iterate(clause):
+        if not isinstance(element, BinaryExpression) or getattr(element.left, "key", None) != key:
+            continue
+        if not isinstance(element.right, BindParameter):
+            continue
+        if element.operator is operators.eq:
+            values.add(element.right.value)
+        elif element.operator is operators.in_op:
+            values.update(_as_list(element.right.value))
+    return values
+
+
+def _as_list(value) -> Iterable[Any]:
+    return value if isinstance(value, (list, tuple, set, frozenset)) else [value]
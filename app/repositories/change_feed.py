@@ -0,0 +1,406 @@
+"""Изменения строк меню: общая лента для нескольких процессов и рассылка внутри процесса.
+
+Триггеры (models.change_feed) пишут в change_feed каждую изменённую строку
+cooks, dishes, ingredients и dish_ingredients — и записи репозиториев, и импорт,
+и соседние процессы. ChangeFeed опрашивает ленту в фоновом потоке и передаёт
+новые строки подписчикам; ChangeInvalidator по ним сбрасывает кэш, индекс
+ингредиентов и итоги пищевой ценности процесса. ChangeBroadcast раздаёт
+изменения открытым экранам страниц (через их event loop).
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Hashable, List, NamedTuple, Sequence, Set
+
+from sqlalchemy import delete, func, insert, select, update
+
+from models.change_feed import FEED_TABLES, change_feed, change_feed_subscribers
+from repositories.cached_repository import EntityCache, _delete_tags, _entity_tag, _link_tags
+
+
+# Лента включается для многопроцессного запуска (python -m deploy.web): DISH_MENU_CHANGE_FEED=1
+CHANGE_FEED_ENABLED = os.environ.get("DISH_MENU_CHANGE_FEED", "0") == "1"
+
+POLL_INTERVAL = 0.2
+# Позиция подписчика сохраняется не при каждом опросе: это запись в общую БД
+HEARTBEAT_INTERVAL = 2.0
+# Подписчик без отметок дольше этого считается остановленным; его строки ленты удаляются
+STALE_AFTER = 60.0
+POLL_BATCH = 1000
+# Больше изменений за опрос (импорт, миграция) — дешевле сбросить всё, чем разбирать по строкам
+FULL_RESET_CHANGES = 10_000
+
+logger = logging.getLogger("dish_menu.change_feed")
+
+
+class Change(NamedTuple):
+    id: int
+    table: str
+    # I, U или D
+    op: str
+    # None — изменённые строки таблицы неизвестны (запрос без условия по id)
+    row_id: int | None
+    # Ингредиент для строк dish_ingredients; None, если неизвестен
+    other_id: int | None
+
+
+# Пакет изменений подписчику: список строк ленты или RESET
+ChangeBatch = Sequence[Change]
+ChangeCallback = Callable[[ChangeBatch], None]
+
+
+class _Reset(tuple):
+    """Пустой неизменяемый пакет; отличается от обычного пустого пакета по is"""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "RESET"
+
+
+# Пакет, после которого подписчику нужно сбросить всё: часть ленты потеряна
+RESET: ChangeBatch = _Reset()
+
+
+def is_reset(changes: ChangeBatch) -> bool:
+    return changes is RESET
+
+
+def changed_tables(changes: ChangeBatch) -> Set[str]:
+    """Таблицы, затронутые пакетом; после RESET — все"""
+    if is_reset(changes):
+        return set(FEED_TABLES)
+    return {change.table for change in changes}
+
+
+class RowChanges(NamedTuple):
+    # Вставленные или изменённые строки: их нужно перечитать
+    upserted: Set[int]
+    deleted: Set[int]
+
+    def __bool__(self) -> bool:
+        return bool(self.upserted or self.deleted)
+
+
+def row_changes(changes: ChangeBatch, table: str, by_other: bool = False) -> RowChanges | None:
+    """id изменённых строк table в порядке изменений (для dish_ingredients — блюда,
+    by_other=True — ингредиенты). None — строки неизвестны, нужна полная перезагрузка"""
+    if is_reset(changes):
+        return None
+    upserted: Set[int] = set()
+    deleted: Set[int] = set()
+    for change in changes:
+        if change.table != table:
+            continue
+        id = change.other_id if by_other else change.row_id
+        if id is None:
+            return None
+        if change.op == "D" and table != "dish_ingredients":
+            upserted.discard(id)
+            deleted.add(id)
+        else:
+            # Связь удалена, но блюдо осталось: его строку нужно перечитать
+            deleted.discard(id)
+            upserted.add(id)
+    return RowChanges(upserted, deleted)
+
+
+class _Subscribers:
+    """Синхронные подписчики на пакеты изменений"""
+
+    def __init__(self):
+        self._callbacks: List[ChangeCallback] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: ChangeCallback) -> Callable[[], None]:
+        """Подписка на пакеты изменений; возвращает функцию отписки"""
+        with self._lock:
+            self._callbacks.append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+        return unsubscribe
+
+    def _dispatch(self, changes: ChangeBatch) -> None:
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(changes)
+            except Exception:
+                logger.exception("Change subscriber failed")
+
+
+class ChangeFeed(_Subscribers):
+    """Опрос ленты изменений в фоновом потоке.
+
+    Подписчики получают пакеты новых строк в порядке id, в потоке опроса;
+    пустой пакет RESET означает, что строки могли быть пропущены (процесс
+    долго не опрашивал ленту) и производные данные нужно сбросить целиком.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        poll_interval: float = POLL_INTERVAL,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+        stale_after: float = STALE_AFTER,
+    ):
+        super().__init__()
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.subscriber_id = uuid.uuid4().hex
+        self.cursor = 0
+        self.received = 0
+        self.resets = 0
+        self._heartbeat_at = 0.0
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Регистрация подписчика и запуск потока опроса; повторные вызовы ничего не делают"""
+        with self._lock:
+            if self.running:
+                return
+            self._register()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self.session_factory() as session:
+            session.execute(delete(change_feed_subscribers).where(change_feed_subscribers.c.id == self.subscriber_id))
+            session.commit()
+
+    def poll_once(self) -> List[Change]:
+        """Чтение новых строк и рассылка подписчикам; возвращает прочитанное"""
+        changes: List[Change] = []
+        # В SQLite писатель один, поэтому строки ленты видны строго в порядке id
+        with self.session_factory() as session:
+            while True:
+                rows = session.execute(
+                    select(change_feed)
+                    .where(change_feed.c.id > self.cursor)
+                    .order_by(change_feed.c.id)
+                    .limit(POLL_BATCH)
+                ).all()
+                changes.extend(Change(*row) for row in rows)
+                if rows:
+                    self.cursor = rows[-1].id
+                if len(rows) < POLL_BATCH:
+                    break
+        if changes:
+            self.received += len(changes)
+            self._dispatch(changes)
+        if time.monotonic() - self._heartbeat_at >= self.heartbeat_interval:
+            self._heartbeat()
+        return changes
+
+    def stats(self) -> Dict[str, int | bool]:
+        return {
+            "running": self.running,
+            "cursor": self.cursor,
+            "received": self.received,
+            "resets": self.resets,
+            "subscribers": len(self._callbacks),
+        }
+
+    def _register(self) -> None:
+        with self.session_factory() as session:
+            # Читать с текущего конца ленты: всё более раннее процесс загрузит из таблиц
+            self.cursor = session.scalar(select(func.coalesce(func.max(change_feed.c.id), 0)))
+            session.execute(
+                insert(change_feed_subscribers).values(
+                    id=self.subscriber_id, pid=os.getpid(), last_id=self.cursor, seen_at=time.time()
+                )
+            )
+            session.commit()
+        self._heartbeat_at = time.monotonic()
+
+    def _heartbeat(self) -> None:
+        """Отметка позиции подписчика и очистка ленты до самой отставшей позиции"""
+        now = time.time()
+        subscribers = change_feed_subscribers.c
+        with self.session_factory() as session:
+            found = session.execute(
+                update(change_feed_subscribers)
+                .where(subscribers.id == self.subscriber_id)
+                .values(last_id=self.cursor, seen_at=now)
+            ).rowcount
+            session.execute(delete(change_feed_subscribers).where(subscribers.seen_at < now - self.stale_after))
+            oldest = session.scalar(select(func.min(subscribers.last_id)))
+            if oldest is not None:
+                session.execute(delete(change_feed).where(change_feed.c.id <= oldest))
+            session.commit()
+        self._heartbeat_at = time.monotonic()
+        if not found:
+            # Соседний процесс счёл этот остановленным и мог удалить непрочитанные строки
+            self.resets += 1
+            self._register()
+            self._dispatch(RESET)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll_once()
+            except Exception:
+                # БД занята или недоступна: следующий опрос продолжит с того же курсора
+                logger.exception("Change feed poll failed")
+
+
+class ChangeBroadcast(_Subscribers):
+    """Рассылка изменений внутри процесса.
+
+    Синхронные подписчики (subscribe) вызываются сразу, в потоке публикации:
+    так кэш сбрасывается раньше, чем экраны перечитают строки. Экраны страниц
+    получают пакеты через listen() в своём event loop.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._subscriptions: Set["ChangeSubscription"] = set()
+
+    def listen(self) -> "ChangeSubscription":
+        """Очередь пакетов для текущего event loop; закрывается через close()"""
+        subscription = ChangeSubscription(self)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def publish(self, changes: ChangeBatch) -> None:
+        """Вызов из любого потока"""
+        self._dispatch(changes)
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.put(changes)
+
+    def _remove(self, subscription: "ChangeSubscription") -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+
+class ChangeSubscription:
+    """Пакеты изменений для одного event loop; пакеты, накопившиеся за время
+    обработки предыдущего, выдаются одним"""
+
+    def __init__(self, broadcast: ChangeBroadcast):
+        self.broadcast = broadcast
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._closed = False
+
+    def put(self, changes: ChangeBatch) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, changes)
+        except RuntimeError:
+            # Event loop страницы уже остановлен
+            self.close()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.broadcast._remove(self)
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        except RuntimeError:
+            pass
+
+    def __aiter__(self) -> "ChangeSubscription":
+        return self
+
+    async def __anext__(self) -> ChangeBatch:
+        batches = [await self._queue.get()]
+        while not self._queue.empty():
+            batches.append(self._queue.get_nowait())
+        if None in batches:
+            raise StopAsyncIteration
+        if any(is_reset(batch) for batch in batches):
+            return RESET
+        return [change for batch in batches for change in batch]
+
+
+class ChangeInvalidator:
+    """Подписчик ленты: применяет чужие (и свои) изменения к производным данным процесса.
+
+    Записи своего процесса прокси уже учли; повторное применение безвредно —
+    сброс тегов и пометки итогов идемпотентны.
+    """
+
+    def __init__(self, cache: EntityCache, index=None, rollup=None):
+        self.cache = cache
+        self.index = index
+        self.rollup = rollup
+
+    def __call__(self, changes: ChangeBatch) -> None:
+        if (
+            is_reset(changes)
+            or len(changes) > FULL_RESET_CHANGES
+            or any(change.row_id is None for change in changes)
+        ):
+            self.reset()
+            return
+        tags: Set[Hashable] = set()
+        for change in changes:
+            tags |= self._apply(change)
+        if tags:
+            self.cache.invalidate(*tags)
+
+    def reset(self) -> None:
+        self.cache.clear()
+        if self.index is not None:
+            self.index.invalidate()
+        if self.rollup is not None:
+            self.rollup.invalidate()
+
+    def _apply(self, change: Change) -> Set[Hashable]:
+        """Обновление индекса и итогов по одной строке; возвращает теги кэша для сброса"""
+        table, op, id = change.table, change.op, change.row_id
+        index, rollup = self.index, self.rollup
+        if table == "dish_ingredients":
+            if change.other_id is None:
+                # Изменены связи блюда с неизвестными ингредиентами (set_ingredients)
+                if index is not None and op != "U":
+                    index.invalidate()
+                if rollup is not None:
+                    rollup.mark_dishes(id)
+                return {"dish_ingredients", "ingredient_dishes", _entity_tag("dish_ingredients", id)}
+            if index is not None and op == "I":
+                index.add_link(id, change.other_id)
+            elif index is not None and op == "D":
+                index.remove_link(id, change.other_id)
+            if rollup is not None:
+                rollup.mark_dishes(id)
+            return _link_tags(id, change.other_id)
+        if op == "I":
+            return {table}
+        if op == "U":
+            if table == "ingredients" and rollup is not None:
+                rollup.mark_ingredient(id)
+            return {table, _entity_tag(table, id)}
+        # Удаление: строки dish_ingredients приходят отдельными изменениями
+        if table == "dishes":
+            if index is not None:
+                index.remove_dish(id)
+            if rollup is not None:
+                rollup.mark_dishes(id)
+        elif table == "ingredients" and index is not None:
+            index.remove_ingredient(id)
+        return _delete_tags(table, id)
@@ -1,35 +1,49 @@
 from typing import List, Tuple
 
-from sqlalchemy import func
-from sqlalchemy.orm import aliased
+from sqlalchemy import Select, select
 
+import models.leaderboard  # noqa: F401  (триггеры счётчика блюд)
 from models.dishes import Cook, Dish
-from repositories.repository import BaseRepository
+from repositories.repository import AsyncBaseRepository, BaseRepository
 
 
-class CookRepository(BaseRepository):
-    def __init__(self, session_factory):
-        super().__init__(session_factory, Cook)
+class CookQueries:
+    """Запросы поваров, общие для CookRepository и AsyncCookRepository"""
 
-    def get_top_cooks(self, limit: int) -> List[Tuple[Cook, int]]:
-        with self.session_factory() as session:
-            dish_alias = aliased(Dish)
+    def _top_cooks_statement(self, limit: int) -> Select:
+        """Топ-N по денормализованному счётчику: чтение по ix_cooks_dishes_count без агрегации"""
+        return (
+            select(self.model, self.model.dishes_count)
+            .order_by(self.model.dishes_count.desc(), self.model.id)
+            .limit(limit)
+        )
+
+    @staticmethod
+    def _dishes_by_cook_statement(cook_id: int) -> Select:
+        return select(Dish).where(Dish.cook_id == cook_id)
 
-            query = (
-                session.query(
-                    self.model,
-                    func.count(dish_alias.id).label("dishes_count")
-                ).outerjoin(dish_alias, self.model.id == dish_alias.cook_id)
-                .group_by(self.model.id, self.model.name, self.model.bio)
-                .order_by(func.count(dish_alias.id).desc())
-                .limit(limit)
-            )
 
-            return query.all()
+class CookRepository(CookQueries, BaseRepository):
+    def __init__(self, session_factory, read_session_factory=None):
+        super().__init__(session_factory, Cook, read_session_factory)
+
+    def get_top_cooks(self, limit: int) -> List[Tuple[Cook, int]]:
+        with self.read_session_factory() as session:
+            return session.execute(self._top_cooks_statement(limit)).all()
 
     def get_dishes_by_cook_id(self, cook_id) -> List[Dish]:
         with self.session_factory() as session:
-            cook = session.query(self.model).filter(self.model.id == cook_id).one_or_none()
-            if cook:
-                return cook.dishes
-            return []
+            return list(session.scalars(self._dishes_by_cook_statement(cook_id)))
+
+
+class AsyncCookRepository(CookQueries, AsyncBaseRepository):
+    def __init__(self, session_factory, read_session_factory=None):
+        super().__init__(session_factory, Cook, read_session_factory)
+
+    async def get_top_cooks(self, limit: int) -> List[Tuple[Cook, int]]:
+        async with self.read_session_factory() as session:
+            return (await session.execute(self._top_cooks_statement(limit))).all()
+
+    async def get_dishes_by_cook_id(self, cook_id) -> List[Dish]:
+        async with self.session_factory() as session:
+            return list(await session.scalars(self._dishes_by_cook_statement(cook_id)))
@@ -0,0 +1,35 @@
+from dataclasses import dataclass
+from typing import FrozenSet, Tuple
+
+
+@dataclass(frozen=True)
+class IngredientCondition:
+    """Ингредиент, который должен быть в блюде, с необязательными границами веса"""
+
+    ingredient_id: int
+    min_weight: float | None = None
+    max_weight: float | None = None
+
+    @property
+    def has_weight_bounds(self) -> bool:
+        return self.min_weight is not None or self.max_weight is not None
+
+
+@dataclass(frozen=True)
+class DishFilter:
+    """Фильтр блюд: все ингредиенты include, ни одного из exclude, повар из cook_ids.
+
+    Неизменяемый и хешируемый, поэтому может быть частью ключа EntityCache.
+    """
+
+    include: Tuple[IngredientCondition, ...] = ()
+    exclude: FrozenSet[int] = frozenset()
+    cook_ids: FrozenSet[int] = frozenset()
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.include or self.exclude or self.cook_ids)
+
+    @property
+    def include_ids(self) -> FrozenSet[int]:
+        return frozenset(condition.ingredient_id for condition in self.include)
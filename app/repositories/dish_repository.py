@@ -1,90 +1,501 @@
-from typing import List, Tuple
+from typing import Any, Collection, Dict, FrozenSet, Iterable, List, Tuple, Sequence
 
-from sqlalchemy import and_
-from sqlalchemy.orm import aliased
+from sqlalchemy import ColumnElement, Delete, Row, Select, and_, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy.sql.base import ExecutableOption
 
 from models.dishes import Dish, Ingredient, dish_ingredient, Cook
-from repositories.repository import BaseRepository
+from models.search import BM25_WEIGHTS, SEARCH_TABLE, build_match_query, dish_search
+from repositories.dish_filter import DishFilter, IngredientCondition
+from repositories.nutrition import NutritionTotals, nutrition_sums
+from repositories.repository import (
+    ID_LIST_LIMIT,
+    AsyncBaseRepository,
+    BaseRepository,
+    ConcurrentUpdateError,
+    Page,
+    contains_pattern,
+)
 
+# Размер пакета при просмотре id блюд в порядке имени
+SCAN_BATCH = 1000
 
-class DishRepository(BaseRepository):
-    def __init__(self, session_factory):
-        super().__init__(session_factory, Dish)
 
-    def find_by_ingredient(self, ingredient_id: int) -> List[Dish]:
-        with self.session_factory() as session:
-            query = session.query(self.model).join(self.model.ingredients).filter(Ingredient.id == ingredient_id)
-            return query.all()
+def upsert_dish_ingredients(session: Session, rows: List[Dict[str, Any]]) -> None:
+    """Пакетный upsert строк dish_ingredients (dish_id, ingredient_id, weight)"""
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = insert(dish_ingredient)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[dish_ingredient.c.dish_id, dish_ingredient.c.ingredient_id],
+            set_={"weight": stmt.excluded.weight},
+        )
+        session.execute(stmt, rows)
+        return
+
+    # Переносимый вариант для СУБД без ON CONFLICT
+    for row in rows:
+        result = session.execute(
+            dish_ingredient.update()
+            .where(
+                and_(
+                    dish_ingredient.c.dish_id == row["dish_id"],
+                    dish_ingredient.c.ingredient_id == row["ingredient_id"],
+                )
+            )
+            .values(weight=row["weight"])
+        )
+        if result.rowcount == 0:
+            session.execute(dish_ingredient.insert().values(**row))
 
-    def add_or_update_ingredient(self, dish_id: int, ingredient_id: int, weight: float) -> Dish | None:
-        with self.session_factory() as session:
-            dish = session.query(self.model).filter(self.model.id == dish_id).one_or_none()
-            ingredient = session.query(Ingredient).filter(Ingredient.id == ingredient_id).one_or_none()
 
-            if not dish or not ingredient:
-                return None
+class DishQueries:
+    """Запросы блюд, общие для DishRepository и AsyncDishRepository"""
 
-            existing = (
-                session.query(dish_ingredient)
-                .filter(
-                    (dish_ingredient.c.dish_id == dish_id)
-                    & (dish_ingredient.c.ingredient_id == ingredient_id)
+    # Для строк списка: повар подтягивается тем же запросом
+    LIST_OPTIONS = (joinedload(Dish.cook),)
+
+    def _by_ingredient_statement(self, ingredient_id: int, options: Sequence[ExecutableOption] = ()) -> Select:
+        return (
+            self._select(options)
+            .join(dish_ingredient, dish_ingredient.c.dish_id == self.model.id)
+            .where(dish_ingredient.c.ingredient_id == ingredient_id)
+        )
+
+    def _filter_conditions(self, dish_filter: DishFilter) -> List[ColumnElement[bool]]:
+        """Условия фильтра для WHERE: пересечение множеств блюд по ингредиентам
+        через GROUP BY/HAVING, исключения через NOT IN по индексу ingredient_id"""
+        conditions = []
+        if dish_filter.include:
+            matches = [
+                and_(
+                    dish_ingredient.c.ingredient_id == condition.ingredient_id,
+                    *self._weight_bounds(condition),
                 )
-                .first()
+                for condition in dish_filter.include
+            ]
+            containing_all = (
+                select(dish_ingredient.c.dish_id)
+                .where(or_(*matches))
+                .group_by(dish_ingredient.c.dish_id)
+                # (dish_id, ingredient_id) — первичный ключ, поэтому число строк равно числу ингредиентов
+                .having(func.count() == len(dish_filter.include_ids))
+            )
+            conditions.append(self.model.id.in_(containing_all))
+        if dish_filter.exclude:
+            containing_any = select(dish_ingredient.c.dish_id).where(
+                dish_ingredient.c.ingredient_id.in_(sorted(dish_filter.exclude))
+            )
+            conditions.append(self.model.id.not_in(containing_any))
+        if dish_filter.cook_ids:
+            conditions.append(self.model.cook_id.in_(sorted(dish_filter.cook_ids)))
+        return conditions
+
+    @staticmethod
+    def _weight_bounds(condition: IngredientCondition) -> List[ColumnElement[bool]]:
+        bounds = []
+        if condition.min_weight is not None:
+            bounds.append(dish_ingredient.c.weight >= condition.min_weight)
+        if condition.max_weight is not None:
+            bounds.append(dish_ingredient.c.weight <= condition.max_weight)
+        return bounds
+
+    def _filter_page_statement(
+        self,
+        dish_filter: DishFilter,
+        limit: int,
+        cursor: str | None,
+        options: Sequence[ExecutableOption] = (),
+    ) -> Select:
+        return self._page_statement(limit, cursor, "name", options).where(*self._filter_conditions(dish_filter))
+
+    def _within_page_statement(
+        self,
+        dish_ids: Sequence[int],
+        cook_ids: FrozenSet[int],
+        limit: int,
+        cursor: str | None,
+        options: Sequence[ExecutableOption] = (),
+    ) -> Select:
+        return self._page_statement(limit, cursor, "name", options).where(
+            self.model.id.in_(dish_ids), *self._filter_conditions(DishFilter(cook_ids=cook_ids))
+        )
+
+    def _max_id_statement(self) -> Select:
+        return select(func.max(self.model.id))
+
+    @staticmethod
+    def _scan_is_cheaper(count: int, limit: int, max_id: int) -> bool:
+        """IN-список стоит ~count поисков по ключу, просмотр по имени — ~(limit + 1) * max_id / count строк"""
+        return count > ID_LIST_LIMIT or count * count > (limit + 1) * max_id
+
+    def _ordered_ids_statement(self, cursor: str | None, cook_ids: FrozenSet[int]) -> Select:
+        """id блюд в порядке имени после cursor, без LIMIT: читаются, пока не наберётся страница"""
+        return (
+            self._page_statement(0, cursor, "name")
+            .where(*self._filter_conditions(DishFilter(cook_ids=cook_ids)))
+            .with_only_columns(self.model.id)
+            .limit(None)
+            .execution_options(yield_per=SCAN_BATCH)
+        )
+
+    def _search_statement(
+        self, query: str, dialect: str, limit: int, offset: int, options: Sequence[ExecutableOption] = ()
+    ) -> Select | None:
+        """Полнотекстовый поиск с ранжированием bm25 (FTS5 в SQLite, ilike в остальных СУБД)"""
+        match = build_match_query(query)
+        if not match:
+            return None
+
+        if dialect == "sqlite":
+            fts = literal_column(SEARCH_TABLE)
+            stmt = (
+                select(self.model)
+                .join(dish_search, dish_search.c.rowid == self.model.id)
+                .where(fts.op("MATCH")(match))
+                .order_by(func.bm25(fts, *BM25_WEIGHTS))
             )
+        else:
+            stmt = self._search_without_fts(query)
+        return stmt.limit(limit).offset(offset).options(*options)
 
-            if existing:
-                session.execute(
-                    dish_ingredient.update()
+    def _search_without_fts(self, query: str) -> Select:
+        """Переносимый поиск для СУБД без FTS5: каждое слово должно встретиться в одном из полей или ингредиентов"""
+        conditions = []
+        for token in query.split():
+            pattern = contains_pattern(token)
+            conditions.append(
+                or_(
+                    self.model.name.ilike(pattern, escape="\\"),
+                    self.model.description.ilike(pattern, escape="\\"),
+                    self.model.recipe.ilike(pattern, escape="\\"),
+                    select(dish_ingredient.c.dish_id)
+                    .join(Ingredient, Ingredient.id == dish_ingredient.c.ingredient_id)
                     .where(
-                        (dish_ingredient.c.dish_id == dish_id)
-                        & (dish_ingredient.c.ingredient_id == ingredient_id)
-                    )
-                    .values(weight=weight)
-                )
-            else:
-                session.execute(
-                    dish_ingredient.insert().values(
-                        dish_id=dish_id, ingredient_id=ingredient_id, weight=weight
+                        dish_ingredient.c.dish_id == self.model.id,
+                        Ingredient.name.ilike(pattern, escape="\\"),
                     )
+                    .exists(),
                 )
+            )
+        return select(self.model).where(and_(*conditions)).order_by(self.model.name, self.model.id)
+
+    @staticmethod
+    def _ingredient_rows(dish_id: int, weights: Dict[int, float]) -> List[Dict[str, Any]]:
+        return [
+            {"dish_id": dish_id, "ingredient_id": ingredient_id, "weight": weight}
+            for ingredient_id, weight in weights.items()
+        ]
+
+    @staticmethod
+    def _stale_ingredients_statement(dish_id: int, keep: Iterable[int]) -> Delete:
+        stmt = dish_ingredient.delete().where(dish_ingredient.c.dish_id == dish_id)
+        keep = list(keep)
+        if keep:
+            stmt = stmt.where(dish_ingredient.c.ingredient_id.not_in(keep))
+        return stmt
+
+    @staticmethod
+    def _ingredients_statement(dish_id: int) -> Select:
+        di_alias = aliased(dish_ingredient)
+        return (
+            select(Ingredient, di_alias.c.weight)
+            .join(di_alias, di_alias.c.ingredient_id == Ingredient.id)
+            .where(di_alias.c.dish_id == dish_id)
+        )
+
+    @staticmethod
+    def _nutrition_statement(dish_id: int) -> Select:
+        return (
+            select(*nutrition_sums())
+            .select_from(dish_ingredient)
+            .join(Ingredient, Ingredient.id == dish_ingredient.c.ingredient_id)
+            .where(dish_ingredient.c.dish_id == dish_id)
+        )
+
+    @staticmethod
+    def _removed_ingredients_statement(dish_id: int, ingredient_ids: Collection[int]) -> Delete:
+        return dish_ingredient.delete().where(
+            dish_ingredient.c.dish_id == dish_id,
+            dish_ingredient.c.ingredient_id.in_(sorted(ingredient_ids)),
+        )
+
+    @staticmethod
+    def _remove_ingredient_statement(dish_id: int, ingredient_id: int) -> Delete:
+        return dish_ingredient.delete().where(
+            and_(
+                dish_ingredient.c.dish_id == dish_id,
+                dish_ingredient.c.ingredient_id == ingredient_id,
+            )
+        )
+
+
+class DishRepository(DishQueries, BaseRepository):
+    def __init__(self, session_factory, read_session_factory=None):
+        super().__init__(session_factory, Dish, read_session_factory)
+
+    def find_by_ingredient(self, ingredient_id: int, options: Sequence[ExecutableOption] = ()) -> List[Dish]:
+        with self.read_session_factory() as session:
+            return list(session.scalars(self._by_ingredient_statement(ingredient_id, options)).unique())
+
+    def filter_page(
+        self,
+        dish_filter: DishFilter,
+        limit: int = 50,
+        cursor: str | None = None,
+        options: Sequence[ExecutableOption] = (),
+    ) -> Page[Dish]:
+        """Страница блюд по фильтру ингредиентов и поваров, упорядоченная по имени"""
+        stmt = self._filter_page_statement(dish_filter, limit, cursor, options)
+        with self.read_session_factory() as session:
+            rows = list(session.scalars(stmt).unique())
+        return self._page_result(rows, limit, "name")
+
+    def filter_page_within(
+        self,
+        dish_ids: Collection[int],
+        cook_ids: FrozenSet[int] = frozenset(),
+        limit: int = 50,
+        cursor: str | None = None,
+        options: Sequence[ExecutableOption] = (),
+    ) -> Page[Dish]:
+        """Страница по имени среди id, найденных индексом ингредиентов.
+
+        Короткий список передаётся в IN (...); если блюд в множестве много, страница
+        набирается при просмотре id в порядке имени с проверкой принадлежности.
+        """
+        with self.read_session_factory() as session:
+            max_id = session.scalar(self._max_id_statement()) or 0
+            if self._scan_is_cheaper(len(dish_ids), limit, max_id):
+                page_ids = []
+                for dish_id in session.scalars(self._ordered_ids_statement(cursor, cook_ids)):
+                    if dish_id in dish_ids:
+                        page_ids.append(dish_id)
+                        if len(page_ids) > limit:
+                            break
+                dish_ids = page_ids
+            stmt = self._within_page_statement(list(dish_ids), cook_ids, limit, cursor, options)
+            rows = list(session.scalars(stmt).unique())
+        return self._page_result(rows, limit, "name")
+
+    def search(
+        self, query: str, limit: int = 50, offset: int = 0, options: Sequence[ExecutableOption] = ()
+    ) -> List[Dish]:
+        """Полнотекстовый поиск по названию, описанию, рецепту и ингредиентам с ранжированием bm25"""
+        with self.read_session_factory() as session:
+            stmt = self._search_statement(query, session.get_bind().dialect.name, limit, offset, options)
+            if stmt is None:
+                return []
+            return list(session.scalars(stmt).unique())
+
+    def add_or_update_ingredient(self, dish_id: int, ingredient_id: int, weight: float) -> bool:
+        """Вес ингредиента в блюде одним INSERT ... ON CONFLICT DO UPDATE.
 
+        Существование блюда и ингредиента проверяют внешние ключи; возвращает False, если их нет.
+        """
+        with self.session_factory() as session:
+            try:
+                upsert_dish_ingredients(session, self._ingredient_rows(dish_id, {ingredient_id: weight}))
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+                return False
+            return True
+
+    def set_ingredients(self, dish_id: int, ingredients: Iterable[Tuple[int, float]]) -> int:
+        """Замена полного списка ингредиентов блюда [(ingredient_id, weight), ...] в одной транзакции"""
+        weights = dict(ingredients)
+        with self.session_factory() as session:
+            session.execute(self._stale_ingredients_statement(dish_id, weights))
+            if weights:
+                upsert_dish_ingredients(session, self._ingredient_rows(dish_id, weights))
+            session.commit()
+        return len(weights)
+
+    def apply_edits(
+        self,
+        dish_id: int,
+        version: int,
+        changes: Dict[str, Any],
+        weights: Dict[int, float],
+        removed: Collection[int] = (),
+    ) -> Dish:
+        """Правки карточки блюда одной транзакцией: поля, веса ингредиентов и удалённые ингредиенты.
+
+        Версия проверяется и увеличивается тем же UPDATE ... RETURNING, что возвращает блюдо;
+        ConcurrentUpdateError, если его изменили после загрузки, ValueError — если нет ингредиента.
+        """
+        with self.session_factory() as session:
+            dish = session.scalars(self._versioned_update_statement(dish_id, version, changes)).one_or_none()
+            if dish is None:
+                raise ConcurrentUpdateError(f"Dish {dish_id} was changed or deleted")
+            if removed:
+                session.execute(self._removed_ingredients_statement(dish_id, removed))
+            if weights:
+                try:
+                    upsert_dish_ingredients(session, self._ingredient_rows(dish_id, weights))
+                except IntegrityError as exc:
+                    raise ValueError("Ingredient not found") from exc
             session.commit()
             return dish
 
     def get_ingredients(self, dish_id: int) -> List[Tuple[Ingredient, float]]:
         with self.session_factory() as session:
-            di_alias = aliased(dish_ingredient)
-            query = session.query(
-                Ingredient,
-                di_alias.c.weight,
-            ).join(di_alias).filter(di_alias.c.dish_id == dish_id)
-            return query.all()
+            return session.execute(self._ingredients_statement(dish_id)).all()
+
+    def get_nutrition(self, dish_id: int) -> NutritionTotals:
+        """Калории, БЖУ и стоимость блюда по весам ингредиентов (одним SQL-агрегатом)"""
+        with self.read_session_factory() as session:
+            return NutritionTotals(*session.execute(self._nutrition_statement(dish_id)).one())
 
     def remove_ingredient(self, dish_id: int, ingredient_id: int) -> bool:
         with self.session_factory() as session:
-            result = session.execute(
-                dish_ingredient.delete().where(
-                    and_(
-                        dish_ingredient.c.dish_id == dish_id,
-                        dish_ingredient.c.ingredient_id == ingredient_id,
-                    )
-                )
-            )
+            result = session.execute(self._remove_ingredient_statement(dish_id, ingredient_id))
             session.commit()
             return result.rowcount > 0
 
-    def get_available_cooks(self) -> List[Cook]:
-        with self.session_factory() as session:
-            return session.query(Cook).all()
+    def get_available_cooks(self) -> List[Row]:
+        """Пары (id, name) поваров для выпадающего списка"""
+        return self.find_columns(Cook.id, Cook.name, order_by=Cook.name)
 
-    def get_available_ingredients(self) -> List[Ingredient]:
-        with self.session_factory() as session:
-            return session.query(Ingredient).all()
+    def get_available_ingredients(self) -> List[Row]:
+        """Пары (id, name) ингредиентов для выпадающего списка"""
+        return self.find_columns(Ingredient.id, Ingredient.name, order_by=Ingredient.name)
 
     def set_dish_cook(self, dish_id: int, cook_id: int) -> None:
         with self.session_factory() as session:
-            dish = session.query(self.model).filter(self.model.id == dish_id).one_or_none()
+            dish = session.get(self.model, dish_id)
             if dish:
                 dish.cook_id = cook_id
+                self._bump_version(dish)
                 session.commit()
+
+
+class AsyncDishRepository(DishQueries, AsyncBaseRepository):
+    def __init__(self, session_factory, read_session_factory=None):
+        super().__init__(session_factory, Dish, read_session_factory)
+
+    async def find_by_ingredient(self, ingredient_id: int, options: Sequence[ExecutableOption] = ()) -> List[Dish]:
+        async with self.read_session_factory() as session:
+            return list((await session.scalars(self._by_ingredient_statement(ingredient_id, options))).unique())
+
+    async def filter_page(
+        self,
+        dish_filter: DishFilter,
+        limit: int = 50,
+        cursor: str | None = None,
+        options: Sequence[ExecutableOption] = (),
+    ) -> Page[Dish]:
+        stmt = self._filter_page_statement(dish_filter, limit, cursor, options)
+        async with self.read_session_factory() as session:
+            rows = list((await session.scalars(stmt)).unique())
+        return self._page_result(rows, limit, "name")
+
+    async def filter_page_within(
+        self,
+        dish_ids: Collection[int],
+        cook_ids: FrozenSet[int] = frozenset(),
+        limit: int = 50,
+        cursor: str | None = None,
+        options: Sequence[ExecutableOption] = (),
+    ) -> Page[Dish]:
+        async with self.read_session_factory() as session:
+            max_id = await session.scalar(self._max_id_statement()) or 0
+            if self._scan_is_cheaper(len(dish_ids), limit, max_id):
+                page_ids = []
+                result = await session.stream_scalars(self._ordered_ids_statement(cursor, cook_ids))
+                async for dish_id in result:
+                    if dish_id in dish_ids:
+                        page_ids.append(dish_id)
+                        if len(page_ids) > limit:
+                            break
+                await result.close()
+                dish_ids = page_ids
+            stmt = self._within_page_statement(list(dish_ids), cook_ids, limit, cursor, options)
+            rows = list((await session.scalars(stmt)).unique())
+        return self._page_result(rows, limit, "name")
+
+    async def search(
+        self, query: str, limit: int = 50, offset: int = 0, options: Sequence[ExecutableOption] = ()
+    ) -> List[Dish]:
+        async with self.read_session_factory() as session:
+            stmt = self._search_statement(query, session.bind.dialect.name, limit, offset, options)
+            if stmt is None:
+                return []
+            return list((await session.scalars(stmt)).unique())
+
+    async def add_or_update_ingredient(self, dish_id: int, ingredient_id: int, weight: float) -> bool:
+        async with self.session_factory() as session:
+            try:
+                await session.run_sync(
+                    upsert_dish_ingredients, self._ingredient_rows(dish_id, {ingredient_id: weight})
+                )
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                return False
+            return True
+
+    async def set_ingredients(self, dish_id: int, ingredients: Iterable[Tuple[int, float]]) -> int:
+        weights = dict(ingredients)
+        async with self.session_factory() as session:
+            await session.execute(self._stale_ingredients_statement(dish_id, weights))
+            if weights:
+                await session.run_sync(upsert_dish_ingredients, self._ingredient_rows(dish_id, weights))
+            await session.commit()
+        return len(weights)
+
+    async def apply_edits(
+        self,
+        dish_id: int,
+        version: int,
+        changes: Dict[str, Any],
+        weights: Dict[int, float],
+        removed: Collection[int] = (),
+    ) -> Dish:
+        async with self.session_factory() as session:
+            stmt = self._versioned_update_statement(dish_id, version, changes)
+            dish = (await session.scalars(stmt)).one_or_none()
+            if dish is None:
+                raise ConcurrentUpdateError(f"Dish {dish_id} was changed or deleted")
+            if removed:
+                await session.execute(self._removed_ingredients_statement(dish_id, removed))
+            if weights:
+                try:
+                    await session.run_sync(upsert_dish_ingredients, self._ingredient_rows(dish_id, weights))
+                except IntegrityError as exc:
+                    raise ValueError("Ingredient not found") from exc
+            await session.commit()
+            return dish
+
+    async def get_ingredients(self, dish_id: int) -> List[Tuple[Ingredient, float]]:
+        async with self.session_factory() as session:
+            return (await session.execute(self._ingredients_statement(dish_id))).all()
+
+    async def get_nutrition(self, dish_id: int) -> NutritionTotals:
+        async with self.read_session_factory() as session:
+            return NutritionTotals(*(await session.execute(self._nutrition_statement(dish_id))).one())
+
+    async def remove_ingredient(self, dish_id: int, ingredient_id: int) -> bool:
+        async with self.session_factory() as session:
+            result = await session.execute(self._remove_ingredient_statement(dish_id, ingredient_id))
+            await session.commit()
+            return result.rowcount > 0
+
+    async def get_available_cooks(self) -> List[Row]:
+        return await self.find_columns(Cook.id, Cook.name, order_by=Cook.name)
+
+    async def get_available_ingredients(self) -> List[Row]:
+        return await self.find_columns(Ingredient.id, Ingredient.name, order_by=Ingredient.name)
+
+    async def set_dish_cook(self, dish_id: int, cook_id: int) -> None:
+        async with self.session_factory() as session:
+            dish = await session.get(self.model, dish_id)
+            if dish:
+                dish.cook_id = cook_id
+                self._bump_version(dish)
+                await session.commit()
@@ -0,0 +1,553 @@
+"""Индекс «ингредиент -> блюда» в памяти процесса.
+
+Загружается один раз из dish_ingredients и поддерживается записями
+репозиториев (IndexedRepository); поиск, подсчёт и пересечения выполняются
+без SQL. Изменения в обход репозиториев (импорт, миграции, другой процесс)
+индекс не видит — после них нужен IngredientIndex.invalidate().
+"""
+import asyncio
+import inspect
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from sqlalchemy import select
+
+from models.dishes import dish_ingredient
+from repositories.cached_repository import CACHED_READS
+from repositories.repository import ID_LIST_LIMIT
+
+
+# Индекс можно отключить: DISH_MENU_INGREDIENT_INDEX=0
+INDEX_ENABLED = os.environ.get("DISH_MENU_INGREDIENT_INDEX", "1") != "0"
+
+CONTAINER_BITS = 16
+CONTAINER_BYTES = (1 << CONTAINER_BITS) // 8
+LOW_MASK = (1 << CONTAINER_BITS) - 1
+# Контейнер с большим числом id хранится битмапом: 8 КиБ против 2 байт на id в массиве
+ARRAY_MAX = 4096
+
+_BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+Container = array | int
+
+
+def _bits(container: Container) -> int:
+    if isinstance(container, int):
+        return container
+    buffer = bytearray(CONTAINER_BYTES)
+    for low in container:
+        buffer[low >> 3] |= 1 << (low & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _positions(bits: int) -> array:
+    values = array("H")
+    for offset, byte in enumerate(bits.to_bytes(CONTAINER_BYTES, "little")):
+        if byte:
+            values.extend(offset * 8 + bit for bit in _BYTE_BITS[byte])
+    return values
+
+
+def _normalize(container: Container) -> Container | None:
+    """Пустой контейнер удаляется, остальные приводятся к более компактному виду"""
+    if isinstance(container, int):
+        count = container.bit_count()
+        if not count:
+            return None
+        return _positions(container) if count <= ARRAY_MAX else container
+    if not container:
+        return None
+    return _bits(container) if len(container) > ARRAY_MAX else container
+
+
+def _keep(values: array, bits: int, present: bool) -> array:
+    """Элементы массива, которые есть (present) или которых нет в битмапе"""
+    data = bits.to_bytes(CONTAINER_BYTES, "little")
+    return array("H", (low for low in values if bool(data[low >> 3] >> (low & 7) & 1) is present))
+
+
+def _and(left: Container, right: Container) -> Container | None:
+    if isinstance(left, int) and isinstance(right, int):
+        return _normalize(left & right)
+    if isinstance(left, int):
+        left, right = right, left
+    if isinstance(right, int):
+        return _normalize(_keep(left, right, True))
+    return _normalize(array("H", sorted(set(left).intersection(right))))
+
+
+def _or(left: Container, right: Container) -> Container | None:
+    if isinstance(left, array) and isinstance(right, array):
+        return _normalize(array("H", sorted(set(left).union(right))))
+    return _normalize(_bits(left) | _bits(right))
+
+
+def _sub(left: Container, right: Container) -> Container | None:
+    if isinstance(left, int):
+        return _normalize(left & ~_bits(right))
+    if isinstance(right, int):
+        return _normalize(_keep(left, right, False))
+    excluded = set(right)
+    return _normalize(array("H", (low for low in left if low not in excluded)))
+
+
+class DishBitmap:
+    """Неизменяемое множество id блюд в стиле roaring: id делятся на контейнеры
+    по старшим битам, контейнер — отсортированный array('H') или int-битмап"""
+
+    __slots__ = ("_containers",)
+
+    def __init__(self, containers: Dict[int, Container] | None = None):
+        self._containers = containers or {}
+
+    @classmethod
+    def from_sorted(cls, ids: Iterable[int]) -> "DishBitmap":
+        containers: Dict[int, Container] = {}
+        for id in ids:
+            high = id >> CONTAINER_BITS
+            values = containers.get(high)
+            if values is None:
+                values = containers[high] = array("H")
+            values.append(id & LOW_MASK)
+        return cls({high: _normalize(values) for high, values in containers.items()})
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[int]) -> "DishBitmap":
+        return cls.from_sorted(sorted(set(ids)))
+
+    def __contains__(self, id: int) -> bool:
+        container = self._containers.get(id >> CONTAINER_BITS)
+        if container is None:
+            return False
+        low = id & LOW_MASK
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        position = bisect_left(container, low)
+        return position < len(container) and container[position] == low
+
+    def __len__(self) -> int:
+        return sum(
+            container.bit_count() if isinstance(container, int) else len(container)
+            for container in self._containers.values()
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self._containers)
+
+    def __iter__(self) -> Iterator[int]:
+        for high in sorted(self._containers):
+            container = self._containers[high]
+            base = high << CONTAINER_BITS
+            for low in _positions(container) if isinstance(container, int) else container:
+                yield base | low
+
+    def __and__(self, other: "DishBitmap") -> "DishBitmap":
+        return self._combine(other, _and, self._containers.keys() & other._containers.keys())
+
+    def __or__(self, other: "DishBitmap") -> "DishBitmap":
+        containers = dict(self._containers)
+        for high, container in other._containers.items():
+            containers[high] = _or(containers[high], container) if high in containers else container
+        return DishBitmap(containers)
+
+    def __sub__(self, other: "DishBitmap") -> "DishBitmap":
+        containers = dict(self._containers)
+        for high in self._containers.keys() & other._containers.keys():
+            difference = _sub(containers[high], other._containers[high])
+            if difference is None:
+                del containers[high]
+            else:
+                containers[high] = difference
+        return DishBitmap(containers)
+
+    def _combine(self, other: "DishBitmap", operation, highs: Iterable[int]) -> "DishBitmap":
+        containers = {}
+        for high in highs:
+            container = operation(self._containers[high], other._containers[high])
+            if container is not None:
+                containers[high] = container
+        return DishBitmap(containers)
+
+    def added(self, id: int) -> "DishBitmap":
+        high, low = id >> CONTAINER_BITS, id & LOW_MASK
+        container = self._containers.get(high)
+        if isinstance(container, int):
+            updated = container | (1 << low)
+        else:
+            updated = array("H", container or ())
+            if id not in self:
+                insort(updated, low)
+        return DishBitmap({**self._containers, high: _normalize(updated)})
+
+    def removed(self, id: int) -> "DishBitmap":
+        if id not in self:
+            return self
+        return self - DishBitmap.from_sorted([id])
+
+    @property
+    def nbytes(self) -> int:
+        """Память контейнеров в байтах"""
+        return sum(sys.getsizeof(container) for container in self._containers.values())
+
+
+EMPTY = DishBitmap()
+
+
+class IngredientIndex:
+    """Битмапы блюд по id ингредиента.
+
+    Загрузка не блокирует записи: если за время загрузки индекс изменился
+    (версия выросла), результат отбрасывается, как в EntityCache.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.loads = 0
+        self.load_seconds = 0.0
+        self._bitmaps: Dict[int, DishBitmap] = {}
+        self._loaded = False
+        self._version = 0
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self) -> bool:
+        """Чтение dish_ingredients по индексу (ingredient_id, dish_id); True, если индекс установлен.
+        Параллельные вызовы ждут одну загрузку."""
+        with self._load_lock:
+            if self._loaded:
+                return True
+            return self._load()
+
+    def _load(self) -> bool:
+        with self._lock:
+            version = self._version
+        started = time.perf_counter()
+        stmt = select(dish_ingredient.c.ingredient_id, dish_ingredient.c.dish_id).order_by(
+            dish_ingredient.c.ingredient_id, dish_ingredient.c.dish_id
+        )
+        bitmaps: Dict[int, DishBitmap] = {}
+        with self.session_factory() as session:
+            current, dish_ids = None, []
+            for ingredient_id, dish_id in session.execute(stmt.execution_options(yield_per=10_000)):
+                if ingredient_id != current:
+                    if dish_ids:
+                        bitmaps[current] = DishBitmap.from_sorted(dish_ids)
+                    current, dish_ids = ingredient_id, []
+                dish_ids.append(dish_id)
+            if dish_ids:
+                bitmaps[current] = DishBitmap.from_sorted(dish_ids)
+
+        with self._lock:
+            if version != self._version:
+                return False
+            self._bitmaps = bitmaps
+            self._loaded = True
+            self.loads += 1
+            self.load_seconds = time.perf_counter() - started
+            return True
+
+    def invalidate(self) -> None:
+        """Сброс после изменений в обход репозиториев; следующее чтение загрузит индекс заново"""
+        with self._lock:
+            self._version += 1
+            self._bitmaps = {}
+            self._loaded = False
+
+    def dishes(self, ingredient_id: int) -> DishBitmap:
+        return self._bitmaps.get(ingredient_id, EMPTY)
+
+    def count(self, ingredient_id: int) -> int:
+        return len(self.dishes(ingredient_id))
+
+    def matching(self, include: Iterable[int], exclude: Iterable[int] = ()) -> DishBitmap:
+        """Блюда со всеми ингредиентами include и без ингредиентов exclude; include не пуст"""
+        bitmaps = self._bitmaps
+        required = sorted((bitmaps.get(id, EMPTY) for id in set(include)), key=len)
+        if not required:
+            raise ValueError("At least one required ingredient is needed")
+        result = required[0]
+        for bitmap in required[1:]:
+            if not result:
+                break
+            result &= bitmap
+        for id in set(exclude):
+            if not result:
+                break
+            result -= bitmaps.get(id, EMPTY)
+        return result
+
+    # Обновления из IndexedRepository после успешной записи
+
+    def add_link(self, dish_id: int, ingredient_id: int) -> None:
+        with self._lock:
+            self._version += 1
+            if self._loaded:
+                self._bitmaps[ingredient_id] = self.dishes(ingredient_id).added(dish_id)
+
+    def remove_link(self, dish_id: int, ingredient_id: int) -> None:
+        with self._lock:
+            self._version += 1
+            if self._loaded:
+                self._set(ingredient_id, self.dishes(ingredient_id).removed(dish_id))
+
+    def set_dish(self, dish_id: int, ingredient_ids: Iterable[int]) -> None:
+        """Новый состав блюда целиком"""
+        with self._lock:
+            self.remove_dish(dish_id)
+            for ingredient_id in ingredient_ids:
+                self.add_link(dish_id, ingredient_id)
+
+    def remove_dish(self, dish_id: int) -> None:
+        with self._lock:
+            self._version += 1
+            if self._loaded:
+                for ingredient_id, bitmap in list(self._bitmaps.items()):
+                    if dish_id in bitmap:
+                        self._set(ingredient_id, bitmap.removed(dish_id))
+
+    def remove_ingredient(self, ingredient_id: int) -> None:
+        with self._lock:
+            self._version += 1
+            self._bitmaps.pop(ingredient_id, None)
+
+    def _set(self, ingredient_id: int, bitmap: DishBitmap) -> None:
+        if bitmap:
+            self._bitmaps[ingredient_id] = bitmap
+        else:
+            self._bitmaps.pop(ingredient_id, None)
+
+    def bitmap_stats(self) -> List[Tuple[int, int, int]]:
+        """(ingredient_id, число блюд, байт) по убыванию занимаемой памяти"""
+        with self._lock:
+            rows = [(id, len(bitmap), bitmap.nbytes) for id, bitmap in self._bitmaps.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            bitmaps = list(self._bitmaps.values())
+            return {
+                "loaded": self._loaded,
+                "ingredients": len(bitmaps),
+                "links": sum(len(bitmap) for bitmap in bitmaps),
+                "bytes": sum(bitmap.nbytes for bitmap in bitmaps),
+                "loads": self.loads,
+                "load_seconds": round(self.load_seconds, 3),
+            }
+
+
+def _on_add(index: IngredientIndex, table: str, result, obj, *a, **kw) -> None:
+    # Связи, переданные через relationship вместе с новой сущностью
+    related = obj.__dict__.get("ingredients" if table == "dishes" else "dishes") or ()
+    for other in related:
+        if table == "dishes":
+            index.add_link(obj.id, other.id)
+        else:
+            index.add_link(other.id, obj.id)
+
+
+def _on_update(index: IngredientIndex, table: str, result, id, **fields) -> None:
+    if "ingredients" in fields or "dishes" in fields:
+        index.invalidate()
+
+
+def _on_delete(index: IngredientIndex, table: str, id) -> None:
+    if table == "dishes":
+        index.remove_dish(id)
+    elif table == "ingredients":
+        index.remove_ingredient(id)
+
+
+def _on_link(index: IngredientIndex, table: str, result, dish_id, ingredient_id, *a, **kw) -> None:
+    if result:
+        index.add_link(dish_id, ingredient_id)
+
+
+def _on_edits(index: IngredientIndex, table: str, result, dish_id, version, changes, weights, removed=(), **kw) -> None:
+    for ingredient_id in removed:
+        index.remove_link(dish_id, ingredient_id)
+    for ingredient_id in weights:
+        index.add_link(dish_id, ingredient_id)
+
+
+def _on_ignore(index: IngredientIndex, table: str, result, *a, **kw) -> None:
+    pass
+
+
+# Записи: метод -> обновление индекса по результату и аргументам вызова
+INDEX_WRITES: Dict[str, Callable[..., None]] = {
+    "add": _on_add,
+    "update": _on_update,
+    "update_fields": lambda index, table, result, id, changes, *a, **kw: _on_update(index, table, result, id, **changes),
+    "update_versioned": lambda index, table, result, id, version, **fields: _on_update(index, table, result, id, **fields),
+    "delete": lambda index, table, result, obj, *a, **kw: _on_delete(index, table, obj.id),
+    "delete_by_id": lambda index, table, result, id, *a, **kw: _on_delete(index, table, id),
+    # DishRepository
+    "add_or_update_ingredient": _on_link,
+    "remove_ingredient": lambda index, table, result, dish_id, ingredient_id, *a, **kw: index.remove_link(
+        dish_id, ingredient_id
+    ),
+    "set_dish_cook": _on_ignore,
+    "apply_edits": _on_edits,
+    # IngredientRepository
+    "bulk_add_ingredients": _on_ignore,
+}
+
+
+def _indexable(dish_filter) -> bool:
+    """Веса в индексе не хранятся: фильтры с порогами веса выполняет SQL"""
+    return bool(dish_filter.include) and not any(
+        condition.has_weight_bounds for condition in dish_filter.include
+    )
+
+
+class IndexedRepository:
+    """Прокси над DishRepository/IngredientRepository: выборки по ингредиентам идут через
+    IngredientIndex, записи обновляют его. Пока индекс не загружен, работает SQL."""
+
+    def __init__(self, repository, index: IngredientIndex):
+        self.repository = repository
+        self.index = index
+        self.table = repository.model.__tablename__
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.repository, name)
+        # Модель и фабрики сессий тоже вызываемые, перехватываются только методы
+        if not inspect.ismethod(attr) or name.startswith("_"):
+            return attr
+        if name in INDEX_WRITES:
+            return self._indexed_write(name, attr)
+        if name in CACHED_READS:
+            return attr
+        # Незарегистрированная запись могла изменить связи: индекс перезагрузится
+        return self._invalidating_write(attr)
+
+    def _ready(self) -> bool:
+        if not self.index.loaded:
+            self.index.load()
+        return self.index.loaded
+
+    def find_by_ingredient(self, ingredient_id: int, *args, **kwargs):
+        dish_ids = self._small_dish_set(ingredient_id)
+        if dish_ids is None:
+            return self.repository.find_by_ingredient(ingredient_id, *args, **kwargs)
+        return self.repository.find_by_ids(dish_ids, *args, **kwargs)
+
+    def get_dishes(self, ingredient_id: int):
+        dish_ids = self._small_dish_set(ingredient_id)
+        if dish_ids is None:
+            return self.repository.get_dishes(ingredient_id)
+        return self.repository.find_dishes_by_ids(dish_ids)
+
+    def filter_page(self, dish_filter, limit: int = 50, cursor: str | None = None, options=()):
+        if not (_indexable(dish_filter) and self._ready()):
+            return self.repository.filter_page(dish_filter, limit, cursor, options)
+        candidates = self.index.matching(dish_filter.include_ids, dish_filter.exclude)
+        return self.repository.filter_page_within(candidates, dish_filter.cook_ids, limit, cursor, options)
+
+    def set_ingredients(self, dish_id: int, ingredients: Iterable[Tuple[int, float]]) -> int:
+        # Итератор пар читается один раз: и для записи, и для индекса
+        ingredients = list(ingredients)
+        result = self.repository.set_ingredients(dish_id, ingredients)
+        self.index.set_dish(dish_id, [ingredient_id for ingredient_id, _ in ingredients])
+        return result
+
+    def _small_dish_set(self, ingredient_id: int) -> Tuple[int, ...] | None:
+        if not self._ready():
+            return None
+        dishes = self.index.dishes(ingredient_id)
+        if len(dishes) > ID_LIST_LIMIT:
+            return None
+        return tuple(dishes)
+
+    def _indexed_write(self, name: str, method: Callable) -> Callable:
+        on_write = INDEX_WRITES[name]
+
+        def write(*args, **kwargs):
+            result = method(*args, **kwargs)
+            on_write(self.index, self.table, result, *args, **kwargs)
+            return result
+
+        return write
+
+    def _invalidating_write(self, method: Callable) -> Callable:
+        def write(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.index.invalidate()
+
+        return write
+
+
+class AsyncIndexedRepository(IndexedRepository):
+    """Тот же прокси для асинхронных репозиториев. Индекс загружается через синхронную
+    сессию в фоновом потоке, до окончания загрузки запросы выполняет SQL."""
+
+    _loading: "asyncio.Future | None" = None
+
+    def _ready(self) -> bool:
+        if not self.index.loaded and (self._loading is None or self._loading.done()):
+            self._loading = asyncio.get_running_loop().run_in_executor(None, self.index.load)
+        return self.index.loaded
+
+    async def find_by_ingredient(self, ingredient_id: int, *args, **kwargs):
+        dish_ids = self._small_dish_set(ingredient_id)
+        if dish_ids is None:
+            return await self.repository.find_by_ingredient(ingredient_id, *args, **kwargs)
+        return await self.repository.find_by_ids(dish_ids, *args, **kwargs)
+
+    async def get_dishes(self, ingredient_id: int):
+        dish_ids = self._small_dish_set(ingredient_id)
+        if dish_ids is None:
+            return await self.repository.get_dishes(ingredient_id)
+        return await self.repository.find_dishes_by_ids(dish_ids)
+
+    async def filter_page(self, dish_filter, limit: int = 50, cursor: str | None = None, options=()):
+        if not (_indexable(dish_filter) and self._ready()):
+            return await self.repository.filter_page(dish_filter, limit, cursor, options)
+        candidates = self.index.matching(dish_filter.include_ids, dish_filter.exclude)
+        return await self.repository.filter_page_within(candidates, dish_filter.cook_ids, limit, cursor, options)
+
+    async def set_ingredients(self, dish_id: int, ingredients: Iterable[Tuple[int, float]]) -> int:
+        ingredients = list(ingredients)
+        result = await self.repository.set_ingredients(dish_id, ingredients)
+        self.index.set_dish(dish_id, [ingredient_id for ingredient_id, _ in ingredients])
+        return result
+
+    def _indexed_write(self, name: str, method: Callable) -> Callable:
+        on_write = INDEX_WRITES[name]
+
+        async def write(*args, **kwargs):
+            result = await method(*args, **kwargs)
+            on_write(self.index, self.table, result, *args, **kwargs)
+            return result
+
+        return write
+
+    def _invalidating_write(self, method: Callable) -> Callable:
+        async def write(*args, **kwargs):
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self.index.invalidate()
+
+        return write
+
+
+def with_ingredient_index(repository, index: IngredientIndex | None):
+    """Обернуть репозиторий блюд или ингредиентов индексом; без индекса вернуть как есть"""
+    if index is None:
+        return repository
+    if inspect.iscoroutinefunction(repository.find_all):
+        return AsyncIndexedRepository(repository, index)
+    return IndexedRepository(repository, index)
+
@@ -1,27 +1,50 @@
-from typing import List
+from typing import List, Sequence
+
+from sqlalchemy import Select, select
+
 from models.dishes import Ingredient, dish_ingredient, Dish
-from repositories.repository import BaseRepository
+from repositories.repository import AsyncBaseRepository, BaseRepository
+
+
+class IngredientQueries:
+    """Запросы ингредиентов, общие для IngredientRepository и AsyncIngredientRepository"""
+
+    @staticmethod
+    def _dishes_statement(ingredient_id: int) -> Select:
+        return (
+            select(Dish)
+            .join(dish_ingredient, Dish.id == dish_ingredient.c.dish_id)
+            .where(dish_ingredient.c.ingredient_id == ingredient_id)
+        )
+
+    @staticmethod
+    def _dishes_by_ids_statement(dish_ids: Sequence[int]) -> Select:
+        return select(Dish).where(Dish.id.in_(dish_ids)).order_by(Dish.id)
 
+    def _by_names_statement(self, names: List[str]) -> Select:
+        return select(self.model).where(self.model.name.in_(names))
 
-class IngredientRepository(BaseRepository):
-    def __init__(self, session_factory):
-        super().__init__(session_factory, Ingredient)
+
+class IngredientRepository(IngredientQueries, BaseRepository):
+    def __init__(self, session_factory, read_session_factory=None):
+        super().__init__(session_factory, Ingredient, read_session_factory)
 
     def get_dishes(self, ingredient_id: int) -> List[Dish]:
         with self.session_factory() as session:
-            query = (
-                session.query(Dish)
-                .join(dish_ingredient, Dish.id == dish_ingredient.c.dish_id)
-                .filter(dish_ingredient.c.ingredient_id == ingredient_id)
-            )
-            return query.all()
+            return list(session.scalars(self._dishes_statement(ingredient_id)))
+
+    def find_dishes_by_ids(self, dish_ids: Sequence[int]) -> List[Dish]:
+        """Блюда по id, найденным индексом ингредиентов (repositories/ingredient_index.py)"""
+        with self.read_session_factory() as session:
+            return list(session.scalars(self._dishes_by_ids_statement(dish_ids)))
 
     def bulk_add_ingredients(self, ingredients: list[str]) -> List[Ingredient]:
         with self.session_factory() as session:
-            existing = session.query(self.model).filter(self.model.name.in_(ingredients)).all()
+            existing = list(session.scalars(self._by_names_statement(ingredients)))
             existing_names = {ing.name for ing in existing}
 
-            new_names = [name for name in ingredients if name not in existing_names]
+            # Имена уникальны (ux_ingredients_name), повторы во входном списке схлопываются
+            new_names = dict.fromkeys(name for name in ingredients if name not in existing_names)
             new_objects = [Ingredient(name=name) for name in new_names]
 
             if new_objects:
@@ -30,3 +53,30 @@ class IngredientRepository(BaseRepository):
                 existing.extend(new_objects)
 
             return existing
+
+
+class AsyncIngredientRepository(IngredientQueries, AsyncBaseRepository):
+    def __init__(self, session_factory, read_session_factory=None):
+        super().__init__(session_factory, Ingredient, read_session_factory)
+
+    async def get_dishes(self, ingredient_id: int) -> List[Dish]:
+        async with self.session_factory() as session:
+            return list(await session.scalars(self._dishes_statement(ingredient_id)))
+
+    async def find_dishes_by_ids(self, dish_ids: Sequence[int]) -> List[Dish]:
+        async with self.read_session_factory() as session:
+            return list(await session.scalars(self._dishes_by_ids_statement(dish_ids)))
+
+    async def bulk_add_ingredients(self, ingredients: list[str]) -> List[Ingredient]:
+        async with self.session_factory() as session:
+            existing = list(await session.scalars(self._by_names_statement(ingredients)))
+            existing_names = {ing.name for ing in existing}
+
+            new_names = dict.fromkeys(name for name in ingredients if name not in existing_names)
+            new_objects = [Ingredient(name=name) for name in new_names]
+            if new_objects:
+                session.add_all(new_objects)
+                await session.commit()
+                existing.extend(new_objects)
+
+            return existing
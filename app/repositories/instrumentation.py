@@ -0,0 +1,314 @@
+"""Метрики репозиториев, SQL-запросов и экранов.
+
+InstrumentedRepository считает вызовы каждого метода репозитория: время
+(гистограмма), число возвращённых строк и SQL-запросов на вызов. Запросы
+считаются по событиям движков SQLAlchemy (install_query_events), медленные
+пишутся с параметрами в ротируемый лог. Экраны отмечают время load_data()
+декоратором timed_view. Снимок отдают эндпоинт /metrics и экран Metrics.
+"""
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+import types
+from bisect import bisect_left
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import Engine, event
+
+from models.database import BASE_DIR
+from repositories.repository import Page
+
+
+# Метрики можно отключить: DISH_MENU_METRICS=0
+METRICS_ENABLED = os.environ.get("DISH_MENU_METRICS", "1") != "0"
+
+SLOW_QUERY_MS = float(os.environ.get("DISH_MENU_SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = Path(os.environ.get("DISH_MENU_SLOW_QUERY_LOG", BASE_DIR / "logs" / "slow_queries.log"))
+SLOW_QUERY_LOG_BYTES = 5 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 3
+# Параметры executemany (импорт) могут быть огромными: в лог идёт начало
+MAX_LOGGED_PARAMETERS = 2000
+
+# Верхние границы корзин гистограммы, мс; последняя корзина — всё, что дольше
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+slow_query_logger = logging.getLogger("dish_menu.slow_queries")
+
+
+class Histogram:
+    """Число наблюдений по корзинам BUCKETS_MS"""
+
+    __slots__ = ("counts",)
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Верхняя граница корзины, в которую попадает квантиль q; None — дольше последней границы"""
+        rank = q * sum(self.counts)
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def to_dict(self) -> Dict[str, int]:
+        labels = [f"le_{bound}" for bound in BUCKETS_MS] + ["inf"]
+        return dict(zip(labels, self.counts))
+
+
+class OperationStats:
+    """Накопленные показатели одной операции (метода репозитория, экрана или всех запросов)"""
+
+    __slots__ = ("calls", "errors", "total_ms", "max_ms", "rows", "queries", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.queries = 0
+        self.histogram = Histogram()
+
+    def observe(self, ms: float, rows: int = 0, queries: int = 0, error: bool = False) -> None:
+        self.calls += 1
+        self.errors += error
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.rows += rows
+        self.queries += queries
+        self.histogram.observe(ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / calls, 3),
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.histogram.quantile(0.5),
+            "p95_ms": self.histogram.quantile(0.95),
+            "rows_per_call": round(self.rows / calls, 2),
+            "queries_per_call": round(self.queries / calls, 2),
+            "histogram": self.histogram.to_dict(),
+        }
+
+
+class Metrics:
+    """Реестр показателей процесса; запись из любых потоков"""
+
+    def __init__(self):
+        self._repositories: Dict[str, OperationStats] = {}
+        self._views: Dict[str, OperationStats] = {}
+        self._queries = OperationStats()
+        self._slow_queries = 0
+        self._lock = threading.Lock()
+
+    def record_call(self, name: str, ms: float, rows: int, queries: int, error: bool) -> None:
+        with self._lock:
+            self._repositories.setdefault(name, OperationStats()).observe(ms, rows, queries, error)
+
+    def record_view(self, name: str, ms: float, error: bool) -> None:
+        with self._lock:
+            self._views.setdefault(name, OperationStats()).observe(ms, error=error)
+
+    def record_query(self, ms: float, slow: bool) -> None:
+        with self._lock:
+            self._queries.observe(ms, queries=1)
+            self._slow_queries += slow
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Показатели по убыванию суммарного времени"""
+        with self._lock:
+            return {
+                "repositories": self._sorted(self._repositories),
+                "views": self._sorted(self._views),
+                "queries": {**self._queries.to_dict(), "slow": self._slow_queries, "slow_ms": SLOW_QUERY_MS},
+            }
+
+    @staticmethod
+    def _sorted(stats: Dict[str, OperationStats]) -> Dict[str, Dict[str, Any]]:
+        ordered = sorted(stats.items(), key=lambda item: item[1].total_ms, reverse=True)
+        return {name: value.to_dict() for name, value in ordered}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._repositories.clear()
+            self._views.clear()
+            self._queries = OperationStats()
+            self._slow_queries = 0
+
+
+METRICS = Metrics()
+
+# Счётчик SQL-запросов текущего вызова репозитория; контекст переходит и в greenlet AsyncSession
+_call_queries: contextvars.ContextVar[List[int] | None] = contextvars.ContextVar("call_queries", default=None)
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install_query_events(log_path: Path = SLOW_QUERY_LOG, threshold_ms: float = SLOW_QUERY_MS) -> None:
+    """Подписка на выполнение запросов всех движков (и синхронных движков AsyncEngine); повторный вызов ничего не делает"""
+    global _installed
+    with _install_lock:
+        if _installed or not METRICS_ENABLED:
+            return
+        _installed = True
+
+    if not slow_query_logger.handlers:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            log_path,
+            maxBytes=SLOW_QUERY_LOG_BYTES,
+            backupCount=SLOW_QUERY_LOG_BACKUPS,
+            encoding="utf-8",
+            delay=True,
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.INFO)
+        slow_query_logger.propagate = False
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+        slow = ms >= threshold_ms
+        METRICS.record_query(ms, slow)
+        counter = _call_queries.get()
+        if counter is not None:
+            counter[0] += 1
+        if slow:
+            slow_query_logger.info(
+                "%.1f ms%s\n%s\nparameters: %s",
+                ms,
+                " (executemany)" if executemany else "",
+                statement,
+                repr(parameters)[:MAX_LOGGED_PARAMETERS],
+            )
+
+    @event.listens_for(Engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+def _rows(result: Any) -> int:
+    if isinstance(result, Page):
+        return len(result.items)
+    if isinstance(result, list):
+        return len(result)
+    if result is None or isinstance(result, (bool, int)):
+        return 0
+    return 1
+
+
+class InstrumentedRepository:
+    """Прокси над репозиторием: время, строки и число SQL-запросов каждого вызова метода.
+    Стоит под кэшем и индексами, поэтому учитывает только обращения, дошедшие до БД."""
+
+    def __init__(self, repository, metrics: Metrics = METRICS):
+        self.repository = repository
+        self.metrics = metrics
+        self.prefix = type(repository).__name__
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.repository, name)
+        # Модель и фабрики сессий тоже вызываемые, оборачиваются только методы
+        if not inspect.ismethod(attr) or name.startswith("_"):
+            return attr
+        # Связанный метод: прокси индексов выше отличают методы через inspect.ismethod
+        return types.MethodType(self._measured(f"{self.prefix}.{name}", attr), self.repository)
+
+    def _measured(self, name: str, method: Callable) -> Callable:
+        def call(repository, *args, **kwargs):
+            counter = [0]
+            token = _call_queries.set(counter)
+            started = time.perf_counter()
+            result, error = None, True
+            try:
+                result = method(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                _call_queries.reset(token)
+                ms = (time.perf_counter() - started) * 1000
+                self.metrics.record_call(name, ms, _rows(result), counter[0], error)
+
+        return call
+
+
+class AsyncInstrumentedRepository(InstrumentedRepository):
+    def _measured(self, name: str, method: Callable) -> Callable:
+        async def call(repository, *args, **kwargs):
+            counter = [0]
+            token = _call_queries.set(counter)
+            started = time.perf_counter()
+            result, error = None, True
+            try:
+                result = await method(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                _call_queries.reset(token)
+                ms = (time.perf_counter() - started) * 1000
+                self.metrics.record_call(name, ms, _rows(result), counter[0], error)
+
+        return call
+
+
+def with_instrumentation(repository):
+    """Обернуть репозиторий метриками; при DISH_MENU_METRICS=0 вернуть как есть"""
+    if not METRICS_ENABLED:
+        return repository
+    if inspect.iscoroutinefunction(repository.find_all):
+        return AsyncInstrumentedRepository(repository)
+    return InstrumentedRepository(repository)
+
+
+def timed_view(load_data: Callable) -> Callable:
+    """Время load_data() экрана в METRICS под именем «Класс.load_data»"""
+    name = load_data.__qualname__
+
+    if inspect.iscoroutinefunction(load_data):
+
+        @functools.wraps(load_data)
+        async def timed(*args, **kwargs):
+            started, error = time.perf_counter(), True
+            try:
+                result = await load_data(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                METRICS.record_view(name, (time.perf_counter() - started) * 1000, error)
+
+        return timed
+
+    @functools.wraps(load_data)
+    def timed(*args, **kwargs):
+        started, error = time.perf_counter(), True
+        try:
+            result = load_data(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            METRICS.record_view(name, (time.perf_counter() - started) * 1000, error)
+
+    return timed
@@ -0,0 +1,375 @@
+"""Пищевая ценность и стоимость блюд по весам ингредиентов.
+
+Атрибуты ингредиентов заданы на 100 г, итог блюда — сумма weight * атрибут / 100
+по его строкам dish_ingredients. NutritionRollup считает итоги всего меню за один
+проход NumPy: связи читаются как разреженная матрица блюдо×ингредиент в формате
+COO (массивы dish_id, ingredient_id, weight), произведение на таблицу атрибутов
+собирается np.bincount по dish_id. Записи репозиториев (RollupRepository) помечают
+затронутые блюда, и при следующем чтении пересчитываются только они.
+"""
+import asyncio
+import inspect
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Set, Tuple
+
+import numpy as np
+from sqlalchemy import ColumnElement, Select, func, select
+
+from models.dishes import NUTRIENTS, Ingredient, dish_ingredient
+from repositories.repository import ID_LIST_LIMIT
+
+
+# Итоги в памяти можно отключить: DISH_MENU_NUTRITION_ROLLUP=0 (останется SQL-агрегат)
+ROLLUP_ENABLED = os.environ.get("DISH_MENU_NUTRITION_ROLLUP", "1") != "0"
+
+LOAD_BATCH = 50_000
+
+# Если помечена такая доля меню, дешевле пересчитать его целиком
+FULL_RECOMPUTE_SHARE = 0.25
+
+
+class NutritionTotals(NamedTuple):
+    """Итоги блюда: ккал, белки/жиры/углеводы (г) и стоимость"""
+
+    calories: float = 0.0
+    protein: float = 0.0
+    fat: float = 0.0
+    carbs: float = 0.0
+    cost: float = 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: round(value, 2) for name, value in self._asdict().items()}
+
+
+def _weight() -> ColumnElement[float]:
+    return func.coalesce(dish_ingredient.c.weight, 0.0)
+
+
+def nutrition_sums() -> List[ColumnElement[float]]:
+    """SUM(weight * атрибут) / 100 по каждому показателю, для SQL-агрегата по блюду"""
+    return [
+        func.coalesce(func.sum(_weight() * getattr(Ingredient, name)), 0.0) / 100 for name in NUTRIENTS
+    ]
+
+
+def _query_array(session, stmt: Select, columns: int) -> np.ndarray:
+    """Результат запроса одним массивом float64. Строки читаются курсором DBAPI пакетами:
+    на миллионах связей построение Row SQLAlchemy обходится дороже самого запроса."""
+    connection = session.connection()
+    sql = str(stmt.compile(connection, compile_kwargs={"literal_binds": True}))
+    cursor = connection.connection.cursor()
+    parts = []
+    try:
+        cursor.execute(sql)
+        while rows := cursor.fetchmany(LOAD_BATCH):
+            parts.append(np.array(rows, dtype=np.float64))
+    finally:
+        cursor.close()
+    if not parts:
+        return np.empty((0, columns))
+    return np.concatenate(parts)
+
+
+def rollup_totals(
+    dish_ids: np.ndarray, ingredient_ids: np.ndarray, weights: np.ndarray, attributes: np.ndarray, size: int
+) -> np.ndarray:
+    """Итоги (size × len(NUTRIENTS)) для матрицы весов в формате COO и атрибутов по id ингредиента"""
+    per_gram = attributes[ingredient_ids] * (weights / 100.0)[:, None]
+    columns = [np.bincount(dish_ids, weights=per_gram[:, k], minlength=size) for k in range(len(NUTRIENTS))]
+    return np.column_stack(columns)
+
+
+class NutritionRollup:
+    """Итоги всех блюд в массиве NumPy, строка = id блюда.
+
+    Записи через RollupRepository помечают блюда (mark_dishes) или ингредиенты
+    (mark_ingredient) устаревшими; помеченные пересчитываются при чтении одним
+    векторизованным запросом. Изменения в обход репозиториев требуют invalidate().
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._totals = np.zeros((0, len(NUTRIENTS)))
+        self._dirty_dishes: Set[int] = set()
+        self._dirty_ingredients: Set[int] = set()
+        self._loaded = False
+        # Растёт при invalidate(): пересчёт, начатый до сброса, не устанавливается
+        self._version = 0
+        self._lock = threading.RLock()
+        # Пересчёты идут по одному, иначе более старый результат мог бы перезаписать новый
+        self._refresh_lock = threading.Lock()
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.refreshed_dishes = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self) -> bool:
+        """Полный пересчёт, если итогов ещё нет; True, если они установлены"""
+        with self._refresh_lock:
+            if self._loaded:
+                return True
+            return self._recompute_all()
+
+    def _recompute_all(self) -> bool:
+        with self._lock:
+            version = self._version
+            # Записи после этой точки пометят блюда заново и попадут в следующий пересчёт
+            self._dirty_dishes.clear()
+            self._dirty_ingredients.clear()
+        started = time.perf_counter()
+        attribute_stmt = select(Ingredient.id, *[getattr(Ingredient, name) for name in NUTRIENTS])
+        link_stmt = select(dish_ingredient.c.dish_id, dish_ingredient.c.ingredient_id, _weight())
+        # Одна сессия — один снимок для атрибутов и связей
+        with self.session_factory() as session:
+            ingredients = _query_array(session, attribute_stmt, 1 + len(NUTRIENTS))
+            links = _query_array(session, link_stmt, 3)
+
+        ingredient_ids = ingredients[:, 0].astype(np.int64)
+        attributes = np.zeros((int(ingredient_ids.max(initial=0)) + 1, len(NUTRIENTS)))
+        attributes[ingredient_ids] = ingredients[:, 1:]
+        dish_ids = links[:, 0].astype(np.int64)
+        totals = rollup_totals(
+            dish_ids, links[:, 1].astype(np.int64), links[:, 2], attributes, int(dish_ids.max(initial=-1)) + 1
+        )
+
+        with self._lock:
+            if version != self._version:
+                return False
+            self._totals = totals
+            self._loaded = True
+            self.loads += 1
+            self.load_seconds = time.perf_counter() - started
+            return True
+
+    def invalidate(self) -> None:
+        """Сброс после изменений в обход репозиториев; следующее чтение пересчитает всё меню"""
+        with self._lock:
+            self._version += 1
+            self._loaded = False
+            self._totals = np.zeros((0, len(NUTRIENTS)))
+            self._dirty_dishes.clear()
+            self._dirty_ingredients.clear()
+
+    def mark_dishes(self, *dish_ids: int) -> None:
+        with self._lock:
+            self._dirty_dishes.update(dish_ids)
+
+    def mark_ingredient(self, ingredient_id: int) -> None:
+        """Атрибуты ингредиента изменились: устаревают все блюда с ним"""
+        with self._lock:
+            self._dirty_ingredients.add(ingredient_id)
+
+    def totals(self, dish_id: int) -> NutritionTotals | None:
+        """Итоги блюда; None, если итоги меню ещё не загружены или только что сброшены"""
+        if self._dirty_dishes or self._dirty_ingredients:
+            self.refresh()
+        with self._lock:
+            if not self._loaded:
+                return None
+            if dish_id >= len(self._totals):
+                return NutritionTotals()
+            return NutritionTotals(*self._totals[dish_id].tolist())
+
+    def top(self, nutrient: str, limit: int = 10) -> List[Tuple[int, NutritionTotals]]:
+        """Блюда с наибольшим значением показателя"""
+        self.load()
+        self.refresh()
+        column = NUTRIENTS.index(nutrient)
+        with self._lock:
+            values = self._totals[:, column]
+            limit = min(limit, len(values))
+            if not limit:
+                return []
+            best = np.argpartition(values, -limit)[-limit:]
+            best = best[np.argsort(values[best])[::-1]]
+            return [(int(id), NutritionTotals(*self._totals[id].tolist())) for id in best if values[id] > 0]
+
+    def refresh(self) -> None:
+        """Пересчёт помеченных блюд (и блюд с помеченными ингредиентами)"""
+        with self._refresh_lock:
+            with self._lock:
+                if not self._loaded:
+                    return
+                version = self._version
+                dish_ids, self._dirty_dishes = self._dirty_dishes, set()
+                ingredient_ids, self._dirty_ingredients = self._dirty_ingredients, set()
+            if not dish_ids and not ingredient_ids:
+                return
+            with self.session_factory() as session:
+                for chunk in _chunks(sorted(ingredient_ids)):
+                    stmt = select(dish_ingredient.c.dish_id).where(dish_ingredient.c.ingredient_id.in_(chunk))
+                    dish_ids.update(session.scalars(stmt))
+                ids = sorted(dish_ids)
+                full = len(ids) > FULL_RECOMPUTE_SHARE * len(self._totals)
+                if not full:
+                    rows = [self._dish_rows(session, chunk) for chunk in _chunks(ids)]
+            if full:
+                self._recompute_all()
+                return
+            ids = np.array(ids, dtype=np.int64)
+            rows = np.concatenate(rows) if rows else np.empty((0, 2 + len(NUTRIENTS)))
+            positions = np.searchsorted(ids, rows[:, 0].astype(np.int64))
+            totals = np.zeros((len(ids), len(NUTRIENTS)))
+            np.add.at(totals, positions, rows[:, 2:] * (rows[:, 1] / 100.0)[:, None])
+
+            with self._lock:
+                if version != self._version:
+                    return
+                if ids[-1] >= len(self._totals):
+                    grown = np.zeros((int(ids[-1]) + 1, len(NUTRIENTS)))
+                    grown[: len(self._totals)] = self._totals
+                    self._totals = grown
+                self._totals[ids] = totals
+                self.refreshed_dishes += len(ids)
+
+    @staticmethod
+    def _dish_rows(session, dish_ids: List[int]) -> np.ndarray:
+        """(dish_id, weight, атрибуты...) строк dish_ingredients выбранных блюд"""
+        stmt: Select = (
+            select(dish_ingredient.c.dish_id, _weight(), *[getattr(Ingredient, name) for name in NUTRIENTS])
+            .join(Ingredient, Ingredient.id == dish_ingredient.c.ingredient_id)
+            .where(dish_ingredient.c.dish_id.in_(dish_ids))
+        )
+        return _query_array(session, stmt, 2 + len(NUTRIENTS))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "dishes": int(np.count_nonzero(self._totals.any(axis=1))),
+                "bytes": self._totals.nbytes,
+                "dirty_dishes": len(self._dirty_dishes),
+                "dirty_ingredients": len(self._dirty_ingredients),
+                "loads": self.loads,
+                "load_seconds": round(self.load_seconds, 3),
+                "refreshed_dishes": self.refreshed_dishes,
+            }
+
+
+def _chunks(ids: List[int]) -> Iterable[List[int]]:
+    for start in range(0, len(ids), ID_LIST_LIMIT):
+        yield ids[start : start + ID_LIST_LIMIT]
+
+
+def _on_add(rollup: NutritionRollup, table: str, obj, *a, **kw) -> None:
+    if table == "dishes":
+        rollup.mark_dishes(obj.id)
+    elif obj.__dict__.get("dishes"):
+        # Ингредиент создан сразу со связями
+        rollup.mark_dishes(*(dish.id for dish in obj.dishes))
+
+
+def _on_update(rollup: NutritionRollup, table: str, id, **fields) -> None:
+    if table == "dishes":
+        if "ingredients" in fields:
+            rollup.mark_dishes(id)
+    elif "dishes" in fields:
+        rollup.invalidate()
+    elif any(name in fields for name in NUTRIENTS):
+        rollup.mark_ingredient(id)
+
+
+def _on_delete(rollup: NutritionRollup, table: str, id) -> None:
+    if table == "dishes":
+        rollup.mark_dishes(id)
+    else:
+        # Связи удалённого ингредиента уже не прочитать: пересчитывается всё меню
+        rollup.invalidate()
+
+
+def _on_ignore(rollup: NutritionRollup, table: str, *a, **kw) -> None:
+    pass
+
+
+# Записи: метод -> пометка устаревших итогов по аргументам вызова.
+# Методы определяются по имени: под прокси индекса они приходят обёрнутыми функциями.
+ROLLUP_WRITES: Dict[str, Callable[..., None]] = {
+    "add": _on_add,
+    "update": _on_update,
+    "update_fields": lambda rollup, table, id, changes, *a, **kw: _on_update(rollup, table, id, **changes),
+    "update_versioned": lambda rollup, table, id, version, **fields: _on_update(rollup, table, id, **fields),
+    "delete": lambda rollup, table, obj, *a, **kw: _on_delete(rollup, table, obj.id),
+    "delete_by_id": _on_delete,
+    # DishRepository
+    "add_or_update_ingredient": lambda rollup, table, dish_id, *a, **kw: rollup.mark_dishes(dish_id),
+    "remove_ingredient": lambda rollup, table, dish_id, *a, **kw: rollup.mark_dishes(dish_id),
+    "set_ingredients": lambda rollup, table, dish_id, *a, **kw: rollup.mark_dishes(dish_id),
+    "set_dish_cook": _on_ignore,
+    "apply_edits": lambda rollup, table, dish_id, *a, **kw: rollup.mark_dishes(dish_id),
+    # IngredientRepository: новые ингредиенты ещё не входят в блюда
+    "bulk_add_ingredients": _on_ignore,
+}
+
+
+class RollupRepository:
+    """Прокси над DishRepository/IngredientRepository: get_nutrition читается из
+    NutritionRollup, записи помечают затронутые итоги устаревшими"""
+
+    def __init__(self, repository, rollup: NutritionRollup):
+        self.repository = repository
+        self.rollup = rollup
+        self.table = repository.model.__tablename__
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.repository, name)
+        if name in ROLLUP_WRITES and callable(attr):
+            return self._rollup_write(name, attr)
+        return attr
+
+    def get_nutrition(self, dish_id: int) -> NutritionTotals:
+        totals = self.rollup.totals(dish_id) if self.rollup.load() else None
+        if totals is None:
+            return self.repository.get_nutrition(dish_id)
+        return totals
+
+    def _rollup_write(self, name: str, method: Callable) -> Callable:
+        on_write = ROLLUP_WRITES[name]
+
+        def write(*args, **kwargs):
+            result = method(*args, **kwargs)
+            on_write(self.rollup, self.table, *args, **kwargs)
+            return result
+
+        return write
+
+
+class AsyncRollupRepository(RollupRepository):
+    """Тот же прокси для асинхронных репозиториев: пересчёт идёт через синхронную сессию
+    в фоновом потоке, до окончания первой загрузки итоги считает SQL"""
+
+    _loading: "asyncio.Future | None" = None
+
+    async def get_nutrition(self, dish_id: int) -> NutritionTotals:
+        loop = asyncio.get_running_loop()
+        totals = None
+        if self.rollup.loaded:
+            totals = await loop.run_in_executor(None, self.rollup.totals, dish_id)
+        elif self._loading is None or self._loading.done():
+            self._loading = loop.run_in_executor(None, self.rollup.load)
+        if totals is None:
+            return await self.repository.get_nutrition(dish_id)
+        return totals
+
+    def _rollup_write(self, name: str, method: Callable) -> Callable:
+        on_write = ROLLUP_WRITES[name]
+
+        async def write(*args, **kwargs):
+            result = await method(*args, **kwargs)
+            on_write(self.rollup, self.table, *args, **kwargs)
+            return result
+
+        return write
+
+
+def with_nutrition_rollup(repository, rollup: NutritionRollup | None):
+    """Обернуть репозиторий блюд или ингредиентов итогами в памяти; без них вернуть как есть"""
+    if rollup is None:
+        return repository
+    if inspect.iscoroutinefunction(repository.find_all):
+        return AsyncRollupRepository(repository, rollup)
+    return RollupRepository(repository, rollup)
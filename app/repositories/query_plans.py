@@ -0,0 +1,116 @@
+from typing import Dict, List, NamedTuple
+
+from sqlalchemy import Connection, Executable, text
+
+from models.dishes import Cook, Ingredient
+from repositories.cook_repository import CookRepository
+from repositories.dish_filter import DishFilter, IngredientCondition
+from repositories.dish_repository import DishRepository
+from repositories.ingredient_repository import IngredientRepository
+from repositories.repository import encode_cursor
+
+
+# Запросы, которым полный просмотр таблицы необходим по смыслу
+FULL_SCAN_ALLOWED: Dict[str, str] = {
+    "dishes.find_all": "returns the whole table",
+    "cooks.find_all": "returns the whole table",
+    "ingredients.find_all": "returns the whole table",
+    "dishes.find_by_name": "substring ILIKE cannot use a b-tree index",
+    "cooks.find_by_name": "substring ILIKE cannot use a b-tree index",
+    "ingredients.find_by_name": "substring ILIKE cannot use a b-tree index",
+    # Первая страница по id идёт в порядке rowid и останавливается на LIMIT
+    "dishes.find_page(id)": "rowid-ordered scan bounded by LIMIT",
+    "cooks.find_page(id)": "rowid-ordered scan bounded by LIMIT",
+    "ingredients.find_page(id)": "rowid-ordered scan bounded by LIMIT",
+}
+
+
+class QueryPlan(NamedTuple):
+    name: str
+    plan: List[str]
+    full_scans: List[str]
+
+
+def repository_queries() -> Dict[str, Executable]:
+    """Запросы всех репозиториев, построенные общими с репозиториями конструкторами"""
+    dishes = DishRepository(None)
+    cooks = CookRepository(None)
+    ingredients = IngredientRepository(None)
+    name_cursor = encode_cursor("name", "m", 1)
+    id_cursor = encode_cursor("id", 1, 1)
+
+    queries: Dict[str, Executable] = {}
+    for table, repository in (("dishes", dishes), ("cooks", cooks), ("ingredients", ingredients)):
+        queries[f"{table}.find_all"] = repository._select()
+        queries[f"{table}.find_one_or_none"] = repository._by_id_statement(1)
+        queries[f"{table}.find_by_name"] = repository._by_name_statement("a")
+        queries[f"{table}.find_page(id)"] = repository._page_statement(50, None, "id")
+        queries[f"{table}.find_page(id, cursor)"] = repository._page_statement(50, id_cursor, "id")
+        queries[f"{table}.find_page(name)"] = repository._page_statement(50, None, "name")
+        queries[f"{table}.find_page(name, cursor)"] = repository._page_statement(50, name_cursor, "name")
+
+    queries.update(
+        {
+            "dishes.find_page(name, LIST_OPTIONS)": dishes._page_statement(
+                50, name_cursor, "name", DishRepository.LIST_OPTIONS
+            ),
+            "dishes.find_by_ingredient": dishes._by_ingredient_statement(1, DishRepository.LIST_OPTIONS),
+            "dishes.filter_page": dishes._filter_page_statement(
+                DishFilter(
+                    include=(IngredientCondition(1, min_weight=100), IngredientCondition(2)),
+                    exclude=frozenset({3}),
+                    cook_ids=frozenset({1, 2}),
+                ),
+                50,
+                name_cursor,
+                DishRepository.LIST_OPTIONS,
+            ),
+            "dishes.filter_page_within(ids)": dishes._within_page_statement(
+                [1, 5, 9], frozenset({1}), 50, name_cursor, DishRepository.LIST_OPTIONS
+            ),
+            "dishes.filter_page_within(scan)": dishes._ordered_ids_statement(name_cursor, frozenset()),
+            "dishes.find_by_ids": dishes._by_ids_statement([1, 5, 9], DishRepository.LIST_OPTIONS),
+            "ingredients.find_dishes_by_ids": ingredients._dishes_by_ids_statement([1, 5, 9]),
+            "dishes.search": dishes._search_statement("tomato sou", "sqlite", 50, 0, DishRepository.LIST_OPTIONS),
+            "dishes.get_ingredients": dishes._ingredients_statement(1),
+            "dishes.get_nutrition": dishes._nutrition_statement(1),
+            "dishes.remove_ingredient": dishes._remove_ingredient_statement(1, 1),
+            "dishes.set_ingredients(stale)": dishes._stale_ingredients_statement(1, [1, 2]),
+            "dishes.get_available_cooks": dishes._columns_statement(Cook.id, Cook.name, order_by=Cook.name),
+            "cooks.get_top_cooks": cooks._top_cooks_statement(5),
+            "cooks.get_dishes_by_cook_id": cooks._dishes_by_cook_statement(1),
+            "ingredients.get_dishes": ingredients._dishes_statement(1),
+            "ingredients.bulk_add_ingredients": ingredients._by_names_statement(["salt", "pepper"]),
+        }
+    )
+    # Список ингредиентов для выпадающего списка читает всю таблицу, но в порядке индекса
+    queries["dishes.get_available_ingredients"] = dishes._columns_statement(
+        Ingredient.id, Ingredient.name, order_by=Ingredient.name
+    )
+    return queries
+
+
+def explain(connection: Connection, statement: Executable) -> List[str]:
+    """Строки EXPLAIN QUERY PLAN (SQLite) для запроса с подставленными параметрами"""
+    sql = statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    return [row.detail for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def _full_scans(plan: List[str]) -> List[str]:
+    # "SCAN t" без индекса — полный просмотр; "SCAN t USING [COVERING] INDEX" идёт в порядке индекса
+    return [
+        step for step in plan
+        if step.startswith("SCAN ") and "USING" not in step and "VIRTUAL TABLE" not in step
+    ]
+
+
+def check_query_plans(connection: Connection) -> List[QueryPlan]:
+    """Планы всех запросов репозиториев; full_scans заполнен только для недопустимых просмотров"""
+    if connection.dialect.name != "sqlite":
+        raise ValueError("Query plan checks need SQLite (EXPLAIN QUERY PLAN)")
+    plans = []
+    for name, statement in repository_queries().items():
+        plan = explain(connection, statement)
+        full_scans = [] if name in FULL_SCAN_ALLOWED else _full_scans(plan)
+        plans.append(QueryPlan(name, plan, full_scans))
+    return plans
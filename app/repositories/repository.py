@@ -1,25 +1,187 @@
-from typing import TypeVar, List
+import base64
+import json
+from typing import Any, Dict, TypeVar, List, NamedTuple, Generic, Sequence
+
+from sqlalchemy import Row, Select, Update, and_, or_, select, update
+from sqlalchemy.sql.base import ExecutableOption
 
 
 MT = TypeVar("MT")
 
+PAGE_ORDERINGS = ("id", "name")
+
+# Наибольший список id в одном запросе id IN (...): с запасом ниже лимита параметров SQLite (32766)
+ID_LIST_LIMIT = 20_000
+
+
+class Page(NamedTuple, Generic[MT]):
+    items: List[MT]
+    next_cursor: str | None
+
+
+def encode_cursor(order_by: str, value, id: int) -> str:
+    """Упаковка ключа последней строки страницы в непрозрачный токен"""
+    payload = json.dumps([order_by, value, id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        order_by, value, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from exc
+    return order_by, value, id
+
+
+def contains_pattern(text: str) -> str:
+    """LIKE-шаблон «содержит text» с экранированием спецсимволов (escape="\\")"""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class ConcurrentUpdateError(Exception):
+    """Строку изменили или удалили после загрузки: версия в БД не совпала с ожидаемой"""
+
+
+class RepositoryQueries:
+    """Определения запросов, общие для синхронного и асинхронного репозиториев"""
+
+    model: Any
+
+    def _select(self, options: Sequence[ExecutableOption] = ()) -> Select:
+        """Запрос по модели с опциями загрузки связей (selectinload, joinedload, load_only...)"""
+        stmt = select(self.model)
+        if options:
+            stmt = stmt.options(*options)
+        return stmt
+
+    def _by_id_statement(self, id: int, options: Sequence[ExecutableOption] = ()) -> Select:
+        return self._select(options).where(self.model.id == id)
 
-class BaseRepository:
-    def __init__(self, session_factory, model: MT):
+    def _by_ids_statement(self, ids: Sequence[int], options: Sequence[ExecutableOption] = ()) -> Select:
+        return self._select(options).where(self.model.id.in_(ids)).order_by(self.model.id)
+
+    def _by_name_statement(self, name: str, options: Sequence[ExecutableOption] = ()) -> Select:
+        return self._select(options).where(self.model.name.ilike(contains_pattern(name), escape="\\"))
+
+    def _columns_statement(self, *columns, order_by=None) -> Select:
+        stmt = select(*columns)
+        if order_by is not None:
+            stmt = stmt.order_by(order_by)
+        return stmt
+
+    def _page_statement(
+        self,
+        limit: int,
+        cursor: str | None,
+        order_by: str,
+        options: Sequence[ExecutableOption] = (),
+    ) -> Select:
+        """Keyset-запрос страницы: limit + 1 строк после cursor, упорядоченных по order_by и id"""
+        if order_by not in PAGE_ORDERINGS:
+            raise ValueError(f"Unsupported ordering: {order_by}")
+
+        id_column = self.model.id
+        stmt = self._select(options)
+
+        if cursor:
+            cursor_order, last_value, last_id = decode_cursor(cursor)
+            if cursor_order != order_by:
+                raise ValueError(f"Cursor was issued for ordering by {cursor_order}")
+            if order_by == "id":
+                stmt = stmt.where(id_column > last_id)
+            else:
+                column = getattr(self.model, order_by)
+                stmt = stmt.where(
+                    or_(
+                        column > last_value,
+                        and_(column == last_value, id_column > last_id),
+                    )
+                )
+
+        if order_by == "id":
+            stmt = stmt.order_by(id_column)
+        else:
+            stmt = stmt.order_by(getattr(self.model, order_by), id_column)
+        return stmt.limit(limit + 1)
+
+    def _versioned_update_statement(self, id: int, version: int, changes: Dict[str, Any]) -> Update:
+        """UPDATE только при неизменной версии; новая версия и строка возвращаются через RETURNING"""
+        model = self.model
+        return (
+            update(model)
+            .where(model.id == id, model.version == version)
+            .values(**changes, version=model.version + 1)
+            .returning(model)
+            .execution_options(synchronize_session=False)
+        )
+
+    def _fields_update_statement(self, id: int, changes: Dict[str, Any], returning: bool) -> Update:
+        """UPDATE только переданных колонок по id; версия строки растёт, как и при update()"""
+        model = self.model
+        values = dict(changes)
+        if hasattr(model, "version"):
+            values["version"] = model.version + 1
+        stmt = update(model).where(model.id == id).values(**values).execution_options(synchronize_session=False)
+        return stmt.returning(model) if returning else stmt
+
+    @staticmethod
+    def _bump_version(obj) -> None:
+        """Запись мимо update_versioned тоже меняет версию, иначе её перезапишут правки из другого окна"""
+        if hasattr(type(obj), "version"):
+            obj.version += 1
+
+    @staticmethod
+    def _page_result(rows: List[MT], limit: int, order_by: str) -> Page[MT]:
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(order_by, getattr(last, order_by), last.id)
+        return Page(rows, next_cursor)
+
+
+class BaseRepository(RepositoryQueries):
+    def __init__(self, session_factory, model: MT, read_session_factory=None):
         self.session_factory = session_factory
+        # Отдельная фабрика (реплика только на чтение) для тяжёлых списочных запросов
+        self.read_session_factory = read_session_factory or session_factory
         self.model = model
 
-    def find_all(self) -> List[MT]:
-        with self.session_factory() as session:
-            return session.query(self.model).all()
+    def find_all(self, options: Sequence[ExecutableOption] = ()) -> List[MT]:
+        with self.read_session_factory() as session:
+            return list(session.scalars(self._select(options)).unique())
 
-    def find_one_or_none(self, id: int) -> MT | None:
-        with self.session_factory() as session:
-            return session.query(self.model).filter(self.model.id == id).one_or_none()
+    def find_columns(self, *columns, order_by=None) -> List[Row]:
+        """Проекция только нужных колонок без загрузки ORM-объектов"""
+        with self.read_session_factory() as session:
+            return session.execute(self._columns_statement(*columns, order_by=order_by)).all()
+
+    def find_page(
+        self,
+        limit: int = 50,
+        cursor: str | None = None,
+        order_by: str = "id",
+        options: Sequence[ExecutableOption] = (),
+    ) -> Page[MT]:
+        """Keyset-пагинация: страница строк после cursor, упорядоченная по order_by и id"""
+        stmt = self._page_statement(limit, cursor, order_by, options)
+        with self.read_session_factory() as session:
+            rows = list(session.scalars(stmt).unique())
+        return self._page_result(rows, limit, order_by)
 
-    def find_by_name(self, name: str) -> List[MT]:
+    def find_one_or_none(self, id: int, options: Sequence[ExecutableOption] = ()) -> MT | None:
         with self.session_factory() as session:
-            return session.query(self.model).filter(self.model.name.ilike(f"%{name}%")).all()
+            return session.scalars(self._by_id_statement(id, options)).unique().one_or_none()
+
+    def find_by_ids(self, ids: Sequence[int], options: Sequence[ExecutableOption] = ()) -> List[MT]:
+        """Сущности по списку id (по первичному ключу), упорядоченные по id"""
+        with self.read_session_factory() as session:
+            return list(session.scalars(self._by_ids_statement(ids, options)).unique())
+
+    def find_by_name(self, name: str, options: Sequence[ExecutableOption] = ()) -> List[MT]:
+        with self.read_session_factory() as session:
+            return list(session.scalars(self._by_name_statement(name, options)).unique())
 
     def add(self, obj: MT) -> MT:
         with self.session_factory() as session:
@@ -33,10 +195,29 @@ class BaseRepository:
             obj = session.query(self.model).filter(self.model.id == id).one_or_none()
             for field, value in kwargs.items():
                 setattr(obj, field, value)
+            self._bump_version(obj)
             session.commit()
             session.refresh(obj)
             return obj
 
+    def update_fields(self, id: int, changes: Dict[str, Any], returning: bool = False) -> MT | bool | None:
+        """Один UPDATE ... WHERE id=? только колонок из changes, без чтения строки.
+        returning=True — обновлённая строка через RETURNING (None, если её нет); иначе — нашлась ли строка"""
+        with self.session_factory() as session:
+            result = session.execute(self._fields_update_statement(id, changes, returning))
+            obj = result.scalars().one_or_none() if returning else result.rowcount > 0
+            session.commit()
+            return obj
+
+    def update_versioned(self, id: int, version: int, **changes) -> MT:
+        """Одним UPDATE ... RETURNING, если строка не менялась с версии version; иначе ConcurrentUpdateError"""
+        with self.session_factory() as session:
+            obj = session.scalars(self._versioned_update_statement(id, version, changes)).one_or_none()
+            if obj is None:
+                raise ConcurrentUpdateError(f"{self.model.__name__} {id} was changed or deleted")
+            session.commit()
+            return obj
+
     def delete(self, obj: MT) -> None:
         with self.session_factory() as session:
             obj = session.merge(obj)
@@ -49,3 +230,89 @@ class BaseRepository:
             if obj:
                 session.delete(obj)
                 session.commit()
+
+
+class AsyncBaseRepository(RepositoryQueries):
+    """Асинхронный репозиторий на AsyncSession с теми же запросами, что и BaseRepository"""
+
+    def __init__(self, session_factory, model: MT, read_session_factory=None):
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory or session_factory
+        self.model = model
+
+    async def find_all(self, options: Sequence[ExecutableOption] = ()) -> List[MT]:
+        async with self.read_session_factory() as session:
+            return list((await session.scalars(self._select(options))).unique())
+
+    async def find_columns(self, *columns, order_by=None) -> List[Row]:
+        async with self.read_session_factory() as session:
+            return (await session.execute(self._columns_statement(*columns, order_by=order_by))).all()
+
+    async def find_page(
+        self,
+        limit: int = 50,
+        cursor: str | None = None,
+        order_by: str = "id",
+        options: Sequence[ExecutableOption] = (),
+    ) -> Page[MT]:
+        stmt = self._page_statement(limit, cursor, order_by, options)
+        async with self.read_session_factory() as session:
+            rows = list((await session.scalars(stmt)).unique())
+        return self._page_result(rows, limit, order_by)
+
+    async def find_one_or_none(self, id: int, options: Sequence[ExecutableOption] = ()) -> MT | None:
+        async with self.session_factory() as session:
+            return (await session.scalars(self._by_id_statement(id, options))).unique().one_or_none()
+
+    async def find_by_ids(self, ids: Sequence[int], options: Sequence[ExecutableOption] = ()) -> List[MT]:
+        async with self.read_session_factory() as session:
+            return list((await session.scalars(self._by_ids_statement(ids, options))).unique())
+
+    async def find_by_name(self, name: str, options: Sequence[ExecutableOption] = ()) -> List[MT]:
+        async with self.read_session_factory() as session:
+            return list((await session.scalars(self._by_name_statement(name, options))).unique())
+
+    async def add(self, obj: MT) -> MT:
+        async with self.session_factory() as session:
+            session.add(obj)
+            await session.commit()
+            await session.refresh(obj)
+        return obj
+
+    async def update(self, id: int, **kwargs) -> MT:
+        async with self.session_factory() as session:
+            obj = await session.get(self.model, id)
+            for field, value in kwargs.items():
+                setattr(obj, field, value)
+            self._bump_version(obj)
+            await session.commit()
+            await session.refresh(obj)
+            return obj
+
+    async def update_fields(self, id: int, changes: Dict[str, Any], returning: bool = False) -> MT | bool | None:
+        async with self.session_factory() as session:
+            result = await session.execute(self._fields_update_statement(id, changes, returning))
+            obj = result.scalars().one_or_none() if returning else result.rowcount > 0
+            await session.commit()
+            return obj
+
+    async def update_versioned(self, id: int, version: int, **changes) -> MT:
+        async with self.session_factory() as session:
+            obj = (await session.scalars(self._versioned_update_statement(id, version, changes))).one_or_none()
+            if obj is None:
+                raise ConcurrentUpdateError(f"{self.model.__name__} {id} was changed or deleted")
+            await session.commit()
+            return obj
+
+    async def delete(self, obj: MT) -> None:
+        async with self.session_factory() as session:
+            obj = await session.merge(obj)
+            await session.delete(obj)
+            await session.commit()
+
+    async def delete_by_id(self, id: int) -> None:
+        async with self.session_factory() as session:
+            obj = await session.get(self.model, id)
+            if obj:
+                await session.delete(obj)
+                await session.commit()
@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# Модули приложения импортируются от каталога app, как при запуске main.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Общие движки models.database не должны открывать рабочую БД
+os.environ.setdefault("DISH_MENU_DATABASE_URL", "sqlite://")
@@ -0,0 +1,170 @@
+"""Число SQL-запросов на загрузку экранов: связи строк списка не должны
+подгружаться по одной (N+1). Границы не зависят от числа строк."""
+import asyncio
+from contextlib import contextmanager
+from typing import List
+
+import pytest
+from sqlalchemy import Connection, Engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base, create_async_db_engine, create_db_engine
+import models.migrations  # noqa: F401  (все таблицы и триггеры в Base.metadata)
+from repositories.cook_repository import AsyncCookRepository, CookRepository
+from repositories.dish_filter import DishFilter, IngredientCondition
+from repositories.dish_repository import AsyncDishRepository, DishRepository
+from repositories.ingredient_repository import AsyncIngredientRepository, IngredientRepository
+from transfer.importer import MenuImporter
+from transfer.synthetic import SyntheticMenu
+from viewmodels.cook_viewmodel import CookListViewModel, CookViewModel
+from viewmodels.dish_viewmodel import DishListViewModel, DishViewModel
+from viewmodels.ingredient_viewmodel import IngredientListViewModel, IngredientViewModel
+
+
+COOKS, INGREDIENTS, DISHES = 10, 40, 120
+
+
+def seed(connection: Connection) -> None:
+    Base.metadata.create_all(connection)
+    menu = SyntheticMenu(COOKS, INGREDIENTS, DISHES)
+    importer = MenuImporter(sessionmaker(bind=connection, expire_on_commit=False))
+    importer.import_cooks(menu.cook_records())
+    importer.import_ingredients(menu.ingredient_records())
+    importer.import_dishes(menu.dish_records())
+
+
+@contextmanager
+def count_queries(engine: Engine):
+    statements: List[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_db_engine("sqlite://")
+    with engine.begin() as connection:
+        seed(connection)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def session_factory(engine):
+    return sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+def run_async(screen):
+    """Экран поверх асинхронных репозиториев на своей in-memory БД; возвращает (результат, запросы)"""
+
+    async def run():
+        engine = create_async_db_engine("sqlite://")
+        try:
+            async with engine.begin() as connection:
+                await connection.run_sync(seed)
+            factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+            with count_queries(engine.sync_engine) as statements:
+                result = await screen(factory)
+            return result, statements
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_dish_list_page_and_to_dict():
+    async def screen(factory):
+        view_model = DishListViewModel(AsyncDishRepository(factory))
+        await view_model.load_first_page()
+        await view_model.load_next_page()
+        return view_model.to_dict()
+
+    rows, statements = run_async(screen)
+    assert len(rows) == 100
+    assert any(row["cook"] for row in rows)
+    # Две страницы, повар каждой строки — в том же запросе
+    assert len(statements) <= 2, statements
+
+
+def test_dish_search_and_to_dict():
+    async def screen(factory):
+        view_model = DishListViewModel(AsyncDishRepository(factory))
+        await view_model.search_by_name("soup")
+        return view_model.to_dict()
+
+    rows, statements = run_async(screen)
+    assert rows
+    assert len(statements) <= 1, statements
+
+
+def test_dish_filter_and_to_dict():
+    async def screen(factory):
+        view_model = DishListViewModel(AsyncDishRepository(factory))
+        await view_model.filter_dishes(DishFilter(include=(IngredientCondition(1),)))
+        return view_model.to_dict()
+
+    rows, statements = run_async(screen)
+    assert rows
+    assert len(statements) <= 1, statements
+
+
+def test_cook_list():
+    async def screen(factory):
+        view_model = CookListViewModel(AsyncCookRepository(factory))
+        top = await view_model.get_top_cooks(5)
+        page = await view_model.load_cooks_page(reset=True)
+        return [cook["name"] for cook in top] + [cook.name for cook in page]
+
+    names, statements = run_async(screen)
+    assert len(names) == 5 + COOKS
+    assert len(statements) <= 2, statements
+
+
+def test_ingredient_list():
+    async def screen(factory):
+        view_model = IngredientListViewModel(AsyncIngredientRepository(factory))
+        return [ingredient.name for ingredient in await view_model.load_ingredients_page(reset=True)]
+
+    names, statements = run_async(screen)
+    assert len(names) == INGREDIENTS
+    assert len(statements) <= 1, statements
+
+
+def test_dish_detail(engine, session_factory):
+    view_model = DishViewModel(DishRepository(session_factory))
+    with count_queries(engine) as statements:
+        # Как DishDetailView.load_data
+        view_model.load_dish(1)
+        view_model.get_available_ingredients()
+        view_model.get_available_cooks()
+        ingredients = view_model.get_ingredients()
+        view_model.get_nutrition()
+    assert ingredients
+    assert len(statements) <= 5, statements
+
+
+def test_cook_detail(engine, session_factory):
+    view_model = CookViewModel(CookRepository(session_factory))
+    with count_queries(engine) as statements:
+        view_model.load_cook(1)
+        view_model.load_dishes()
+        data = view_model.to_dict()
+    assert data["dishes"]
+    assert len(statements) <= 2, statements
+
+
+def test_ingredient_detail(engine, session_factory):
+    view_model = IngredientViewModel(IngredientRepository(session_factory))
+    with count_queries(engine) as statements:
+        view_model.load_ingredient(1)
+        data = view_model.to_dict()
+    assert data["dishes"]
+    assert len(statements) <= 2, statements
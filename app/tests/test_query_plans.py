@@ -0,0 +1,29 @@
+"""Планы запросов репозиториев на схеме после миграций: ни один запрос
+не должен просматривать таблицу целиком (как manage.py check-plans)."""
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from models.database import engine, init_db
+from repositories.query_plans import check_query_plans
+from transfer.importer import MenuImporter
+from transfer.synthetic import SyntheticMenu
+
+
+@pytest.fixture(scope="module")
+def connection():
+    # Общий движок models.database — in-memory БД из conftest
+    init_db()
+    menu = SyntheticMenu(3, 12, 20)
+    with engine.begin() as connection:
+        importer = MenuImporter(sessionmaker(bind=connection, expire_on_commit=False))
+        importer.import_cooks(menu.cook_records())
+        importer.import_ingredients(menu.ingredient_records())
+        importer.import_dishes(menu.dish_records())
+    with engine.connect() as connection:
+        yield connection
+
+
+def test_repository_queries_use_indexes(connection):
+    plans = check_query_plans(connection)
+    assert plans
+    assert {plan.name: plan.full_scans for plan in plans if plan.full_scans} == {}
@@ -0,0 +1,105 @@
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterator, List
+
+from sqlalchemy import select
+
+from models.dishes import NUTRIENTS, Cook, Dish, Ingredient, dish_ingredient
+from transfer.importer import DEFAULT_CHUNK_SIZE, ProgressCallback
+
+
+class MenuExporter:
+    """Потоковый экспорт: строки читаются keyset-пакетами по id, в памяти только один пакет"""
+
+    def __init__(
+        self,
+        session_factory,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        progress: ProgressCallback | None = None,
+    ):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+    def export_cooks(self) -> Iterator[Dict[str, Any]]:
+        yield from self._export(
+            "cooks",
+            lambda session, after_id: session.execute(
+                select(Cook.id, Cook.name, Cook.bio)
+                .where(Cook.id > after_id)
+                .order_by(Cook.id)
+                .limit(self.chunk_size)
+            ).all(),
+            lambda session, rows: [{"name": row.name, "bio": row.bio} for row in rows],
+        )
+
+    def export_ingredients(self) -> Iterator[Dict[str, Any]]:
+        yield from self._export(
+            "ingredients",
+            lambda session, after_id: session.execute(
+                select(Ingredient.id, Ingredient.name, *[getattr(Ingredient, name) for name in NUTRIENTS])
+                .where(Ingredient.id > after_id)
+                .order_by(Ingredient.id)
+                .limit(self.chunk_size)
+            ).all(),
+            lambda session, rows: [
+                {"name": row.name, **{name: getattr(row, name) for name in NUTRIENTS}} for row in rows
+            ],
+        )
+
+    def export_dishes(self) -> Iterator[Dict[str, Any]]:
+        yield from self._export(
+            "dishes",
+            lambda session, after_id: session.execute(
+                select(
+                    Dish.id, Dish.name, Dish.description, Dish.recipe, Dish.image_url,
+                    Cook.name.label("cook"),
+                )
+                .outerjoin(Cook, Cook.id == Dish.cook_id)
+                .where(Dish.id > after_id)
+                .order_by(Dish.id)
+                .limit(self.chunk_size)
+            ).all(),
+            self._dish_records,
+        )
+
+    def _dish_records(self, session, rows) -> List[Dict[str, Any]]:
+        ingredients = defaultdict(list)
+        links = session.execute(
+            select(dish_ingredient.c.dish_id, Ingredient.name, dish_ingredient.c.weight)
+            .join(Ingredient, Ingredient.id == dish_ingredient.c.ingredient_id)
+            .where(dish_ingredient.c.dish_id.in_([row.id for row in rows]))
+            .order_by(dish_ingredient.c.dish_id, Ingredient.name)
+        )
+        for dish_id, name, weight in links:
+            ingredients[dish_id].append({"name": name, "weight": weight})
+
+        return [
+            {
+                "name": row.name,
+                "description": row.description,
+                "recipe": row.recipe,
+                "image_url": row.image_url or "",
+                "cook": row.cook or "",
+                "ingredients": ingredients[row.id],
+            }
+            for row in rows
+        ]
+
+    def _export(
+        self,
+        entity: str,
+        fetch: Callable[[Any, int], list],
+        to_records: Callable[[Any, list], List[Dict[str, Any]]],
+    ) -> Iterator[Dict[str, Any]]:
+        after_id, exported = 0, 0
+        while True:
+            with self.session_factory() as session:
+                rows = fetch(session, after_id)
+                if not rows:
+                    return
+                records = to_records(session, rows)
+            yield from records
+            after_id = rows[-1].id
+            exported += len(rows)
+            if self.progress:
+                self.progress(entity, exported)
@@ -0,0 +1,88 @@
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, TextIO
+
+
+FORMATS = ("csv", "jsonl")
+
+# Колонки CSV по сущностям; ингредиенты блюда в CSV пишутся как "name:weight;name:weight"
+CSV_COLUMNS = {
+    "cooks": ["name", "bio"],
+    "ingredients": ["name", "calories", "protein", "fat", "carbs", "cost"],
+    "dishes": ["name", "description", "recipe", "image_url", "cook", "ingredients"],
+}
+
+
+def detect_format(path: str | Path) -> str:
+    suffix = Path(path).suffix.lstrip(".").lower()
+    if suffix not in FORMATS:
+        raise ValueError(f"Unsupported file format: {path}")
+    return suffix
+
+
+def chunked(records: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(records)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _decode_ingredients(value: str) -> List[Dict[str, Any]]:
+    ingredients = []
+    for item in filter(None, (part.strip() for part in value.split(";"))):
+        name, _, weight = item.rpartition(":")
+        if not name:
+            name, weight = weight, "0"
+        ingredients.append({"name": name, "weight": float(weight or 0)})
+    return ingredients
+
+
+def _encode_ingredients(ingredients: List[Dict[str, Any]]) -> str:
+    return ";".join(f"{item['name']}:{item['weight']}" for item in ingredients)
+
+
+def read_records(path: str | Path, entity: str) -> Iterator[Dict[str, Any]]:
+    """Потоковое чтение записей из CSV или JSONL"""
+    fmt = detect_format(path)
+    with open(path, encoding="utf-8", newline="") as file:
+        if fmt == "jsonl":
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        for row in csv.DictReader(file):
+            if entity == "dishes":
+                row["ingredients"] = _decode_ingredients(row.get("ingredients") or "")
+            yield row
+
+
+class RecordWriter:
+    """Потоковая запись записей в CSV или JSONL"""
+
+    def __init__(self, path: str | Path, entity: str):
+        self.format = detect_format(path)
+        self.entity = entity
+        self.path = path
+        self._file: TextIO | None = None
+        self._csv: csv.DictWriter | None = None
+
+    def __enter__(self) -> "RecordWriter":
+        self._file = open(self.path, "w", encoding="utf-8", newline="")
+        if self.format == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_COLUMNS[self.entity])
+            self._csv.writeheader()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._file.close()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self._csv is not None:
+            row = dict(record)
+            if self.entity == "dishes":
+                row["ingredients"] = _encode_ingredients(row["ingredients"])
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
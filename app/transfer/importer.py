@@ -0,0 +1,188 @@
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from sqlalchemy import bindparam, insert, select, update
+
+from models.dishes import NUTRIENTS, Cook, Dish, Ingredient
+from repositories.dish_repository import upsert_dish_ingredients
+from transfer.formats import chunked
+
+
+DEFAULT_CHUNK_SIZE = 5000
+
+ProgressCallback = Callable[[str, int], None]
+
+
+class MenuImporter:
+    """Потоковый импорт поваров, ингредиентов и блюд пакетами по chunk_size строк.
+
+    Имена поваров и ингредиентов разрешаются в id через словари в памяти;
+    каждый пакет вставляется executemany-запросом в своей транзакции.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        progress: ProgressCallback | None = None,
+    ):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self._cook_ids: Dict[str, int] | None = None
+        self._ingredient_ids: Dict[str, int] | None = None
+
+    def import_cooks(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Новые повара вставляются, у существующих (по имени) обновляется bio"""
+        cook_ids = self._load_cook_ids()
+        processed = 0
+        for chunk in chunked(records, self.chunk_size):
+            with self.session_factory() as session:
+                new_rows: Dict[str, Dict[str, Any]] = {}
+                updates = []
+                for record in chunk:
+                    name, bio = record["name"], record.get("bio") or ""
+                    if name in cook_ids:
+                        updates.append({"cook_id": cook_ids[name], "bio": bio})
+                    else:
+                        new_rows[name] = {"name": name, "bio": bio}
+                if updates:
+                    session.connection().execute(
+                        update(Cook.__table__)
+                        .where(Cook.__table__.c.id == bindparam("cook_id"))
+                        .values(version=Cook.__table__.c.version + 1),
+                        updates,
+                    )
+                self._insert_named(session, Cook, list(new_rows.values()), cook_ids)
+                session.commit()
+            processed += len(chunk)
+            self._report("cooks", processed)
+        return processed
+
+    def import_ingredients(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Недостающие ингредиенты создаются; заданные в записи калории, БЖУ и стоимость обновляются"""
+        processed = 0
+        for chunk in chunked(records, self.chunk_size):
+            with self.session_factory() as session:
+                self._ensure_ingredients(session, (record["name"] for record in chunk))
+                self._update_nutrition(session, chunk)
+                session.commit()
+            processed += len(chunk)
+            self._report("ingredients", processed)
+        return processed
+
+    def import_dishes(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Блюда сопоставляются по имени: существующие обновляются, новые вставляются.
+        Повара и ингредиенты, которых ещё нет, создаются; веса ингредиентов upsert-ятся."""
+        cook_ids = self._load_cook_ids()
+        processed = 0
+        for chunk in chunked(records, self.chunk_size):
+            with self.session_factory() as session:
+                missing_cooks = {r["cook"] for r in chunk if r.get("cook") and r["cook"] not in cook_ids}
+                self._insert_named(session, Cook, [{"name": name, "bio": ""} for name in missing_cooks], cook_ids)
+                self._ensure_ingredients(
+                    session,
+                    (item["name"] for record in chunk for item in record.get("ingredients") or []),
+                )
+
+                dish_ids = self._upsert_dishes(session, chunk, cook_ids)
+                links = {}
+                for record, dish_id in zip(chunk, dish_ids):
+                    for item in record.get("ingredients") or []:
+                        ingredient_id = self._ingredient_ids[item["name"]]
+                        links[(dish_id, ingredient_id)] = float(item.get("weight") or 0)
+                if links:
+                    upsert_dish_ingredients(
+                        session,
+                        [
+                            {"dish_id": dish_id, "ingredient_id": ingredient_id, "weight": weight}
+                            for (dish_id, ingredient_id), weight in links.items()
+                        ],
+                    )
+                session.commit()
+            processed += len(chunk)
+            self._report("dishes", processed)
+        return processed
+
+    def _upsert_dishes(self, session, chunk: List[Dict[str, Any]], cook_ids: Dict[str, int]) -> List[int]:
+        """Вставка/обновление блюд пакета; возвращает id в порядке записей"""
+        names = {record["name"] for record in chunk}
+        existing = dict(
+            session.execute(select(Dish.name, Dish.id).where(Dish.name.in_(names))).all()
+        )
+
+        rows, updates = [], []
+        for record in chunk:
+            values = {
+                "name": record["name"],
+                "description": record.get("description") or "",
+                "recipe": record.get("recipe") or "",
+                "image_url": record.get("image_url") or None,
+                "cook_id": cook_ids.get(record.get("cook") or ""),
+            }
+            if values["name"] in existing:
+                updates.append({"dish_id": existing[values["name"]], **values})
+            else:
+                rows.append(values)
+
+        if updates:
+            session.connection().execute(
+                update(Dish.__table__)
+                .where(Dish.__table__.c.id == bindparam("dish_id"))
+                .values(version=Dish.__table__.c.version + 1),
+                updates,
+            )
+        if rows:
+            # Повторы имени внутри пакета сводятся к последней записи
+            unique_rows = list({row["name"]: row for row in rows}.values())
+            self._insert_named(session, Dish, unique_rows, existing)
+        return [existing[record["name"]] for record in chunk]
+
+    def _update_nutrition(self, session, records: List[Dict[str, Any]]) -> None:
+        ingredient_ids = self._load_ingredient_ids()
+        # executemany требует одинаковых ключей: строки группируются по набору заданных колонок
+        updates: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for record in records:
+            values = {name: float(record[name]) for name in NUTRIENTS if record.get(name) not in (None, "")}
+            if values:
+                updates.setdefault(tuple(values), []).append({"ingredient_id": ingredient_ids[record["name"]], **values})
+        table = Ingredient.__table__
+        for rows in updates.values():
+            session.connection().execute(update(table).where(table.c.id == bindparam("ingredient_id")), rows)
+
+    def _ensure_ingredients(self, session, names: Iterable[str]) -> None:
+        ingredient_ids = self._load_ingredient_ids()
+        missing = {name for name in names if name not in ingredient_ids}
+        self._insert_named(session, Ingredient, [{"name": name} for name in missing], ingredient_ids)
+
+    def _insert_named(self, session, model, rows: List[Dict[str, Any]], ids: Dict[str, int]) -> None:
+        """executemany-вставка с RETURNING; новые id дописываются в словарь имён"""
+        if not rows:
+            return
+        table = model.__table__
+        result = session.execute(
+            insert(table).returning(table.c.id, table.c.name, sort_by_parameter_order=True),
+            rows,
+        )
+        for id, name in result:
+            ids[name] = id
+
+    def _load_cook_ids(self) -> Dict[str, int]:
+        if self._cook_ids is None:
+            self._cook_ids = self._load_names(Cook)
+        return self._cook_ids
+
+    def _load_ingredient_ids(self) -> Dict[str, int]:
+        if self._ingredient_ids is None:
+            self._ingredient_ids = self._load_names(Ingredient)
+        return self._ingredient_ids
+
+    def _load_names(self, model) -> Dict[str, int]:
+        with self.session_factory() as session:
+            ids: Dict[str, int] = {}
+            for id, name in session.execute(select(model.id, model.name).order_by(model.id)):
+                ids.setdefault(name, id)
+            return ids
+
+    def _report(self, entity: str, processed: int) -> None:
+        if self.progress:
+            self.progress(entity, processed)
@@ -0,0 +1,118 @@
+"""Детерминированные синтетические данные меню для сидирования и бенчмарков.
+
+Одинаковые seed и размеры дают одни и те же записи. Популярность ингредиентов
+и поваров распределена по Ципфу: соль и лук есть в большинстве блюд, хвост
+ингредиентов — в единицах, как и в настоящих меню. Записи имеют формат
+transfer.formats и загружаются через MenuImporter.
+"""
+import random
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List
+
+
+DEFAULT_SEED = 42
+
+# Показатель распределения Ципфа: чем больше, тем сильнее перекос к популярным
+ZIPF_EXPONENT = 1.1
+MIN_DISH_INGREDIENTS = 3
+MAX_DISH_INGREDIENTS = 12
+# Доля блюд без повара
+UNASSIGNED_SHARE = 0.05
+
+BASE_INGREDIENTS = (
+    "Salt", "Onion", "Garlic", "Olive oil", "Butter", "Black pepper", "Tomato", "Carrot", "Flour", "Egg",
+    "Milk", "Sugar", "Potato", "Chicken", "Rice", "Lemon", "Parsley", "Cream", "Cheese", "Beef",
+    "Basil", "Mushroom", "Bell pepper", "Celery", "Pork", "Dill", "Paprika", "Cucumber", "Cabbage", "Beet",
+    "Salmon", "Shrimp", "Pasta", "Ginger", "Soy sauce", "Honey", "Spinach", "Zucchini", "Eggplant", "Lentils",
+    "Chickpeas", "Coriander", "Cumin", "Thyme", "Rosemary", "Walnut", "Almond", "Apple", "Pear", "Yogurt",
+)
+VARIETIES = ("fresh", "smoked", "dried", "organic", "wild", "roasted", "pickled", "frozen", "young", "aged")
+FIRST_NAMES = ("Anna", "Boris", "Chloe", "Dmitry", "Elena", "Farid", "Greta", "Hiro", "Irina", "Jamal", "Kira", "Luca")
+LAST_NAMES = ("Ivanova", "Smith", "Rossi", "Tanaka", "Novak", "Garcia", "Petrov", "Muller", "Dubois", "Silva")
+ADJECTIVES = ("Spicy", "Creamy", "Crispy", "Rustic", "Golden", "Slow-cooked", "Grilled", "Herbed", "Tangy", "Homestyle")
+KINDS = ("soup", "salad", "stew", "pie", "risotto", "casserole", "bowl", "skewers", "pancakes", "roll")
+STEPS = ("Chop", "Fry", "Simmer", "Bake", "Whisk", "Season", "Stir", "Grill", "Blend", "Marinate")
+
+
+def _label(name: str) -> str:
+    """Имя без уникального номера для текстов блюда"""
+    return name.split(" #")[0].lower()
+
+
+def zipf_cum_weights(count: int, exponent: float = ZIPF_EXPONENT) -> List[float]:
+    return list(accumulate(1 / rank**exponent for rank in range(1, count + 1)))
+
+
+class SyntheticMenu:
+    """Генератор поваров, ингредиентов и блюд заданного размера.
+    Каждый вид записей строится своим Random от seed, поэтому не зависит от порядка чтения."""
+
+    def __init__(self, cooks: int, ingredients: int, dishes: int, seed: int = DEFAULT_SEED):
+        if ingredients < MAX_DISH_INGREDIENTS:
+            raise ValueError(f"At least {MAX_DISH_INGREDIENTS} ingredients are required")
+        self.cooks = cooks
+        self.ingredients = ingredients
+        self.dishes = dishes
+        self.seed = seed
+
+    def _random(self, entity: str) -> random.Random:
+        return random.Random(f"{self.seed}:{entity}")
+
+    def cook_name(self, number: int) -> str:
+        first = FIRST_NAMES[number % len(FIRST_NAMES)]
+        last = LAST_NAMES[number // len(FIRST_NAMES) % len(LAST_NAMES)]
+        return f"{first} {last} #{number + 1}"
+
+    def ingredient_name(self, number: int) -> str:
+        """Первые ингредиенты — базовые, дальше сорта базовых с номером; самые популярные идут первыми"""
+        base = BASE_INGREDIENTS[number % len(BASE_INGREDIENTS)]
+        if number < len(BASE_INGREDIENTS):
+            return base
+        variety = VARIETIES[number // len(BASE_INGREDIENTS) % len(VARIETIES)]
+        return f"{variety.capitalize()} {base.lower()} #{number + 1}"
+
+    def cook_records(self) -> Iterator[Dict[str, Any]]:
+        rng = self._random("cooks")
+        for number in range(self.cooks):
+            years = rng.randint(1, 30)
+            yield {"name": self.cook_name(number), "bio": f"Cooking for {years} years, loves {rng.choice(KINDS)}."}
+
+    def ingredient_records(self) -> Iterator[Dict[str, Any]]:
+        """Калории, БЖУ и стоимость на 100 г"""
+        rng = self._random("ingredients")
+        for number in range(self.ingredients):
+            protein, fat, carbs = (round(rng.uniform(0, limit), 1) for limit in (30, 40, 80))
+            yield {
+                "name": self.ingredient_name(number),
+                "calories": round(protein * 4 + fat * 9 + carbs * 4, 1),
+                "protein": protein,
+                "fat": fat,
+                "carbs": carbs,
+                "cost": round(rng.uniform(0.05, 5), 2),
+            }
+
+    def dish_records(self) -> Iterator[Dict[str, Any]]:
+        rng = self._random("dishes")
+        ingredient_weights = zipf_cum_weights(self.ingredients)
+        cook_weights = zipf_cum_weights(self.cooks) if self.cooks else None
+        ingredient_numbers = range(self.ingredients)
+        for number in range(self.dishes):
+            size = rng.randint(MIN_DISH_INGREDIENTS, MAX_DISH_INGREDIENTS)
+            chosen: Dict[int, None] = {}
+            while len(chosen) < size:
+                for picked in rng.choices(ingredient_numbers, cum_weights=ingredient_weights, k=size - len(chosen)):
+                    chosen[picked] = None
+            names = [self.ingredient_name(picked) for picked in chosen]
+            labels = [_label(name) for name in names]
+            cook = None
+            if cook_weights and rng.random() >= UNASSIGNED_SHARE:
+                cook = self.cook_name(rng.choices(range(self.cooks), cum_weights=cook_weights)[0])
+            kind = rng.choice(KINDS)
+            yield {
+                "name": f"{rng.choice(ADJECTIVES)} {labels[-1]} {kind} #{number + 1}",
+                "description": f"A {kind} with {', '.join(labels[:3])}.",
+                "recipe": " ".join(f"{rng.choice(STEPS)} the {label}." for label in labels[:4]),
+                "image_url": None,
+                "cook": cook,
+                "ingredients": [{"name": name, "weight": rng.randrange(5, 400, 5)} for name in names],
+            }
@@ -1,6 +1,11 @@
 from typing import TypeVar, Generic, Dict, Any, List
 from abc import ABC, abstractmethod
 
+from sqlalchemy import inspect
+
+# Служебные колонки, которые не правятся с экрана
+_SERVICE_COLUMNS = ("id", "version")
+
 
 M = TypeVar("M")
 R = TypeVar("R")
@@ -11,6 +16,10 @@ class BaseViewModel(Generic[M, R], ABC):
         self.repository = repository
         self.model: M | None = None
         self.related_data: List[Any] = []
+        # Изменённые, но ещё не сохранённые поля модели
+        self.pending: Dict[str, Any] = {}
+        # Значения колонок на момент загрузки: с ними сравнивается модель, которую правили напрямую
+        self.loaded_values: Dict[str, Any] = {}
 
     def add(self, model: M) -> None:
         if model:
@@ -19,7 +28,49 @@ class BaseViewModel(Generic[M, R], ABC):
             raise ValueError(f"{self._get_model_name()} cannot be None")
 
     def load(self, model_id: int) -> None:
-        self.model = self.repository.find_one_or_none(model_id)
+        self._set_model(self.repository.find_one_or_none(model_id))
+
+    def _set_model(self, model: M | None) -> None:
+        """Загруженная или сохранённая модель становится точкой отсчёта для правок"""
+        self.model = model
+        self.loaded_values = self._column_values()
+        self.discard_changes()
+
+    def _column_values(self, model: M | None = None) -> Dict[str, Any]:
+        """Загруженные колонки модели; отношения и невыбранные колонки не трогаются"""
+        model = model or self.model
+        if not model:
+            return {}
+        state = inspect(model)
+        return {
+            attr.key: state.dict[attr.key]
+            for attr in state.mapper.column_attrs
+            if attr.key in state.dict and attr.key not in _SERVICE_COLUMNS
+        }
+
+    def remote_changes(self) -> Dict[str, Any] | None:
+        """Колонки, изменённые в БД после загрузки (запись из другой сессии); None — строка удалена.
+        Версия тоже сравнивается: с устаревшей save_changes() получит ConcurrentUpdateError"""
+        if not self.model:
+            return None
+        current = self.repository.find_one_or_none(self.model.id)
+        if current is None:
+            return None
+        changed = {
+            name: value
+            for name, value in self._column_values(current).items()
+            if self.loaded_values.get(name) != value
+        }
+        if getattr(current, "version", None) != getattr(self.model, "version", None):
+            changed["version"] = current.version
+        return changed
+
+    def dirty_fields(self) -> Dict[str, Any]:
+        """Колонки, изменённые после загрузки (напрямую в модели или через stage())"""
+        changed = {
+            name: value for name, value in self._column_values().items() if self.loaded_values.get(name) != value
+        }
+        return {**changed, **self.pending}
 
     def delete(self) -> None:
         if not self.model:
@@ -27,11 +78,47 @@ class BaseViewModel(Generic[M, R], ABC):
         self.repository.delete(self.model)
 
     def update(self) -> None:
+        """Один UPDATE изменённых колонок без проверки версии; связанные данные не загружаются"""
+        if not self.model:
+            raise ValueError(f"{self._get_model_name()} not found")
+        changes = self.dirty_fields()
+        if not changes:
+            return
+        model = self.repository.update_fields(self.model.id, changes, returning=True)
+        if model is None:
+            raise ValueError(f"{self._get_model_name()} not found")
+        self._set_model(model)
+
+    def stage(self, **fields) -> None:
+        """Запомнить правки полей до save_changes(); в БД ничего не пишется"""
+        if not self.model:
+            raise ValueError(f"{self._get_model_name()} not found")
+        for name, value in fields.items():
+            if getattr(self.model, name) == value:
+                self.pending.pop(name, None)
+            else:
+                self.pending[name] = value
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.dirty_fields())
+
+    def discard_changes(self) -> None:
+        self.pending = {}
+
+    def save_changes(self) -> M:
+        """Все накопленные правки одной транзакцией с проверкой версии.
+        Модель заменяется строкой из RETURNING, повторно не читается;
+        ConcurrentUpdateError — модель изменили после загрузки; правки остаются в pending
+        до следующего load(), экраны перечитывают модель и сообщают, что правки отброшены."""
         if not self.model:
             raise ValueError(f"{self._get_model_name()} not found")
+        if self.has_changes:
+            self._set_model(self._commit_changes())
+        return self.model
 
-        data = dict(list(self.to_dict().items())[1:])
-        self.repository.update(self.model.id, **data)
+    def _commit_changes(self) -> M:
+        return self.repository.update_versioned(self.model.id, self.model.version, **self.dirty_fields())
 
     def load_related_data(self) -> None:
         """Загрузка связанных данных (должен быть реализован в дочерних классах)"""
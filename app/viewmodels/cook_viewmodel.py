@@ -1,7 +1,20 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Set
 from models.dishes import Cook, Dish
-from repositories.cook_repository import CookRepository
+from repositories.cook_repository import AsyncCookRepository, CookRepository
 from viewmodels.base_viewmodel import BaseViewModel
+from viewmodels.paginator import AsyncPaginator, name_order
+
+
+def _top_cooks_to_dicts(raw_results) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": cook.id,
+            "name": cook.name,
+            "bio": cook.bio,
+            "dishes_count": dishes_count,
+        }
+        for cook, dishes_count in raw_results
+    ]
 
 
 class CookViewModel(BaseViewModel[Cook, CookRepository]):
@@ -19,16 +32,7 @@ class CookViewModel(BaseViewModel[Cook, CookRepository]):
         self.load_related_data()
 
     def get_top_cooks(self, limit: int) -> List[Dict[str, Any]]:
-        raw_results = self.repository.get_top_cooks(limit)
-        return [
-            {
-                "id": cook.id,
-                "name": cook.name,
-                "bio": cook.bio,
-                "dishes_count": dishes_count,
-            }
-            for cook, dishes_count in raw_results
-        ]
+        return _top_cooks_to_dicts(self.repository.get_top_cooks(limit))
 
     def to_dict(self) -> Dict[str, Any]:
         if not self.model:
@@ -64,3 +68,36 @@ class CookViewModel(BaseViewModel[Cook, CookRepository]):
 
     def update_cook(self) -> None:
         self.update()
+
+
+class CookListViewModel:
+    """Топ и постраничный список поваров поверх AsyncCookRepository"""
+
+    def __init__(self, cook_repo: AsyncCookRepository):
+        self.cook_repo = cook_repo
+        self.cooks_paginator: AsyncPaginator[Cook] = AsyncPaginator(
+            lambda limit, cursor: self.cook_repo.find_page(limit, cursor, order_by="name"),
+            sort_key=name_order,
+        )
+
+    async def add_cook(self, cook: Cook) -> None:
+        if not cook:
+            raise ValueError("Cook cannot be None")
+        await self.cook_repo.add(cook)
+
+    async def get_top_cooks(self, limit: int) -> List[Dict[str, Any]]:
+        return _top_cooks_to_dicts(await self.cook_repo.get_top_cooks(limit))
+
+    async def load_cooks_page(self, reset: bool = False) -> List[Cook]:
+        """Подгрузка следующей страницы списка поваров"""
+        if reset:
+            return await self.cooks_paginator.reset()
+        return await self.cooks_paginator.load_next()
+
+    async def apply_cook_changes(self, upserted: Set[int], deleted: Set[int]) -> List[Cook]:
+        """Перечитывание изменённых поваров в загруженном списке; возвращает список целиком"""
+        cooks = await self.cook_repo.find_by_ids(sorted(upserted)) if upserted else []
+        # Не найденные уже удалены
+        removed = deleted | (upserted - {cook.id for cook in cooks})
+        self.cooks_paginator.merge(cooks, removed)
+        return self.cooks_paginator.items
@@ -1,16 +1,47 @@
-from typing import List, Dict, Any
+import asyncio
+import re
+from typing import Callable, List, Dict, Any, Set, Tuple
 
-from models.dishes import Dish, Cook, Ingredient
-from repositories.dish_repository import DishRepository
+from sqlalchemy import Row
+
+from media.images import ImageStore
+from models.dishes import Dish
+from repositories.dish_filter import DishFilter, IngredientCondition
+from repositories.dish_repository import AsyncDishRepository, DishRepository
+from repositories.nutrition import NutritionTotals
+from repositories.repository import Page
 from viewmodels.base_viewmodel import BaseViewModel
+from viewmodels.paginator import DEFAULT_PAGE_SIZE, AsyncPaginator, name_order
+
+# "томат", "томат >= 100", "базилик <= 20"
+_TERM_PATTERN = re.compile(r"^(?P<name>.+?)\s*(?:(?P<op>>=|<=)\s*(?P<weight>\d+(?:\.\d+)?))?$")
+
+
+def parse_ingredient_terms(text: str) -> List[Tuple[str, float | None, float | None]]:
+    """Разбор списка через запятую в (имя, минимальный вес, максимальный вес)"""
+    terms = []
+    for raw in text.split(","):
+        raw = raw.strip()
+        if not raw:
+            continue
+        match = _TERM_PATTERN.match(raw)
+        name, op, weight = match["name"], match["op"], match["weight"]
+        terms.append(
+            (name, float(weight) if op == ">=" else None, float(weight) if op == "<=" else None)
+        )
+    return terms
 
 
 class DishViewModel(BaseViewModel[Dish, DishRepository]):
-    def __init__(self, dish_repo: DishRepository):
+    def __init__(self, dish_repo: DishRepository, image_store: ImageStore | None = None):
         super().__init__(dish_repo)
+        self.image_store = image_store
         self.ingredients: List[Dict[str, Any]] = []
-        self.available_cooks: List[Cook] = []
-        self.available_ingredients: List[Ingredient] = []
+        self.available_cooks: List[Row] = []
+        self.available_ingredients: List[Row] = []
+        # Несохранённые правки состава: новые веса и удалённые ингредиенты
+        self.pending_weights: Dict[int, float] = {}
+        self.pending_removed: Set[int] = set()
 
     def _load_related_data_impl(self) -> List[Dict[str, Any]]:
         """Загрузка ингредиентов блюда"""
@@ -24,20 +55,6 @@ class DishViewModel(BaseViewModel[Dish, DishRepository]):
         ]
         return self.ingredients
 
-    def _prepare_update_data(self) -> Dict[str, Any]:
-        """Подготовка данных для обновления, исключая отношения"""
-        if not self.model:
-            return {}
-        data = {
-            "name": self.model.name,
-            "description": self.model.description,
-            "recipe": self.model.recipe,
-            "image_url": self.model.image_url,
-        }
-        if hasattr(self.model, "cook_id") and self.model.cook_id:
-            data["cook_id"] = self.model.cook_id
-        return data
-
     def get_ingredients(self) -> List[Dict[str, Any]]:
         """Получение ингредиентов блюда"""
         self.load_related_data()
@@ -46,9 +63,8 @@ class DishViewModel(BaseViewModel[Dish, DishRepository]):
     def add_or_update_ingredient(self, ingredient_id: int, weight: float) -> None:
         if not self.model:
             raise ValueError("Dish not found")
-        self.model = self.repository.add_or_update_ingredient(
-            self.model.id, ingredient_id, weight
-        )
+        if not self.repository.add_or_update_ingredient(self.model.id, ingredient_id, weight):
+            raise ValueError("Dish or ingredient not found")
         self.load_related_data()
 
     def delete_ingredient(self, ingredient_id: int) -> None:
@@ -57,11 +73,52 @@ class DishViewModel(BaseViewModel[Dish, DishRepository]):
         self.repository.remove_ingredient(self.model.id, ingredient_id)
         self.load_related_data()
 
-    def get_available_cooks(self) -> List[Cook]:
+    def stage_ingredient(self, ingredient_id: int, weight: float) -> None:
+        """Добавить ингредиент или сменить вес до save_changes(); список ingredients меняется сразу"""
+        if not self.model:
+            raise ValueError("Dish not found")
+        name = next((ing.name for ing in self.available_ingredients if ing.id == ingredient_id), None)
+        if name is None:
+            raise ValueError("Ingredient not found")
+        self.pending_removed.discard(ingredient_id)
+        self.pending_weights[ingredient_id] = weight
+        item = {"id": ingredient_id, "name": name, "weight": weight}
+        ids = [ing["id"] for ing in self.ingredients]
+        if ingredient_id in ids:
+            self.ingredients[ids.index(ingredient_id)] = item
+        else:
+            self.ingredients.append(item)
+
+    def stage_remove_ingredient(self, ingredient_id: int) -> None:
+        if not self.model:
+            raise ValueError("Dish not found")
+        self.pending_weights.pop(ingredient_id, None)
+        self.pending_removed.add(ingredient_id)
+        self.ingredients = [ing for ing in self.ingredients if ing["id"] != ingredient_id]
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.dirty_fields() or self.pending_weights or self.pending_removed)
+
+    def discard_changes(self) -> None:
+        super().discard_changes()
+        self.pending_weights = {}
+        self.pending_removed = set()
+
+    def _commit_changes(self) -> Dish:
+        changes = self.dirty_fields()
+        if self.image_store and "image_url" in changes:
+            # Выбранный файл сохраняется в хранилище, в блюде остаётся его URL
+            changes["image_url"] = self.image_store.import_image(changes["image_url"])
+        return self.repository.apply_edits(
+            self.model.id, self.model.version, changes, self.pending_weights, self.pending_removed
+        )
+
+    def get_available_cooks(self) -> List[Row]:
         self.available_cooks = self.repository.get_available_cooks()
         return self.available_cooks
 
-    def get_available_ingredients(self) -> List[Ingredient]:
+    def get_available_ingredients(self) -> List[Row]:
         self.available_ingredients = self.repository.get_available_ingredients()
         return self.available_ingredients
 
@@ -81,39 +138,190 @@ class DishViewModel(BaseViewModel[Dish, DishRepository]):
             "recipe": self.model.recipe,
             "description": self.model.description,
             "image_url": self.model.image_url,
+            "nutrition": self.get_nutrition().to_dict(),
         }
 
+    def get_nutrition(self) -> NutritionTotals:
+        """Калории, БЖУ и стоимость блюда по весам ингредиентов"""
+        if not self.model:
+            return NutritionTotals()
+        return self.repository.get_nutrition(self.model.id)
+
     def delete_dish(self) -> None:
         self.delete()
 
-    def update_dish(self) -> None:
-        self.update()
-
     def load_dish(self, dish_id: int) -> None:
         self.load(dish_id)
 
 
 class DishListViewModel:
-    def __init__(self, dish_repo: DishRepository):
+    """Список блюд поверх AsyncDishRepository; запросы ожидаются из async-обработчиков Flet"""
+
+    def __init__(self, dish_repo: AsyncDishRepository, image_store: ImageStore | None = None):
         self.dish_repo = dish_repo
+        self.image_store = image_store
         self.dishes: List[Dish] = []
-        self.selected_ingredient: int | None = None
+        self.active_filter: DishFilter | None = None
+        self.paginator: AsyncPaginator[Dish] = self._name_paginator()
+        self.paging = False
 
-    def add_dish(self, dish: Dish) -> None:
-        if dish:
-            self.dish_repo.add(dish)
-        else:
+    async def add_dish(self, dish: Dish) -> None:
+        if not dish:
             raise ValueError("Dish cannot be None")
+        if self.image_store:
+            dish.image_url = await asyncio.get_running_loop().run_in_executor(
+                None, self.image_store.import_image, dish.image_url
+            )
+        await self.dish_repo.add(dish)
+
+    def image_src(self, image_url: str | None, size: str, on_ready: Callable[[str], None]) -> str | None:
+        """Миниатюра изображения блюда; None, пока она строится (готовый URL придёт в on_ready)"""
+        if not self.image_store:
+            return image_url
+        return self.image_store.thumbnail_url(image_url, size, on_ready)
+
+    async def load_first_page(self) -> None:
+        """Загрузка первой страницы блюд, упорядоченных по имени"""
+        self.apply_paginator(await self.query_first_page())
+
+    async def load_next_page(self) -> List[Dish]:
+        """Подгрузка следующей страницы, возвращает только новые блюда"""
+        if not self.paging:
+            return []
+        return await self.paginator.load_next()
+
+    @property
+    def has_more(self) -> bool:
+        return self.paging and self.paginator.has_more
+
+    async def filter_by_ingredient(self, ingredient_id: int) -> None:
+        await self.filter_dishes(DishFilter(include=(IngredientCondition(ingredient_id),)))
+
+    async def filter_dishes(self, dish_filter: DishFilter) -> None:
+        """Блюда по фильтру ингредиентов и поваров с постраничной подгрузкой"""
+        self.apply_filter(dish_filter, await self.query_filter(dish_filter))
+
+    async def search_by_name(self, name: str) -> None:
+        """Полнотекстовый поиск с постраничной подгрузкой результатов"""
+        self.apply_paginator(await self.query_search(name))
+
+    async def load_page(self, cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE) -> str | None:
+        """Одна страница по курсору без накопления (для API); возвращает курсор следующей"""
+        page = await self._name_paginator().fetch_page(limit, cursor)
+        self.paging = False
+        self.dishes = page.items
+        return page.next_cursor
+
+    async def search_page(self, query: str, cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE) -> str | None:
+        page = await self._search_page(query, limit, cursor)
+        self.paging = False
+        self.dishes = page.items
+        return page.next_cursor
+
+    # Запросы без изменения состояния: результат применяется через apply_*,
+    # только если запрос не был вытеснен более новым вводом
+
+    async def query_first_page(self) -> AsyncPaginator[Dish]:
+        paginator = self._name_paginator()
+        await paginator.reset()
+        return paginator
 
-    def load_all_dishes(self) -> None:
-        self.dishes = self.dish_repo.find_all()
+    async def query_search(self, name: str) -> AsyncPaginator[Dish]:
+        paginator = AsyncPaginator(lambda limit, cursor: self._search_page(name, limit, cursor))
+        await paginator.reset()
+        return paginator
+
+    async def query_filter(self, dish_filter: DishFilter) -> AsyncPaginator[Dish]:
+        paginator = AsyncPaginator(
+            lambda limit, cursor: self.dish_repo.filter_page(
+                dish_filter, limit, cursor, options=AsyncDishRepository.LIST_OPTIONS
+            )
+        )
+        await paginator.reset()
+        return paginator
+
+    async def query_filter_text(
+        self, include: str, exclude: str = "", cook_id: int | None = None
+    ) -> Tuple[DishFilter | None, AsyncPaginator[Dish]]:
+        """Фильтр из текста полей и его первая страница; пустой фильтр (None) — список по имени.
+        ValueError — неизвестный ингредиент"""
+        dish_filter = await self.build_filter(include, exclude, cook_id)
+        if dish_filter.is_empty:
+            return None, await self.query_first_page()
+        return dish_filter, await self.query_filter(dish_filter)
+
+    async def get_available_cooks(self) -> List[Row]:
+        return await self.dish_repo.get_available_cooks()
+
+    async def build_filter(self, include: str, exclude: str = "", cook_id: int | None = None) -> DishFilter:
+        """Фильтр из текста полей: ингредиенты через запятую по имени или id, с порогами веса"""
+        ingredient_ids = {name.casefold(): id for id, name in await self.dish_repo.get_available_ingredients()}
+
+        def resolve(name: str) -> int:
+            if name.isdigit():
+                return int(name)
+            if name.casefold() not in ingredient_ids:
+                raise ValueError(f"Unknown ingredient: {name}")
+            return ingredient_ids[name.casefold()]
+
+        bounds: Dict[int, Tuple[float | None, float | None]] = {}
+        for name, min_weight, max_weight in parse_ingredient_terms(include):
+            ingredient_id = resolve(name)
+            current_min, current_max = bounds.get(ingredient_id, (None, None))
+            bounds[ingredient_id] = (
+                min_weight if min_weight is not None else current_min,
+                max_weight if max_weight is not None else current_max,
+            )
+        return DishFilter(
+            include=tuple(IngredientCondition(id, *weights) for id, weights in sorted(bounds.items())),
+            exclude=frozenset(resolve(name) for name, _, _ in parse_ingredient_terms(exclude)),
+            cook_ids=frozenset({cook_id}) if cook_id else frozenset(),
+        )
+
+    async def apply_dish_changes(self, upserted: Set[int], deleted: Set[int]) -> None:
+        """Перечитывание изменённых блюд в загруженном списке (см. Paginator.merge)"""
+        if not self.paging:
+            return
+        dishes = (
+            await self.dish_repo.find_by_ids(sorted(upserted), options=AsyncDishRepository.LIST_OPTIONS)
+            if upserted
+            else []
+        )
+        self.paginator.merge(dishes, deleted | (upserted - {dish.id for dish in dishes}))
+
+    def apply_paginator(self, paginator: AsyncPaginator[Dish]) -> None:
+        self.active_filter = None
+        self.paging = True
+        self.paginator = paginator
+        self.dishes = paginator.items
+
+    def apply_filter(self, dish_filter: DishFilter, paginator: AsyncPaginator[Dish]) -> None:
+        self.apply_paginator(paginator)
+        self.active_filter = dish_filter
+
+    def _name_paginator(self) -> AsyncPaginator[Dish]:
+        return AsyncPaginator(
+            lambda limit, cursor: self.dish_repo.find_page(
+                limit, cursor, order_by="name", options=AsyncDishRepository.LIST_OPTIONS
+            ),
+            sort_key=name_order,
+        )
 
-    def filter_by_ingredient(self, ingredient_id: int) -> None:
-        self.selected_ingredient = ingredient_id
-        self.dishes = self.dish_repo.find_by_ingredient(ingredient_id)
+    async def _search_page(self, query: str, limit: int, cursor: str | None) -> Page[Dish]:
+        offset = self._search_offset(cursor)
+        dishes = await self.dish_repo.search(query, limit + 1, offset, options=AsyncDishRepository.LIST_OPTIONS)
+        if len(dishes) > limit:
+            return Page(dishes[:limit], str(offset + limit))
+        return Page(dishes, None)
 
-    def search_by_name(self, name: str) -> None:
-        self.dishes = self.dish_repo.find_by_name(name)
+    @staticmethod
+    def _search_offset(cursor: str | None) -> int:
+        """Курсор поиска — смещение в выдаче; неверный курсор — ошибка пользователя"""
+        if not cursor:
+            return 0
+        if not (cursor.isascii() and cursor.isdigit()):
+            raise ValueError("Invalid cursor")
+        return int(cursor)
 
     def to_dict(self) -> List[Dict[str, Any]]:
         return [
@@ -123,6 +331,7 @@ class DishListViewModel:
                 "description": dish.description,
                 "image_url": dish.image_url,
                 "recipe": dish.recipe,
+                "cook": dish.cook.name if dish.cook else None,
             }
             for dish in self.dishes
         ]
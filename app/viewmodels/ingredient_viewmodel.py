@@ -1,8 +1,11 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Set
 
-from models.dishes import Ingredient, Dish
-from repositories.ingredient_repository import IngredientRepository
+from sqlalchemy.exc import IntegrityError
+
+from models.dishes import NUTRIENTS, Ingredient, Dish
+from repositories.ingredient_repository import AsyncIngredientRepository, IngredientRepository
 from viewmodels.base_viewmodel import BaseViewModel
+from viewmodels.paginator import AsyncPaginator, name_order
 
 
 class IngredientViewModel(BaseViewModel[Ingredient, IngredientRepository]):
@@ -26,6 +29,13 @@ class IngredientViewModel(BaseViewModel[Ingredient, IngredientRepository]):
     def bulk_add(self, ingredient_names: List[str]) -> List[Ingredient]:
         return self.repository.bulk_add_ingredients(ingredient_names)
 
+    def update(self) -> None:
+        """Имя ингредиента уникально: занятое имя — ошибка пользователя, правки остаются в pending"""
+        try:
+            super().update()
+        except IntegrityError as exc:
+            raise ValueError("Ingredient name already exists") from exc
+
     def to_dict(self) -> Dict[str, Any]:
         if not self.model:
             return {}
@@ -36,6 +46,7 @@ class IngredientViewModel(BaseViewModel[Ingredient, IngredientRepository]):
         return {
             "id": self.model.id,
             "name": self.model.name,
+            **{name: getattr(self.model, name) for name in NUTRIENTS},
             "dishes": [
                 {
                     "id": d.id,
@@ -56,3 +67,30 @@ class IngredientViewModel(BaseViewModel[Ingredient, IngredientRepository]):
 
     def update_ingredient(self) -> None:
         self.update()
+
+
+class IngredientListViewModel:
+    """Постраничный список ингредиентов поверх AsyncIngredientRepository"""
+
+    def __init__(self, ingredient_repo: AsyncIngredientRepository):
+        self.ingredient_repo = ingredient_repo
+        self.ingredients_paginator: AsyncPaginator[Ingredient] = AsyncPaginator(
+            lambda limit, cursor: self.ingredient_repo.find_page(limit, cursor, order_by="name"),
+            sort_key=name_order,
+        )
+
+    async def bulk_add(self, ingredient_names: List[str]) -> List[Ingredient]:
+        return await self.ingredient_repo.bulk_add_ingredients(ingredient_names)
+
+    async def load_ingredients_page(self, reset: bool = False) -> List[Ingredient]:
+        """Подгрузка следующей страницы списка ингредиентов"""
+        if reset:
+            return await self.ingredients_paginator.reset()
+        return await self.ingredients_paginator.load_next()
+
+    async def apply_ingredient_changes(self, upserted: Set[int], deleted: Set[int]) -> List[Ingredient]:
+        """Перечитывание изменённых ингредиентов в загруженном списке; возвращает список целиком"""
+        ingredients = await self.ingredient_repo.find_by_ids(sorted(upserted)) if upserted else []
+        removed = deleted | (upserted - {ingredient.id for ingredient in ingredients})
+        self.ingredients_paginator.merge(ingredients, removed)
+        return self.ingredients_paginator.items
@@ -0,0 +1,102 @@
+import bisect
+from typing import Any, Awaitable, Callable, Collection, Generic, List, TypeVar
+
+from repositories.repository import Page
+
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 50
+
+
+def name_order(row) -> Any:
+    """Ключ порядка find_page(order_by="name"): имя, затем id"""
+    return (row.name, row.id)
+
+
+class Paginator(Generic[T]):
+    """Постраничная подгрузка строк через keyset-курсор репозитория"""
+
+    def __init__(
+        self,
+        fetch_page: Callable[[int, str | None], Page[T]],
+        page_size: int = DEFAULT_PAGE_SIZE,
+        sort_key: Callable[[T], Any] | None = None,
+    ):
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        # Ключ порядка страниц, если он вычислим по строке (поиск по релевантности — нет)
+        self.sort_key = sort_key
+        # Ключ последней загруженной строки — на нём стоит курсор, даже если строку удалили
+        self.boundary: Any = None
+        self.items: List[T] = []
+        self.next_cursor: str | None = None
+        self.has_more = True
+
+    def reset(self) -> List[T]:
+        """Сброс и загрузка первой страницы"""
+        self.items = []
+        self.next_cursor = None
+        self.has_more = True
+        self.boundary = None
+        return self.load_next()
+
+    def load_next(self) -> List[T]:
+        """Загрузка следующей страницы, возвращает только новые строки"""
+        if not self.has_more:
+            return []
+        return self._apply(self.fetch_page(self.page_size, self.next_cursor))
+
+    def merge(self, rows: List[T], removed: Collection[int]) -> None:
+        """Применение изменённых строк без перезагрузки: removed убираются, rows
+        заменяют загруженные строки с теми же id. С sort_key строка встаёт на своё
+        место, если попадает в уже загруженный диапазон; без него только заменяются
+        загруженные строки — позицию новой знает лишь запрос"""
+        sort_key = self.sort_key
+        if sort_key is None:
+            fetched = {row.id: row for row in rows}
+            self.items[:] = [fetched.get(item.id, item) for item in self.items if item.id not in removed]
+            return
+        replaced = {row.id for row in rows} | set(removed)
+        self.items[:] = [item for item in self.items if item.id not in replaced]
+        keys = [sort_key(item) for item in self.items]
+        for row in rows:
+            key = sort_key(row)
+            # Строки за курсором придут со следующей страницей
+            if self.has_more and (self.boundary is None or key > self.boundary):
+                continue
+            position = bisect.bisect_left(keys, key)
+            keys.insert(position, key)
+            self.items.insert(position, row)
+
+    def _apply(self, page: Page[T]) -> List[T]:
+        self.items.extend(page.items)
+        if page.items and self.sort_key is not None:
+            self.boundary = self.sort_key(page.items[-1])
+        self.next_cursor = page.next_cursor
+        self.has_more = page.next_cursor is not None
+        return page.items
+
+
+class AsyncPaginator(Paginator[T]):
+    """Paginator для асинхронных репозиториев: fetch_page возвращает корутину"""
+
+    def __init__(
+        self,
+        fetch_page: Callable[[int, str | None], Awaitable[Page[T]]],
+        page_size: int = DEFAULT_PAGE_SIZE,
+        sort_key: Callable[[T], Any] | None = None,
+    ):
+        super().__init__(fetch_page, page_size, sort_key)
+
+    async def reset(self) -> List[T]:
+        self.items = []
+        self.next_cursor = None
+        self.has_more = True
+        self.boundary = None
+        return await self.load_next()
+
+    async def load_next(self) -> List[T]:
+        if not self.has_more:
+            return []
+        return self._apply(await self.fetch_page(self.page_size, self.next_cursor))
@@ -0,0 +1,80 @@
+import asyncio
+import functools
+import inspect
+import logging
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Awaitable, Callable, Generic, TypeVar, Union
+
+
+T = TypeVar("T")
+
+DEFAULT_DEBOUNCE = 0.3
+
+Query = Union[Callable[[], T], Callable[[], Awaitable[T]]]
+
+logger = logging.getLogger("dish_menu.queries")
+
+# Общий пул для запросов к репозиториям, чтобы не блокировать event loop Flet
+QUERY_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query")
+
+
+def serialized(action: Callable) -> Callable:
+    """Метод экрана под его self.lock (threading.RLock): обработчики событий Flet
+    и применение изменений из пула не правят view model и контролы одновременно"""
+
+    @functools.wraps(action)
+    def locked(self, *args, **kwargs):
+        with self.lock:
+            return action(self, *args, **kwargs)
+
+    return locked
+
+
+class DebouncedQuery(Generic[T]):
+    """Отложенный запуск запросов: новый ввод отменяет ожидающий или выполняющийся запрос,
+    а результат применяется только для последнего из них; его ошибка передаётся в on_error"""
+
+    def __init__(
+        self,
+        delay: float = DEFAULT_DEBOUNCE,
+        executor: Executor = QUERY_EXECUTOR,
+        on_error: Callable[[Exception], None] | None = None,
+    ):
+        self.delay = delay
+        self.executor = executor
+        self.on_error = on_error
+        self._task: asyncio.Task | None = None
+        self._generation = 0
+
+    def submit(self, query: Query[T], on_result: Callable[[T], None]) -> asyncio.Task:
+        """Запуск query после паузы; должен вызываться из event loop.
+        Корутинные функции ожидаются в loop, синхронные выполняются в пуле."""
+        self.cancel()
+        self._task = asyncio.get_running_loop().create_task(
+            self._run(self._generation, query, on_result)
+        )
+        return self._task
+
+    def cancel(self) -> None:
+        self._generation += 1
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self, generation: int, query: Query[T], on_result: Callable[[T], None]) -> None:
+        await asyncio.sleep(self.delay)
+        try:
+            if inspect.iscoroutinefunction(query):
+                result = await query()
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, query)
+        except Exception as exc:
+            # Задача никем не ожидается: без этого ошибка видна только как "Task exception was never retrieved".
+            # ValueError — ошибка ввода (разбор фильтра), не сбой запроса
+            if not isinstance(exc, ValueError):
+                logger.exception("Query failed")
+            if generation == self._generation and self.on_error:
+                self.on_error(exc)
+            return
+        if generation == self._generation:
+            on_result(result)
@@ -1,14 +1,22 @@
+import asyncio
+import threading
 from typing import Callable
 
 import flet as ft
 
 from components.button import create_icon_button, create_button
 from components.form_field import create_text_field
+from components.keyed_list import KeyedList
 from components.list_item import create_list_item
 from components.dialog import create_alert_dialog
 from styles import MARGIN, get_text_style, TITLE_SIZE, CONTRAST_COLOR, SUBTITLE_SIZE, ERROR_COLOR, PADDING, \
-    PRIMARY_COLOR
+    PRIMARY_COLOR, SMALL_SIZE
+from models.database import session_scoped
+from repositories.change_feed import ChangeBatch, changed_tables, row_changes
+from repositories.instrumentation import timed_view
+from repositories.repository import ConcurrentUpdateError
 from viewmodels.cook_viewmodel import CookViewModel
+from viewmodels.query_pipeline import QUERY_EXECUTOR, serialized
 
 
 class CookDetailView(ft.Container):
@@ -22,9 +30,18 @@ class CookDetailView(ft.Container):
         self.view_model = view_model
         self.cook_id = cook_id
         self.on_back = on_back
+        # Обработчики Flet и применение изменений из пула — по одному (см. serialized)
+        self.lock = threading.RLock()
         self.name_field = create_text_field("Name")
         self.bio_field = create_text_field("Bio", multiline=True)
         self.dishes_list = ft.ListView(expand=True, spacing=MARGIN)
+        self.dishes_items = KeyedList(
+            self.dishes_list,
+            key=lambda dish: dish.id,
+            build=lambda dish: create_list_item(title=dish.name, subtitle=dish.description),
+            signature=lambda dish: (dish.name, dish.description),
+        )
+        self.save_error = ft.Text("", style=get_text_style(SMALL_SIZE, ERROR_COLOR), visible=False)
 
         super().__init__(
             content=ft.Column([
@@ -36,6 +53,7 @@ class CookDetailView(ft.Container):
                 self.bio_field,
                 ft.Text("Dishes", style=get_text_style(SUBTITLE_SIZE, CONTRAST_COLOR)),
                 self.dishes_list,
+                self.save_error,
                 ft.Row([
                     create_button("Update", on_click=self.handle_update),
                     create_button("Delete", color=ERROR_COLOR, on_click=self.handle_delete)
@@ -49,28 +67,72 @@ class CookDetailView(ft.Container):
         self.view_model.delete_cook()
 
     def _on_update(self):
-        self.view_model.update_cook()
-        self.load_data()
+        """Сохраняются только поля повара; список блюд не перечитывается"""
+        try:
+            cook = self.view_model.save_changes()
+        except ConcurrentUpdateError:
+            self.load_data()
+            self._show_save_error("The cook was changed elsewhere, your edits were discarded")
+            return
+        self._show_save_error("")
+        self.name_field.value = cook.name
+        self.bio_field.value = cook.bio
+        self._page.update()
 
+    @timed_view
+    @serialized
+    @session_scoped
     def load_data(self):
         self.view_model.load_cook(self.cook_id)
         self.view_model.load_dishes()
         if self.view_model.model:
             self.name_field.value = self.view_model.model.name
             self.bio_field.value = self.view_model.model.bio
-            self.dishes_list.controls.clear()
-            for dish in self.view_model.dishes:
-                self.dishes_list.controls.append(
-                    create_list_item(title=dish.name, subtitle=dish.description)
-                )
+            self.dishes_items.reconcile(self.view_model.dishes)
         self._page.update()
 
+    async def apply_changes(self, changes: ChangeBatch):
+        """Изменения из других сессий; поля, которые начали править, не перезаписываются"""
+        await asyncio.get_running_loop().run_in_executor(QUERY_EXECUTOR, self._apply_changes, changes)
+
+    @serialized
+    @session_scoped
+    def _apply_changes(self, changes: ChangeBatch):
+        if not self.view_model.model:
+            return
+        cooks = row_changes(changes, "cooks")
+        if cooks is None or self.cook_id in cooks.upserted | cooks.deleted:
+            remote = self.view_model.remote_changes()
+            if remote is None:
+                self._show_save_error("The cook was deleted elsewhere")
+                return
+            if remote and self._fields_edited():
+                self._show_save_error("The cook was changed elsewhere, your edits can no longer be saved")
+            elif remote:
+                self.view_model.load_cook(self.cook_id)
+                self.name_field.value = self.view_model.model.name
+                self.bio_field.value = self.view_model.model.bio
+        if "dishes" in changed_tables(changes):
+            self.view_model.load_dishes()
+            self.dishes_items.reconcile(self.view_model.dishes)
+        self._page.update()
+
+    def _fields_edited(self) -> bool:
+        model = self.view_model.model
+        return self.name_field.value != model.name or self.bio_field.value != model.bio
+
+    @serialized
+    @session_scoped
     def handle_update(self, e):
         if self.view_model.model:
-            self.view_model.model.name = self.name_field.value
-            self.view_model.model.bio = self.bio_field.value
+            self.view_model.stage(name=self.name_field.value, bio=self.bio_field.value)
             self._on_update()
 
+    def _show_save_error(self, message: str):
+        self.save_error.value = message
+        self.save_error.visible = bool(message)
+        self.save_error.update()
+
     def handle_delete(self, e):
         dialog = create_alert_dialog(
             "Confirm Delete",
@@ -83,6 +145,8 @@ class CookDetailView(ft.Container):
         self._page.open(dialog)
         self._page.update()
 
+    @serialized
+    @session_scoped
     def confirm_delete(self):
         if self.view_model.model:
             self._on_delete()
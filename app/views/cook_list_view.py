@@ -4,6 +4,8 @@ import flet as ft
 
 from components.button import create_button
 from components.card import create_card
+from components.infinite_list import create_infinite_list
+from components.keyed_list import KeyedList
 from components.list_item import create_list_item
 from components.form_dialog import FormBuilder, FormDialog
 from models.dishes import Cook
@@ -17,18 +19,34 @@ from styles import (
     BODY_SIZE,
     SECONDARY_COLOR,
 )
-from viewmodels.cook_viewmodel import CookViewModel
+from repositories.change_feed import ChangeBatch, changed_tables, row_changes
+from repositories.instrumentation import timed_view
+from viewmodels.cook_viewmodel import CookListViewModel
 
 
 class CookListView(ft.Container):
     def __init__(
-        self, page: ft.Page, view_model: CookViewModel, on_select_cook: Callable
+        self, page: ft.Page, view_model: CookListViewModel, on_select_cook: Callable
     ):
         self._page = page
         self.view_model = view_model
         self.on_select_cook = on_select_cook
         self.top_cooks_list = ft.ListView(expand=True, spacing=MARGIN)
-        self.all_cooks_list = ft.ListView(expand=True, spacing=MARGIN)
+        self.all_cooks_list, load_more_button = create_infinite_list(self.load_more)
+        self.top_cooks_items = KeyedList(
+            self.top_cooks_list,
+            key=lambda cook: cook["id"],
+            build=self._create_top_cook_item,
+            signature=lambda cook: (cook["name"], cook["bio"], cook["dishes_count"]),
+        )
+        self.all_cooks_items = KeyedList(
+            self.all_cooks_list,
+            key=lambda cook: cook.id,
+            build=self._create_cook_item,
+            signature=lambda cook: (cook.name, cook.bio),
+            footer=load_more_button,
+            footer_visible=lambda: self.view_model.cooks_paginator.has_more,
+        )
 
         super().__init__(
             content=ft.Column(
@@ -73,32 +91,50 @@ class CookListView(ft.Container):
             name=values["Name"],
             bio=values["Bio"],
         )
-        self.view_model.add_cook(cook)
-        self.load_data()
+        self._page.run_task(self._add_cook, cook)
 
-    def load_data(self):
-        self.top_cooks_list.controls.clear()
-        top_cooks = self.view_model.get_top_cooks(5)
-        for cook in top_cooks:
-            self.top_cooks_list.controls.append(
-                create_card(
-                    ft.Text(
-                        f"Dishes: {cook['dishes_count']}",
-                        style=get_text_style(BODY_SIZE, SECONDARY_COLOR),
-                    ),
-                    title=cook["name"],
-                    subtitle=cook["bio"],
-                )
-            )
+    async def _add_cook(self, cook: Cook):
+        await self.view_model.add_cook(cook)
+        await self.load_data()
+
+    @timed_view
+    async def load_data(self):
+        self.top_cooks_items.reconcile(await self.view_model.get_top_cooks(5))
+        self.all_cooks_items.reconcile(await self.view_model.load_cooks_page(reset=True))
+
+    async def refresh(self):
+        await self.load_data()
 
-        self.all_cooks_list.controls.clear()
-        all_cooks = self.view_model.repository.find_all()
-        for cook in all_cooks:
-            self.all_cooks_list.controls.append(
-                create_list_item(
-                    title=cook.name,
-                    subtitle=cook.bio,
-                    on_click=lambda e, c=cook: self.on_select_cook(c.id),
-                )
-            )
-        self._page.update()
+    async def apply_changes(self, changes: ChangeBatch):
+        """Изменения из других сессий: перечитываются только затронутые строки"""
+        cooks = row_changes(changes, "cooks")
+        if cooks is None:
+            await self.refresh()
+            return
+        if cooks:
+            self.all_cooks_items.reconcile(await self.view_model.apply_cook_changes(*cooks))
+        # Топ зависит и от числа блюд у поваров
+        if changed_tables(changes) & {"cooks", "dishes"}:
+            self.top_cooks_items.reconcile(await self.view_model.get_top_cooks(5))
+
+    async def load_more(self):
+        if not self.view_model.cooks_paginator.has_more:
+            return
+        self.all_cooks_items.append(await self.view_model.load_cooks_page())
+
+    def _create_top_cook_item(self, cook) -> ft.Card:
+        return create_card(
+            ft.Text(
+                f"Dishes: {cook['dishes_count']}",
+                style=get_text_style(BODY_SIZE, SECONDARY_COLOR),
+            ),
+            title=cook["name"],
+            subtitle=cook["bio"],
+        )
+
+    def _create_cook_item(self, cook: Cook) -> ft.ListTile:
+        return create_list_item(
+            title=cook.name,
+            subtitle=cook.bio,
+            on_click=lambda e, c=cook: self.on_select_cook(c.id),
+        )
@@ -1,3 +1,5 @@
+import asyncio
+import threading
 from typing import Callable
 
 import flet as ft
@@ -9,13 +11,20 @@ from styles import (
     get_text_style,
     SUBTITLE_SIZE,
     ERROR_COLOR,
+    SMALL_SIZE,
     PADDING,
     PRIMARY_COLOR,
 )
+from models.database import session_scoped
+from repositories.change_feed import ChangeBatch, changed_tables, row_changes
+from repositories.instrumentation import timed_view
+from repositories.repository import ConcurrentUpdateError
 from viewmodels.dish_viewmodel import DishViewModel
+from viewmodels.query_pipeline import QUERY_EXECUTOR, serialized
 from components.form_field import create_text_field, create_number_field
 from components.button import create_button, create_icon_button
 from components.list_item import create_list_item
+from components.keyed_list import KeyedList
 from components.dialog import create_alert_dialog
 
 
@@ -31,6 +40,8 @@ class DishDetailView(ft.Container):
         self.view_model = view_model
         self.dish_id = dish_id
         self.on_back = on_back
+        # Обработчики Flet и применение изменений из пула — по одному (см. serialized)
+        self.lock = threading.RLock()
         self.file_picker = ft.FilePicker(on_result=self._on_file_selected)
         self.name_field = create_text_field("Name")
         self.description_field = create_text_field("Description", multiline=True)
@@ -65,6 +76,12 @@ class DishDetailView(ft.Container):
             color=CONTRAST_COLOR,
         )
         self.ingredients_list = ft.ListView(expand=True, spacing=MARGIN)
+        self.ingredients_items = KeyedList(
+            self.ingredients_list,
+            key=lambda ing: ing["id"],
+            build=self._create_ingredient_item,
+            signature=lambda ing: (ing["name"], ing["weight"]),
+        )
         self.ingredient_dropdown = ft.Dropdown(
             label="Ingredient",
             options=[],
@@ -72,6 +89,10 @@ class DishDetailView(ft.Container):
             color=CONTRAST_COLOR,
         )
         self.new_weight = create_number_field("Weight")
+        self.nutrition_text = ft.Text(style=get_text_style(SUBTITLE_SIZE, CONTRAST_COLOR))
+        self.save_error = ft.Text(
+            "", style=get_text_style(SMALL_SIZE, ERROR_COLOR), visible=False
+        )
         self._page.overlay.append(self.file_picker)
 
         super().__init__(
@@ -100,6 +121,7 @@ class DishDetailView(ft.Container):
                         style=get_text_style(SUBTITLE_SIZE, CONTRAST_COLOR),
                     ),
                     self.ingredients_list,
+                    self.nutrition_text,
                     ft.Row(
                         [
                             self.ingredient_dropdown,
@@ -110,6 +132,7 @@ class DishDetailView(ft.Container):
                             ),
                         ]
                     ),
+                    self.save_error,
                     ft.Row(
                         [
                             create_button("Update Dish", on_click=self.handle_update),
@@ -129,6 +152,7 @@ class DishDetailView(ft.Container):
             bgcolor=PRIMARY_COLOR,
         )
 
+    @serialized
     def _on_file_selected(self, e: ft.FilePickerResultEvent) -> None:
         if e.files:
             self.image_url_field.value = e.files[0].path
@@ -138,20 +162,90 @@ class DishDetailView(ft.Container):
         self.view_model.delete_dish()
 
     def _on_update(self):
-        self.view_model.update_dish()
-        self.load_data()
+        """Сохранение всех правок экрана одной транзакцией; поля берутся из вернувшейся строки"""
+        try:
+            self.view_model.save_changes()
+        except ConcurrentUpdateError:
+            self.load_data()
+            self._show_save_error("The dish was changed elsewhere, your edits were discarded")
+            return
+        except ValueError as exc:
+            self._show_save_error(str(exc))
+            return
+        self._show_save_error("")
+        self.show_fields()
+        self.show_ingredients()
+        self._page.update()
 
+    @timed_view
+    @serialized
+    @session_scoped
     def load_data(self):
         self.view_model.load_dish(self.dish_id)
         if self.view_model.model:
-            self.name_field.value = self.view_model.model.name
-            self.description_field.value = self.view_model.model.description
-            self.recipe_field.value = self.view_model.model.recipe
-            self.image_url_field.value = self.view_model.model.image_url
-
+            self.show_fields()
             self.load_ingredients()
             self.load_cooks()
             self.update_ingredients()
+        self._page.update()
+
+    async def apply_changes(self, changes: ChangeBatch):
+        """Изменения из других сессий; несохранённые правки полей и состава не перезаписываются"""
+        await asyncio.get_running_loop().run_in_executor(QUERY_EXECUTOR, self._apply_changes, changes)
+
+    @serialized
+    @session_scoped
+    def _apply_changes(self, changes: ChangeBatch):
+        if not self.view_model.model:
+            return
+        dishes = row_changes(changes, "dishes")
+        if dishes is None or self.dish_id in dishes.upserted | dishes.deleted:
+            remote = self.view_model.remote_changes()
+            if remote is None:
+                self._show_save_error("The dish was deleted elsewhere")
+                return
+            if remote and self._fields_edited():
+                self._show_save_error("The dish was changed elsewhere, your edits can no longer be saved")
+            elif remote:
+                self.view_model.load_dish(self.dish_id)
+                self.show_fields()
+                self.cook_dropdown.value = str(self.view_model.model.cook_id or "")
+        tables = changed_tables(changes)
+        if "ingredients" in tables:
+            self.load_ingredients()
+        if "cooks" in tables and not self.view_model.has_changes:
+            self.load_cooks()
+        # Состав: связи этого блюда или изменённые ингредиенты из него
+        links = row_changes(changes, "dish_ingredients")
+        ingredients = row_changes(changes, "ingredients")
+        shown = {ing["id"] for ing in self.view_model.ingredients}
+        if (
+            links is None
+            or self.dish_id in links.upserted
+            or ingredients is None
+            or not shown.isdisjoint(ingredients.upserted | ingredients.deleted)
+        ):
+            if self.view_model.pending_weights or self.view_model.pending_removed:
+                # Список с несохранёнными правками остаётся, итоги пересчитываются
+                self.show_ingredients()
+            else:
+                self.update_ingredients()
+        self._page.update()
+
+    def _fields_edited(self) -> bool:
+        model = self.view_model.model
+        return self.view_model.has_changes or (
+            self.name_field.value,
+            self.description_field.value,
+            self.recipe_field.value,
+            self.image_url_field.value or None,
+        ) != (model.name, model.description, model.recipe, model.image_url or None)
+
+    def show_fields(self):
+        self.name_field.value = self.view_model.model.name
+        self.description_field.value = self.view_model.model.description
+        self.recipe_field.value = self.view_model.model.recipe
+        self.image_url_field.value = self.view_model.model.image_url
 
     def load_ingredients(self):
         ingredients = self.view_model.get_available_ingredients()
@@ -178,29 +272,40 @@ class DishDetailView(ft.Container):
             self.cook_dropdown.value = ""
 
     def update_ingredients(self):
-        self.ingredients_list.controls.clear()
-        ingredients = self.view_model.get_ingredients()
-        for ing in ingredients:
-            self.ingredients_list.controls.append(
-                create_list_item(
-                    title=ing["name"],
-                    subtitle=f"Weight: {ing['weight']}",
-                    trailing=create_icon_button(
-                        ft.Icons.DELETE,
-                        on_click=lambda e, i=ing["id"]: self.handle_remove_ingredient(
-                            i
-                        ),
-                    ),
-                )
-            )
-        self._page.update()
+        self.view_model.get_ingredients()
+        self.show_ingredients()
+
+    def show_ingredients(self):
+        """Состав с несохранёнными правками; итоги — по сохранённому составу"""
+        self.ingredients_items.reconcile(self.view_model.ingredients)
+        totals = self.view_model.get_nutrition()
+        self.nutrition_text.value = (
+            f"{totals.calories:.0f} kcal · protein {totals.protein:.1f} g · fat {totals.fat:.1f} g"
+            f" · carbs {totals.carbs:.1f} g · cost {totals.cost:.2f}"
+        )
+        if self.view_model.has_changes:
+            self.nutrition_text.value += " · unsaved changes"
+
+    def _create_ingredient_item(self, ing) -> ft.ListTile:
+        return create_list_item(
+            title=ing["name"],
+            subtitle=f"Weight: {ing['weight']}",
+            trailing=create_icon_button(
+                ft.Icons.DELETE,
+                on_click=lambda e, i=ing["id"]: self.handle_remove_ingredient(i),
+            ),
+        )
 
+    @serialized
+    @session_scoped
     def handle_cook_change(self, e):
         if e.control.value and e.control.value != "":
-            cook_id = int(e.control.value)
-            self.view_model.set_dish_cook(cook_id)
-            self.load_data()
+            self.view_model.stage(cook_id=int(e.control.value))
+            self.show_ingredients()
+            self._page.update()
 
+    @serialized
+    @session_scoped
     def handle_add_ingredient(self, e):
         try:
             if (
@@ -211,26 +316,38 @@ class DishDetailView(ft.Container):
 
             ing_id = int(self.ingredient_dropdown.value)
             weight = float(self.new_weight.value)
-            self.view_model.add_or_update_ingredient(ing_id, weight)
-            self.update_ingredients()
+            self.view_model.stage_ingredient(ing_id, weight)
+            self.show_ingredients()
             self.ingredient_dropdown.value = ""
             self.new_weight.value = ""
             self._page.update()
         except ValueError:
             pass
 
+    @serialized
+    @session_scoped
     def handle_remove_ingredient(self, ingredient_id: int):
-        self.view_model.delete_ingredient(ingredient_id)
-        self.update_ingredients()
+        self.view_model.stage_remove_ingredient(ingredient_id)
+        self.show_ingredients()
+        self._page.update()
 
+    @serialized
+    @session_scoped
     def handle_update(self, e):
         if self.view_model.model:
-            self.view_model.model.name = self.name_field.value
-            self.view_model.model.description = self.description_field.value
-            self.view_model.model.recipe = self.recipe_field.value
-            self.view_model.model.image_url = self.image_url_field.value
+            self.view_model.stage(
+                name=self.name_field.value,
+                description=self.description_field.value,
+                recipe=self.recipe_field.value,
+                image_url=self.image_url_field.value or None,
+            )
             self._on_update()
 
+    def _show_save_error(self, message: str):
+        self.save_error.value = message
+        self.save_error.visible = bool(message)
+        self.save_error.update()
+
     def handle_delete(self, e):
         dialog = create_alert_dialog(
             "Confirm Delete",
@@ -243,6 +360,8 @@ class DishDetailView(ft.Container):
         self._page.open(dialog)
         self._page.update()
 
+    @serialized
+    @session_scoped
     def confirm_delete(self):
         if self.view_model.model:
             self._on_delete()
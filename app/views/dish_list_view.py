@@ -1,19 +1,26 @@
+from functools import partial
 from typing import Callable
 
 import flet as ft
 
 from components.form_dialog import FormDialog, FormBuilder
+from components.infinite_list import create_infinite_list
+from components.keyed_list import KeyedList
 from components.list_item import create_list_item
 from models.dishes import Dish
 from styles import (
-    MARGIN,
     CONTRAST_COLOR,
+    ERROR_COLOR,
+    SMALL_SIZE,
     TITLE_SIZE,
     get_text_style,
     PADDING,
     PRIMARY_COLOR,
 )
 from viewmodels.dish_viewmodel import DishListViewModel
+from repositories.change_feed import ChangeBatch, row_changes
+from repositories.instrumentation import timed_view
+from viewmodels.query_pipeline import DebouncedQuery
 from components.button import create_button
 from components.form_field import create_text_field
 
@@ -31,10 +38,32 @@ class DishListView(ft.Container):
         self.search_field = create_text_field(
             "Search by name", on_change=self.handle_search
         )
-        self.ingredient_filter = create_text_field(
-            "Filter by ingredient ID", on_change=self.handle_filter
+        self.include_filter = create_text_field(
+            "Contains ingredients (tomato, basil >= 20)", on_change=self.handle_filter
         )
-        self.dishes_list = ft.ListView(expand=True, spacing=MARGIN)
+        self.exclude_filter = create_text_field(
+            "Without ingredients", on_change=self.handle_filter
+        )
+        self.cook_filter = ft.Dropdown(
+            label="Cook",
+            options=[],
+            value="",
+            on_change=self.handle_filter,
+            color=CONTRAST_COLOR,
+        )
+        self.filter_error = ft.Text(
+            "", style=get_text_style(SMALL_SIZE, ERROR_COLOR), visible=False
+        )
+        self.dishes_list, load_more_button = create_infinite_list(self.load_more)
+        self.dishes_items = KeyedList(
+            self.dishes_list,
+            key=lambda dish: dish.id,
+            build=self._create_dish_item,
+            signature=lambda dish: (dish.name, dish.description, dish.image_url),
+            footer=load_more_button,
+            footer_visible=lambda: self.view_model.has_more,
+        )
+        self.query_pipeline = DebouncedQuery(on_error=self._on_query_error)
 
         super().__init__(
             content=ft.Column(
@@ -46,7 +75,15 @@ class DishListView(ft.Container):
                         ),
                     ),
                     self.search_field,
-                    self.ingredient_filter,
+                    ft.Row(
+                        [
+                            ft.Container(self.include_filter, expand=2),
+                            ft.Container(self.exclude_filter, expand=2),
+                            ft.Container(self.cook_filter, expand=1),
+                        ],
+                        spacing=PADDING,
+                    ),
+                    self.filter_error,
                     self.dishes_list,
                     create_button(
                         "Add New Dish", on_click=lambda e: self._on_add_dish()
@@ -60,29 +97,24 @@ class DishListView(ft.Container):
         )
 
     def _create_dish_item(self, dish: Dish) -> ft.Container:
-        """Создает элемент списка с изображением блюда"""
+        """Создает элемент списка с миниатюрой блюда"""
+        frame = ft.Container(
+            content=self._placeholder(),
+            width=60,
+            height=60,
+            border_radius=8,
+            clip_behavior=ft.ClipBehavior.HARD_EDGE,
+            alignment=ft.alignment.center,
+        )
+        # Пока миниатюра строится или изображения нет, в строке значок; готовая
+        # миниатюра подставляется без перестройки списка
+        src = self.view_model.image_src(dish.image_url, "list", partial(self._show_image, frame))
+        if src:
+            frame.content = self._image(src)
         content = ft.Row(
             [
                 # Изображение
-                ft.Container(
-                    content=ft.Image(
-                        src=(
-                            dish.image_url
-                            if dish.image_url
-                            else "/images/placeholder.png"
-                        ),
-                        width=60,
-                        height=60,
-                        fit=ft.ImageFit.COVER,
-                        error_content=ft.Icon(
-                            ft.Icons.RESTAURANT, size=40, color=CONTRAST_COLOR
-                        ),
-                    ),
-                    width=60,
-                    height=60,
-                    border_radius=8,
-                    clip_behavior=ft.ClipBehavior.HARD_EDGE,
-                ),
+                frame,
                 ft.Column(
                     [
                         ft.Text(
@@ -112,6 +144,20 @@ class DishListView(ft.Container):
             bgcolor=f"{CONTRAST_COLOR}10",
         )
 
+    @staticmethod
+    def _placeholder() -> ft.Control:
+        return ft.Icon(ft.Icons.RESTAURANT, size=40, color=CONTRAST_COLOR)
+
+    @classmethod
+    def _image(cls, src: str) -> ft.Image:
+        return ft.Image(src=src, width=60, height=60, fit=ft.ImageFit.COVER, error_content=cls._placeholder())
+
+    @classmethod
+    def _show_image(cls, frame: ft.Container, src: str) -> None:
+        frame.content = cls._image(src)
+        if frame.page:
+            frame.update()
+
     def _on_add_dish(self):
         form: FormDialog = (
             FormBuilder("Add cook")
@@ -131,32 +177,103 @@ class DishListView(ft.Container):
             recipe=values["Recipe"],
             image_url=values["Image URL"],
         )
-        self.view_model.add_dish(dish)
-        self.load_data()
+        self._page.run_task(self._add_dish, dish)
 
-    def load_data(self):
-        self.view_model.load_all_dishes()
+    async def _add_dish(self, dish: Dish):
+        await self.view_model.add_dish(dish)
+        await self.load_data()
+
+    @timed_view
+    async def load_data(self):
+        await self.view_model.load_first_page()
+        await self.load_cooks()
         self.update_list()
 
-    def update_list(self):
-        self.dishes_list.controls.clear()
-        for dish in self.view_model.dishes:
-            self.dishes_list.controls.append(self._create_dish_item(dish))
-        self._page.update()
-
-    def handle_search(self, e):
-        if self.search_field.value:
-            self.view_model.search_by_name(self.search_field.value)
+    async def refresh(self):
+        """Повтор текущего поиска или фильтра без сброса введённых условий"""
+        if self._filter_entered():
+            await self.handle_filter(None)
+        else:
+            await self.handle_search(None)
+
+    async def apply_changes(self, changes: ChangeBatch):
+        """Изменения из других сессий. В списке по имени изменённые блюда встают
+        на свои места; состав результатов поиска и фильтра знает только запрос,
+        поэтому он повторяется, если блюда добавлены или изменены"""
+        dishes = row_changes(changes, "dishes")
+        links = row_changes(changes, "dish_ingredients")
+        filtered = self.view_model.active_filter is not None
+        if dishes is None or (filtered and (links is None or links)):
+            await self.refresh()
+            return
+        if self.view_model.paginator.sort_key is None and dishes.upserted:
+            await self.refresh()
+            return
+        if dishes:
+            await self.view_model.apply_dish_changes(*dishes)
             self.update_list()
+
+    def _filter_entered(self) -> bool:
+        return bool(self.include_filter.value or self.exclude_filter.value or self.cook_filter.value)
+
+    async def load_cooks(self):
+        cooks = await self.view_model.get_available_cooks()
+        self.cook_filter.options = [ft.dropdown.Option(key="", text="Any cook")] + [
+            ft.dropdown.Option(key=str(cook.id), text=cook.name) for cook in cooks
+        ]
+        self.cook_filter.value = ""
+
+    async def load_more(self):
+        if not self.view_model.has_more:
+            return
+        paginator = self.view_model.paginator
+        new_dishes = await self.view_model.load_next_page()
+        if paginator is not self.view_model.paginator:
+            # Пока грузилась страница, список был заменён результатом поиска
+            return
+        self.dishes_items.append(new_dishes)
+
+    def update_list(self):
+        self.dishes_items.reconcile(self.view_model.dishes)
+
+    def _apply_paginator(self, paginator):
+        self.view_model.apply_paginator(paginator)
+        self._show_filter_error("")
+        self.update_list()
+
+    def _on_query_error(self, exc: Exception):
+        """Список остаётся прежним, ошибка запроса или разбора фильтра показывается под фильтрами"""
+        self._show_filter_error(str(exc) if isinstance(exc, ValueError) else f"Search failed: {exc}")
+
+    async def handle_search(self, e):
+        query = self.search_field.value
+        if query:
+            self.query_pipeline.submit(
+                partial(self.view_model.query_search, query), self._apply_paginator
+            )
         else:
-            self.load_data()
+            self.query_pipeline.submit(self.view_model.query_first_page, self._apply_paginator)
+
+    async def handle_filter(self, e):
+        include = self.include_filter.value or ""
+        exclude = self.exclude_filter.value or ""
+        cook_id = int(self.cook_filter.value) if self.cook_filter.value else None
+
+        def apply(result):
+            dish_filter, paginator = result
+            if dish_filter is None:
+                self._apply_paginator(paginator)
+                return
+            self.view_model.apply_filter(dish_filter, paginator)
+            self._show_filter_error("")
             self.update_list()
 
-    def handle_filter(self, e):
-        if self.ingredient_filter.value:
-            try:
-                ing_id = int(self.ingredient_filter.value)
-                self.view_model.filter_by_ingredient(ing_id)
-                self.update_list()
-            except ValueError:
-                pass
+        # Имена ингредиентов разрешаются уже после паузы ввода: недописанное имя не ошибка
+        self.query_pipeline.submit(
+            partial(self.view_model.query_filter_text, include, exclude, cook_id), apply
+        )
+
+    def _show_filter_error(self, message: str):
+        self.filter_error.value = message
+        self.filter_error.visible = bool(message)
+        self.filter_error.update()
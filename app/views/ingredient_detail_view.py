@@ -1,3 +1,5 @@
+import asyncio
+import threading
 from typing import Callable
 
 import flet as ft
@@ -9,12 +11,19 @@ from styles import (
     CONTRAST_COLOR,
     SUBTITLE_SIZE,
     ERROR_COLOR,
+    SMALL_SIZE,
     PADDING,
     PRIMARY_COLOR,
 )
+from models.dishes import NUTRIENTS
+from models.database import session_scoped
+from repositories.change_feed import ChangeBatch, row_changes
+from repositories.instrumentation import timed_view
 from viewmodels.ingredient_viewmodel import IngredientViewModel
-from components.form_field import create_text_field
+from viewmodels.query_pipeline import QUERY_EXECUTOR, serialized
+from components.form_field import create_text_field, create_number_field
 from components.button import create_button, create_icon_button
+from components.keyed_list import KeyedList
 from components.list_item import create_list_item
 from components.dialog import create_alert_dialog
 
@@ -31,8 +40,20 @@ class IngredientDetailView(ft.Container):
         self.view_model = view_model
         self.ingredient_id = ingredient_id
         self.on_back = on_back
+        # Обработчики Flet и применение изменений из пула — по одному (см. serialized)
+        self.lock = threading.RLock()
         self.name_field = create_text_field("Name")
+        self.nutrient_fields = {
+            name: create_number_field(f"{name.capitalize()} / 100 g") for name in NUTRIENTS
+        }
         self.dishes_list = ft.ListView(expand=True, spacing=MARGIN)
+        self.dishes_items = KeyedList(
+            self.dishes_list,
+            key=lambda dish: dish.id,
+            build=lambda dish: create_list_item(title=dish.name, subtitle=dish.description),
+            signature=lambda dish: (dish.name, dish.description),
+        )
+        self.save_error = ft.Text("", style=get_text_style(SMALL_SIZE, ERROR_COLOR), visible=False)
 
         super().__init__(
             content=ft.Column(
@@ -51,10 +72,12 @@ class IngredientDetailView(ft.Container):
                         ]
                     ),
                     self.name_field,
+                    ft.Row(list(self.nutrient_fields.values())),
                     ft.Text(
                         "Dishes", style=get_text_style(SUBTITLE_SIZE, CONTRAST_COLOR)
                     ),
                     self.dishes_list,
+                    self.save_error,
                     ft.Row(
                         [
                             create_button("Update", on_click=self.handle_update),
@@ -77,24 +100,84 @@ class IngredientDetailView(ft.Container):
         self.view_model.delete_ingredient()
 
     def _on_update(self):
-        self.view_model.update_ingredient()
-        self.load_data()
+        """Сохраняются только изменённые поля; список блюд не перечитывается"""
+        try:
+            self.view_model.update_ingredient()
+        except ValueError as exc:
+            self._show_save_error(str(exc))
+            return
+        self._show_save_error("")
+        self.show_fields()
+        self._page.update()
+
+    def show_fields(self):
+        self.name_field.value = self.view_model.model.name
+        for name, field in self.nutrient_fields.items():
+            field.value = str(getattr(self.view_model.model, name))
 
+    @timed_view
+    @serialized
+    @session_scoped
     def load_data(self):
         self.view_model.load_ingredient(self.ingredient_id)
         if self.view_model.model:
-            self.name_field.value = self.view_model.model.name
-            self.view_model.get_dishes()
-            self.dishes_list.controls.clear()
-            for dish in self.view_model.dishes:
-                self.dishes_list.controls.append(
-                    create_list_item(title=dish.name, subtitle=dish.description)
-                )
+            self.show_fields()
+            self.dishes_items.reconcile(self.view_model.get_dishes())
         self._page.update()
 
+    async def apply_changes(self, changes: ChangeBatch):
+        """Изменения из других сессий; поля, которые начали править, не перезаписываются"""
+        await asyncio.get_running_loop().run_in_executor(QUERY_EXECUTOR, self._apply_changes, changes)
+
+    @serialized
+    @session_scoped
+    def _apply_changes(self, changes: ChangeBatch):
+        if not self.view_model.model:
+            return
+        ingredients = row_changes(changes, "ingredients")
+        if ingredients is None or self.ingredient_id in ingredients.upserted | ingredients.deleted:
+            remote = self.view_model.remote_changes()
+            if remote is None:
+                self._show_save_error("The ingredient was deleted elsewhere")
+                return
+            if remote and self._fields_edited():
+                self._show_save_error("The ingredient was changed elsewhere, saving will overwrite it")
+            elif remote:
+                self.view_model.load_ingredient(self.ingredient_id)
+                self.show_fields()
+        # Список блюд: связи этого ингредиента или показанные блюда
+        links = row_changes(changes, "dish_ingredients", by_other=True)
+        dishes = row_changes(changes, "dishes")
+        shown = {dish.id for dish in self.view_model.dishes}
+        if (
+            links is None
+            or self.ingredient_id in links.upserted
+            or dishes is None
+            or not shown.isdisjoint(dishes.upserted | dishes.deleted)
+        ):
+            self.dishes_items.reconcile(self.view_model.get_dishes())
+        self._page.update()
+
+    def _fields_edited(self) -> bool:
+        model = self.view_model.model
+        return self.name_field.value != model.name or any(
+            field.value != str(getattr(model, name)) for name, field in self.nutrient_fields.items()
+        )
+
+    def _show_save_error(self, message: str):
+        self.save_error.value = message
+        self.save_error.visible = bool(message)
+        self.save_error.update()
+
+    @serialized
+    @session_scoped
     def handle_update(self, e):
         if self.view_model.model:
-            self.view_model.model.name = self.name_field.value
+            try:
+                values = {name: float(field.value or 0) for name, field in self.nutrient_fields.items()}
+            except ValueError:
+                return
+            self.view_model.stage(name=self.name_field.value, **values)
             self._on_update()
 
     def handle_delete(self, e):
@@ -109,6 +192,8 @@ class IngredientDetailView(ft.Container):
         self._page.open(dialog)
         self._page.update()
 
+    @serialized
+    @session_scoped
     def confirm_delete(self):
         if self.view_model.model:
             self._on_delete()
@@ -3,25 +3,37 @@ from typing import Callable
 import flet as ft
 
 from styles import (
-    MARGIN,
     get_text_style,
     TITLE_SIZE,
     CONTRAST_COLOR,
     PADDING,
     PRIMARY_COLOR,
 )
-from viewmodels.ingredient_viewmodel import IngredientViewModel
+from models.dishes import Ingredient
+from repositories.change_feed import ChangeBatch, row_changes
+from repositories.instrumentation import timed_view
+from viewmodels.ingredient_viewmodel import IngredientListViewModel
+from components.infinite_list import create_infinite_list
+from components.keyed_list import KeyedList
 from components.list_item import create_list_item
 from components.button import create_button
 from components.form_field import create_text_field
 
 
 class IngredientListView(ft.Container):
-    def __init__(self, page:ft.Page, view_model: IngredientViewModel, on_select_ingredient: Callable):
+    def __init__(self, page:ft.Page, view_model: IngredientListViewModel, on_select_ingredient: Callable):
         self._page = page
         self.view_model = view_model
         self.on_select_ingredient = on_select_ingredient
-        self.ingredients_list = ft.ListView(expand=True, spacing=MARGIN)
+        self.ingredients_list, load_more_button = create_infinite_list(self.load_more)
+        self.ingredients_items = KeyedList(
+            self.ingredients_list,
+            key=lambda ing: ing.id,
+            build=self._create_ingredient_item,
+            signature=lambda ing: ing.name,
+            footer=load_more_button,
+            footer_visible=lambda: self.view_model.ingredients_paginator.has_more,
+        )
         self.bulk_add_field = create_text_field(
             "Bulk add names (comma-separated)", multiline=True
         )
@@ -46,21 +58,36 @@ class IngredientListView(ft.Container):
             bgcolor=PRIMARY_COLOR,
         )
 
-    def load_data(self):
-        ingredients = self.view_model.repository.find_all()
-        self.ingredients_list.controls.clear()
-        for ing in ingredients:
-            self.ingredients_list.controls.append(
-                create_list_item(
-                    title=ing.name,
-                    on_click=lambda e, i=ing: self.on_select_ingredient(i.id),
-                )
-            )
-        self._page.update()
+    @timed_view
+    async def load_data(self):
+        self.ingredients_items.reconcile(await self.view_model.load_ingredients_page(reset=True))
+
+    async def refresh(self):
+        await self.load_data()
+
+    async def apply_changes(self, changes: ChangeBatch):
+        """Изменения из других сессий: перечитываются только затронутые строки"""
+        ingredients = row_changes(changes, "ingredients")
+        if ingredients is None:
+            await self.refresh()
+        elif ingredients:
+            self.ingredients_items.reconcile(await self.view_model.apply_ingredient_changes(*ingredients))
+
+    async def load_more(self):
+        if not self.view_model.ingredients_paginator.has_more:
+            return
+        self.ingredients_items.append(await self.view_model.load_ingredients_page())
+
+    def _create_ingredient_item(self, ing: Ingredient) -> ft.ListTile:
+        return create_list_item(
+            title=ing.name,
+            on_click=lambda e, i=ing: self.on_select_ingredient(i.id),
+        )
 
-    def handle_bulk_add(self, e):
+    async def handle_bulk_add(self, e):
         if self.bulk_add_field.value:
             names = [n.strip() for n in self.bulk_add_field.value.split(",")]
-            self.view_model.bulk_add(names)
+            await self.view_model.bulk_add(names)
             self.bulk_add_field.value = ""
-            self.load_data()
+            self.bulk_add_field.update()
+            await self.load_data()
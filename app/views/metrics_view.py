@@ -0,0 +1,94 @@
+from typing import Any, Dict
+
+import flet as ft
+
+from styles import (
+    get_text_style,
+    TITLE_SIZE,
+    SUBTITLE_SIZE,
+    SMALL_SIZE,
+    CONTRAST_COLOR,
+    SECONDARY_COLOR,
+    PADDING,
+    PRIMARY_COLOR,
+)
+from components.button import create_button
+from repositories.instrumentation import Metrics
+
+
+COLUMNS = ("calls", "mean_ms", "p95_ms", "max_ms", "rows_per_call", "queries_per_call", "errors")
+
+
+class MetricsView(ft.Container):
+    """Отладочная панель: показатели методов репозиториев, экранов и SQL-запросов"""
+
+    def __init__(self, page: ft.Page, metrics: Metrics):
+        self._page = page
+        self.metrics = metrics
+        self.queries_text = ft.Text(style=get_text_style(color=SECONDARY_COLOR))
+        self.repositories_table = self._create_table("Repository method")
+        self.views_table = self._create_table("View")
+
+        super().__init__(
+            content=ft.Column(
+                [
+                    ft.Text(
+                        "Metrics",
+                        style=get_text_style(TITLE_SIZE, CONTRAST_COLOR, ft.FontWeight.BOLD),
+                    ),
+                    self.queries_text,
+                    ft.Row(
+                        [
+                            create_button("Refresh", on_click=lambda e: self.refresh()),
+                            create_button("Reset", on_click=lambda e: self.reset()),
+                        ]
+                    ),
+                    ft.Text("Repositories", style=get_text_style(SUBTITLE_SIZE, CONTRAST_COLOR, ft.FontWeight.BOLD)),
+                    ft.Row([self.repositories_table], scroll=ft.ScrollMode.AUTO),
+                    ft.Text("Views", style=get_text_style(SUBTITLE_SIZE, CONTRAST_COLOR, ft.FontWeight.BOLD)),
+                    ft.Row([self.views_table], scroll=ft.ScrollMode.AUTO),
+                ],
+                spacing=PADDING,
+                scroll=ft.ScrollMode.AUTO,
+                expand=True,
+            ),
+            padding=PADDING,
+            bgcolor=PRIMARY_COLOR,
+            expand=True,
+        )
+
+    @staticmethod
+    def _create_table(title: str) -> ft.DataTable:
+        return ft.DataTable(
+            columns=[ft.DataColumn(ft.Text(title))]
+            + [ft.DataColumn(ft.Text(column), numeric=True) for column in COLUMNS],
+            data_text_style=get_text_style(SMALL_SIZE),
+        )
+
+    @staticmethod
+    def _rows(stats: Dict[str, Dict[str, Any]]):
+        return [
+            ft.DataRow(
+                cells=[ft.DataCell(ft.Text(name))]
+                + [ft.DataCell(ft.Text("—" if value[column] is None else str(value[column]))) for column in COLUMNS]
+            )
+            for name, value in stats.items()
+        ]
+
+    def load_data(self):
+        snapshot = self.metrics.snapshot()
+        queries = snapshot["queries"]
+        self.queries_text.value = (
+            f"SQL: {queries['calls']} queries, mean {queries['mean_ms']} ms, "
+            f"max {queries['max_ms']} ms, slow (≥ {queries['slow_ms']:g} ms): {queries['slow']}"
+        )
+        self.repositories_table.rows = self._rows(snapshot["repositories"])
+        self.views_table.rows = self._rows(snapshot["views"])
+
+    def refresh(self):
+        self.load_data()
+        self.update()
+
+    def reset(self):
+        self.metrics.reset()
+        self.refresh()